@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of importing cultivar gene files in the wide and long gene layouts
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate  # pylint: disable=wrong-import-position
+
+
+def make_cultivar_gene_file(file_path: str, num_cultivars: int, num_genes: int) -> None:
+    """Writes a present/absent cultivar gene file in the same format as the genotype exports
+    Arguments:
+        file_path: the path of the file to write
+        num_cultivars: the number of cultivar rows to write
+        num_genes: the number of gene columns to write
+    """
+    values = ('0', '1', '0', '1', 'NA', 'No WGS')
+    with open(file_path, 'w') as out_file:
+        out_file.write('Cultivar,' + ','.join(['S%s_%s' % (str(idx % 10), str(idx)) for idx in range(num_genes)]) + '\n')
+        for idx in range(num_cultivars):
+            out_file.write('PI%s,' % str(idx) + ','.join([random.choice(values) for _ in range(num_genes)]) + '\n')
+
+
+def import_genes(file_path: str, gene_layout: str) -> None:
+    """Imports the cultivar gene file into an in-memory database
+    Arguments:
+        file_path: the path of the file to import
+        gene_layout: the layout to save the genes in
+    """
+    db_conn = sqlite3.connect(':memory:')
+    generate.save_cultivar_genes(file_path, 0, 0, db_conn, gene_layout=gene_layout)
+    db_conn.close()
+
+
+def run_benchmark(num_cultivars: int, num_genes: int, repeat: int) -> None:
+    """Runs the benchmark and prints the results
+    Arguments:
+        num_cultivars: the number of cultivars in the gene file
+        num_genes: the number of genes in the gene file
+        repeat: the number of times to repeat each measurement (the best time is reported)
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, 'cultivar_genes.csv')
+        make_cultivar_gene_file(file_path, num_cultivars, num_genes)
+
+        tests = [('long layout', lambda: import_genes(file_path, generate.GENE_LAYOUT_LONG))]
+        if num_genes < 2000:
+            # SQLite's default limit on the number of columns in a table
+            tests.insert(0, ('wide layout', lambda: import_genes(file_path, generate.GENE_LAYOUT_WIDE)))
+
+        print("Importing %s cultivars of %s genes (%.1f MB), best of %s runs" %
+              (str(num_cultivars), str(num_genes), os.path.getsize(file_path) / 1000000, str(repeat)))
+        for name, func in tests:
+            best = min(timeit.repeat(func, number=1, repeat=repeat))
+            print("  %-12s %8.3f s  %10.0f values per second" % (name, best, num_cultivars * num_genes / best))
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Benchmark cultivar gene file imports")
+    PARSER.add_argument('--cultivars', type=int, default=1000, help='the number of cultivars in the gene file')
+    PARSER.add_argument('--genes', type=int, default=1000, help='the number of genes in the gene file')
+    PARSER.add_argument('--repeat', type=int, default=3, help='the number of times to repeat each measurement')
+    ARGS = PARSER.parse_args()
+    run_benchmark(ARGS.cultivars, ARGS.genes, ARGS.repeat)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Micro-benchmark comparing the fixed format timestamp parser against strptime()
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate  # pylint: disable=wrong-import-position
+
+
+def make_timestamps(num_days: int) -> list:
+    """Generates one-second timestamps, alternating between the supported formats, in the same way EnvironmentLogger
+       and file metadata would provide them
+    Arguments:
+        num_days: the number of days of timestamps to generate
+    Return:
+        Returns the list of timestamp strings
+    """
+    timestamps = []
+    cur_ts = datetime(2018, 5, 8)
+    for idx in range(0, num_days * 86400):
+        if idx % 2:
+            timestamps.append(cur_ts.strftime('%Y.%m.%d-%H:%M:%S'))
+        else:
+            timestamps.append(cur_ts.strftime('%m/%d/%Y %H:%M:%S'))
+        cur_ts += timedelta(seconds=1)
+    return timestamps
+
+
+def run_benchmark(num_days: int, repeat: int) -> None:
+    """Runs the benchmark and prints the results
+    Arguments:
+        num_days: the number of days of one-second timestamps to parse
+        repeat: the number of times to repeat each measurement (the best time is reported)
+    """
+    timestamps = make_timestamps(num_days)
+
+    # Make sure the parsers agree before timing them
+    for one_ts in timestamps:
+        expected = generate.strptime_timestamp_instance(one_ts)
+        assert generate.make_timestamp_instance(one_ts) == expected, one_ts
+        assert generate.parse_timestamp_epoch(one_ts) == generate.make_timestamp_epoch(expected), one_ts
+
+    tests = (
+        ('strptime datetime', lambda: [generate.strptime_timestamp_instance(one_ts) for one_ts in timestamps]),
+        ('strptime epoch', lambda: [generate.make_timestamp_epoch(generate.strptime_timestamp_instance(one_ts))
+                                    for one_ts in timestamps]),
+        ('fast datetime', lambda: [generate.make_timestamp_instance(one_ts) for one_ts in timestamps]),
+        ('fast epoch', lambda: [generate.parse_timestamp_epoch(one_ts) for one_ts in timestamps]),
+    )
+
+    print("Parsing %s timestamps, best of %s runs" % (str(len(timestamps)), str(repeat)))
+    baseline = None
+    for name, func in tests:
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        if baseline is None:
+            baseline = best
+        print("  %-18s %8.3f s  %10.0f per second  %5.1fx" % (name, best, len(timestamps) / best, baseline / best))
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Benchmark timestamp parsing")
+    PARSER.add_argument('--days', type=int, default=1, help='the number of days of one-second timestamps to parse')
+    PARSER.add_argument('--repeat', type=int, default=3, help='the number of times to repeat each measurement')
+    ARGS = PARSER.parse_args()
+    run_benchmark(ARGS.days, ARGS.repeat)
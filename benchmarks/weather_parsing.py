@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Micro-benchmark comparing parsing EnvironmentLogger weather files in one process against a pool of processes
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate  # pylint: disable=wrong-import-position
+
+
+def make_weather_files(folder: str, num_days: int, readings_per_file: int) -> list:
+    """Writes weather files with one reading every five seconds in the same format as EnvironmentLogger
+    Arguments:
+        folder: the folder to write the files to
+        num_days: the number of days of weather files to write
+        readings_per_file: the number of readings in each file
+    Return:
+        Returns the list of file paths
+    """
+    weather_files = []
+    cur_ts = datetime(2018, 5, 8)
+    for _ in range(0, num_days * 86400 // (readings_per_file * 5)):
+        file_path = os.path.join(folder, cur_ts.strftime('%Y-%m-%d_%H-%M-%S') + '_environmentlogger.json')
+        readings = []
+        for _ in range(0, readings_per_file):
+            readings.append({'timestamp': cur_ts.strftime('%Y.%m.%d-%H:%M:%S'),
+                             'weather_station': {one_key: {'value': round(random.uniform(0, 100), 2)}
+                                                 for one_key in generate.WEATHER_READING_KEYS}})
+            cur_ts += timedelta(seconds=5)
+        with open(file_path, 'w') as out_file:
+            json.dump({'environment_sensor_readings': readings}, out_file)
+        weather_files.append(file_path)
+    return weather_files
+
+
+def run_benchmark(num_days: int, readings_per_file: int, workers: int, repeat: int) -> None:
+    """Runs the benchmark and prints the results
+    Arguments:
+        num_days: the number of days of weather files to parse
+        readings_per_file: the number of readings in each file
+        workers: the number of processes to parse the files with; zero uses one process per CPU
+        repeat: the number of times to repeat each measurement (the best time is reported)
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        weather_files = make_weather_files(folder, num_days, readings_per_file)
+
+        # Make sure the loaders agree before timing them
+        assert generate.load_weather_files(weather_files, 1) == generate.load_weather_files(weather_files, workers)
+
+        tests = (
+            ('one process', lambda: generate.load_weather_files(weather_files, 1)),
+            ('process pool', lambda: generate.load_weather_files(weather_files, workers)),
+        )
+
+        print("Parsing %s weather files of %s readings, best of %s runs" %
+              (str(len(weather_files)), str(readings_per_file), str(repeat)))
+        baseline = None
+        for name, func in tests:
+            best = min(timeit.repeat(func, number=1, repeat=repeat))
+            if baseline is None:
+                baseline = best
+            print("  %-14s %8.3f s  %8.0f files per second  %5.1fx" % (name, best, len(weather_files) / best,
+                                                                       baseline / best))
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Benchmark weather file parsing")
+    PARSER.add_argument('--days', type=int, default=7, help='the number of days of weather files to parse')
+    PARSER.add_argument('--readings', type=int, default=120, help='the number of readings in each weather file')
+    PARSER.add_argument('--workers', type=int, default=0,
+                        help='the number of processes in the pool (defaults to one per CPU)')
+    PARSER.add_argument('--repeat', type=int, default=3, help='the number of times to repeat each measurement')
+    ARGS = PARSER.parse_args()
+    run_benchmark(ARGS.days, ARGS.readings, ARGS.workers, ARGS.repeat)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Serves requests to build file discovery databases, keeping reference data and file information cached between builds
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import NoReturn
+import uuid
+
+import generate
+
+# The default values of the server options
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_CACHE_ENTRIES = 100000
+DEFAULT_CACHE_AGE_SEC = 3600
+
+# The number of finished builds to remember
+MAX_FINISHED_BUILDS = 1000
+
+
+class ArgumentError(Exception):
+    """Raised when the arguments of a build request aren't valid"""
+
+
+class BuildArgumentParser(argparse.ArgumentParser):
+    """Parses the arguments of a build request, raising an exception instead of exiting on errors"""
+
+    def error(self, message: str) -> NoReturn:
+        """Raises an exception with the error message
+        Arguments:
+            message: the error message
+        Exceptions:
+            Always raises ArgumentError
+        """
+        raise ArgumentError(message)
+
+    def exit(self, status: int = 0, message: str = None) -> NoReturn:
+        """Raises an exception instead of exiting (for example, when help is requested)
+        Arguments:
+            status: the exit status
+            message: the message to report
+        Exceptions:
+            Always raises ArgumentError
+        """
+        raise ArgumentError(message or "Unsupported build arguments")
+
+
+class BuildManager:
+    """Runs builds on a pool of workers and keeps track of them"""
+
+    def __init__(self, workers: int):
+        """Initializes the instance
+        Arguments:
+            workers: the number of builds that can be run at the same time
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='build')
+        self.lock = threading.Lock()
+        self.builds = {}
+        self.active_outputs = set()
+
+    def submit(self, arguments: list) -> dict:
+        """Starts a build
+        Arguments:
+            arguments: the generate.py command line arguments of the build
+        Return:
+            Returns the information on the build
+        Exceptions:
+            Raises ArgumentError if the arguments aren't valid, or the output file is already being built
+        """
+        parser = BuildArgumentParser(prog='generate.py', add_help=False)
+        generate.add_arguments(parser)
+        args = parser.parse_args([str(one_arg) for one_arg in arguments])
+        args.output_file = os.path.abspath(args.output_file)
+
+        build_id = uuid.uuid4().hex
+        build = {'id': build_id, 'status': 'queued', 'output_file': args.output_file, 'submitted': time.time(),
+                 'started': None, 'finished': None, 'record_count': None, 'error': None}
+        with self.lock:
+            if args.output_file in self.active_outputs:
+                raise ArgumentError("A build of '%s' is already in progress" % args.output_file)
+            self.active_outputs.add(args.output_file)
+            self.builds[build_id] = build
+            self._forget_finished()
+
+        build['future'] = self.executor.submit(self._run, build, args)
+        logging.info("Queued build %s of '%s'", build_id, args.output_file)
+        return build
+
+    def get(self, build_id: str) -> dict:
+        """Returns the information on a build
+        Arguments:
+            build_id: the ID of the build
+        Return:
+            Returns the build information, or None if the build isn't known
+        """
+        with self.lock:
+            return self.builds.get(build_id)
+
+    def get_counts(self) -> dict:
+        """Returns the number of builds with each status
+        Return:
+            Returns a dictionary of statuses and their counts
+        """
+        counts = {}
+        with self.lock:
+            for one_build in self.builds.values():
+                counts[one_build['status']] = counts.get(one_build['status'], 0) + 1
+        return counts
+
+    def shutdown(self) -> None:
+        """Waits for the running builds to finish"""
+        self.executor.shutdown(wait=True)
+
+    def _run(self, build: dict, args: argparse.Namespace) -> None:
+        """Runs a build
+        Arguments:
+            build: the build information to update
+            args: the parsed build arguments
+        """
+        build['status'] = 'running'
+        build['started'] = time.time()
+        try:
+            build['record_count'] = generate.make_database(args)
+            build['status'] = 'complete'
+        except Exception as ex:
+            logging.exception("Build %s of '%s' failed", build['id'], build['output_file'])
+            build['error'] = str(ex)
+            build['status'] = 'failed'
+        finally:
+            build['finished'] = time.time()
+            with self.lock:
+                self.active_outputs.discard(build['output_file'])
+            logging.info("Build %s of '%s' finished in %.1f seconds: %s", build['id'], build['output_file'],
+                         build['finished'] - build['started'], build['status'])
+
+    def _forget_finished(self) -> None:
+        """Removes the oldest finished builds when there are too many (called with the lock held)"""
+        finished = [one_build for one_build in self.builds.values() if one_build['finished'] is not None]
+        if len(finished) > MAX_FINISHED_BUILDS:
+            finished.sort(key=lambda one_build: one_build['finished'])
+            for one_build in finished[:len(finished) - MAX_FINISHED_BUILDS]:
+                del self.builds[one_build['id']]
+
+
+def build_response(build: dict) -> dict:
+    """Returns the information on a build to return to the client
+    Arguments:
+        build: the build information
+    Return:
+        Returns a dictionary that can be converted to JSON
+    """
+    response = {key: value for key, value in build.items() if key != 'future'}
+    if build['started'] is not None:
+        response['elapsed_sec'] = round((build['finished'] or time.time()) - build['started'], 3)
+    return response
+
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    """Handles the HTTP requests of the build server
+    Notes:
+        POST /builds starts a build; the body is a JSON object with an "arguments" list containing the same arguments
+        as generate.py, and an optional "wait" value (defaults to true) to only respond once the build has finished.
+        GET /builds/<id> returns the information on a build and GET /status returns the server's build and cache
+        statistics
+    """
+
+    def do_GET(self) -> None:
+        """Handles GET requests"""
+        if self.path == '/status':
+            self._send_json(200, {'builds': self.server.build_manager.get_counts(), 'caches': generate.get_cache_stats()})
+        elif self.path.startswith('/builds/'):
+            build = self.server.build_manager.get(self.path[len('/builds/'):])
+            if build is None:
+                self._send_json(404, {'error': 'Unknown build'})
+            else:
+                self._send_json(200, build_response(build))
+        else:
+            self._send_json(404, {'error': 'Unknown request'})
+
+    def do_POST(self) -> None:
+        """Handles POST requests"""
+        if self.path != '/builds':
+            self._send_json(404, {'error': 'Unknown request'})
+            return
+
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(content_length) or b'{}')
+            if not isinstance(request, dict) or not isinstance(request.get('arguments'), list):
+                raise ArgumentError('The request needs an "arguments" list')
+            build = self.server.build_manager.submit(request['arguments'])
+        except (ArgumentError, ValueError) as ex:
+            self._send_json(400, {'error': str(ex)})
+            return
+
+        if request.get('wait', True):
+            build['future'].result()
+            self._send_json(200 if build['status'] == 'complete' else 500, build_response(build))
+        else:
+            self._send_json(202, build_response(build))
+
+    def address_string(self) -> str:
+        """Returns the client address for logging, which is empty for Unix sockets"""
+        return str(self.client_address[0]) if self.client_address else 'local'
+
+    def log_message(self, format: str, *args) -> None:
+        """Logs requests through the logging module
+        Arguments:
+            format: the message format
+            args: the message values
+        """
+        # pylint: disable=redefined-builtin
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, body: dict) -> None:
+        """Sends a JSON response
+        Arguments:
+            status: the HTTP status code
+            body: the response
+        """
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    """HTTP server listening on a Unix socket"""
+    address_family = socket.AF_UNIX
+
+    def server_bind(self) -> None:
+        """Binds to the socket path, which isn't a host and port"""
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds arguments to command line parser
+    Arguments:
+        parser: the parser to add arguments to
+    """
+    parser.add_argument('--host', default=DEFAULT_HOST, help="the address to listen on (default %s)" % DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="the port to listen on (default %s)" % DEFAULT_PORT)
+    parser.add_argument('--socket', help="path of a Unix socket to listen on instead of a host and port")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="the number of builds to run at the same time (default %s)" % DEFAULT_WORKERS)
+    parser.add_argument('--cache_entries', type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help="the maximum number of entries in each cache (default %s)" % DEFAULT_CACHE_ENTRIES)
+    parser.add_argument('--cache_age', type=int, default=DEFAULT_CACHE_AGE_SEC,
+                        help="the number of seconds cached entries are kept (default %s)" % DEFAULT_CACHE_AGE_SEC)
+    parser.add_argument('--debug', action="store_true", help="turns on debugging messages")
+
+
+def serve() -> None:
+    """Runs the build server until it's interrupted"""
+    parser = argparse.ArgumentParser(description="Serve requests to generate SQLite databases for file discovery")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO,
+                        format='%(asctime)s %(threadName)s %(levelname)s: %(message)s')
+    generate.enable_caches(args.cache_entries, args.cache_age)
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = UnixHTTPServer(args.socket, BuildRequestHandler)
+        logging.info("Listening on socket '%s'", args.socket)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), BuildRequestHandler)
+        logging.info("Listening on %s:%s", args.host, str(args.port))
+    server.build_manager = BuildManager(args.workers)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Stopping server")
+    finally:
+        server.server_close()
+        server.build_manager.shutdown()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    serve()
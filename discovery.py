@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""Queries generated file discovery databases through pooled, read only connections, with a cache of the results
+"""
+
+import calendar
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+import urllib.parse
+
+# The default number of idle connections kept for reuse
+DEFAULT_POOL_SIZE = 4
+
+# The default number of bytes of the database that each connection reads through memory mapping
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+# The default number of rows in each chunk of streamed results
+DEFAULT_CHUNK_ROWS = 1000
+
+# The default number of results cached, and the number of seconds they're kept
+DEFAULT_CACHE_ENTRIES = 256
+DEFAULT_CACHE_AGE_SEC = 300
+
+# The columns of the files returned by the file lookups
+FILE_COLUMNS = ('file_id', 'folder', 'filename', 'format', 'sensor', 'start_time', 'finish_time', 'gantry_x', 'gantry_y',
+                'gantry_z', 'plot_id', 'plot_name', 'season', 'cultivar_name', 'start_time_epoch', 'finish_time_epoch')
+
+# Where each of the file columns comes from in the files (f), season_info (e), and cultivars (c) tables; the folder
+# comes from the folders (d) table when the folders are normalized (see make_files_select())
+FILE_COLUMN_SOURCES = {'file_id': 'f.id', 'plot_id': 'e.id', 'plot_name': 'e.plot_name', 'season': 'e.season',
+                       'cultivar_name': 'c.name'}
+
+# The conditions of the file lookup filters, in the order they're added to the query (see make_files_sql())
+FILE_FILTERS = (
+    ('sensor', 'f.sensor = :sensor'),
+    ('start_epoch', 'f.start_time_epoch >= :start_epoch AND f.start_time_epoch < :finish_epoch'),
+    ('plot_id', 'f.plot_id = :plot_id'),
+    ('cultivar', 'c.name = :cultivar'),
+)
+
+# The order of the files returned by the file lookups
+FILE_ORDER = 'ORDER BY f.start_time_epoch, f.id'
+
+# Finds the weather readings over a file's capture time, from its min_weather_id to its max_weather_id inclusive
+FILE_WEATHER_SQL = '''SELECT w.* FROM weather_file_map m
+                      JOIN weather w1 ON w1.id = m.min_weather_id
+                      JOIN weather w2 ON w2.id = m.max_weather_id
+                      JOIN weather w ON w.timestamp_epoch BETWEEN min(w1.timestamp_epoch, w2.timestamp_epoch)
+                          AND max(w1.timestamp_epoch, w2.timestamp_epoch)
+                      WHERE m.file_id = ?
+                      ORDER BY w.timestamp_epoch, w.id'''
+
+# The condition of the files with a name, folder, or plot name containing the text (see
+# generate.create_file_search_table())
+SEARCH_FILES_CONDITION = 'f.id IN (SELECT rowid FROM file_search WHERE file_search MATCH :text)'
+
+
+def get_file_version(db_file: str) -> Optional[tuple]:
+    """Returns values that change when the database file is changed or replaced
+    Arguments:
+        db_file: the path of the database
+    Return:
+        Returns a tuple of the file's inode, modification time, and size, or None if the file doesn't exist
+    """
+    try:
+        file_stat = os.stat(db_file)
+    except OSError:
+        return None
+
+    return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+
+def get_date_epoch_range(start_date: Optional[str], finish_date: Optional[str]) -> tuple:
+    """Returns the epoch range covered by the dates
+    Arguments:
+        start_date: the first date in YYYY-MM-DD format, or None
+        finish_date: the last date in YYYY-MM-DD format (inclusive), or None
+    Return:
+        Returns a tuple of the start (inclusive) and finish (exclusive) epochs, with None for a date that isn't specified
+    Exceptions:
+        Raises ValueError if a date isn't in YYYY-MM-DD format
+    Notes:
+        The epochs are calculated in the same way as the epoch columns of the database, without a time zone
+    """
+    start_epoch, finish_epoch = None, None
+    if start_date:
+        start_epoch = calendar.timegm(time.strptime(start_date, '%Y-%m-%d'))
+    if finish_date:
+        finish_epoch = calendar.timegm(time.strptime(finish_date, '%Y-%m-%d')) + 24 * 60 * 60
+    return start_epoch, finish_epoch
+
+
+def make_files_select(normalized_folders: bool) -> str:
+    """Returns the start of the queries that find files, selecting the columns in FILE_COLUMNS
+    Arguments:
+        normalized_folders: set to True when the database was built with normalized folders, so that the files table
+                            refers to the folders table for the folder of each file
+    Return:
+        Returns the query, without its conditions
+    Notes:
+        The files, season_info, and cultivars tables are queried directly, in the same way as the cultivar_files view,
+        instead of through the unified view. The unified view also joins the weather_files view, which would read the
+        whole weather table for each lookup
+    """
+    columns = ['%s AS %s' % (FILE_COLUMN_SOURCES.get(one_column, 'f.' + one_column), one_column)
+               for one_column in FILE_COLUMNS]
+    if normalized_folders:
+        columns[FILE_COLUMNS.index('folder')] = 'd.folder AS folder'
+    return 'SELECT %s FROM files f LEFT JOIN season_info e ON f.plot_id = e.id ' \
+           'LEFT JOIN cultivars c ON e.cultivar_id = c.id%s' % \
+           (', '.join(columns), ' LEFT JOIN folders d ON f.folder_id = d.id' if normalized_folders else '')
+
+
+def make_files_sql(sensor: Optional[str], start_date: Optional[str], finish_date: Optional[str],
+                   plot_id: Optional[int], cultivar: Optional[str], normalized_folders: bool = False) -> tuple:
+    """Returns the query and parameters to find the files matching the specified filters (see
+    DiscoveryDatabase.find_files() and make_files_select())
+    Return:
+        Returns a tuple of the query and the dictionary of its parameters
+    Notes:
+        The query only has the conditions of the specified filters, so that SQLite can use the indexes of the files
+        table. There are few combinations of filters, and each one's query is prepared once by each connection
+    """
+    start_epoch, finish_epoch = get_date_epoch_range(start_date or finish_date, finish_date or start_date)
+    params = {'sensor': sensor, 'start_epoch': start_epoch, 'finish_epoch': finish_epoch, 'plot_id': plot_id,
+              'cultivar': cultivar}
+    conditions = [condition for name, condition in FILE_FILTERS if params[name] is not None]
+    sql = '%s%s %s' % (make_files_select(normalized_folders),
+                       ' WHERE ' + ' AND '.join(conditions) if conditions else '', FILE_ORDER)
+    return sql, {name: value for name, value in params.items() if value is not None}
+
+
+class ConnectionPool:
+    """Keeps read only connections to a database for reuse"""
+
+    def __init__(self, db_file: str, size: int = DEFAULT_POOL_SIZE, mmap_size: int = DEFAULT_MMAP_SIZE,
+                 immutable: Optional[bool] = None):
+        """Initializes the pool
+        Arguments:
+            db_file: the path of the database
+            size: the maximum number of idle connections to keep
+            mmap_size: the number of bytes of the database each connection reads through memory mapping
+            immutable: when True the database is opened as immutable (see Notes); when None it's opened as immutable
+                       unless it has a write-ahead log, as it does while a progressive build is running
+        Exceptions:
+            Raises RuntimeError if the database doesn't exist
+        Notes:
+            SQLite doesn't lock an immutable database or check it for changes, which saves file system round trips on
+            network file systems. A published database is replaced by renaming a new file over it, so the pool reopens
+            its connections when the file changes
+        """
+        if not os.path.exists(db_file):
+            raise RuntimeError("Unable to find database: '%s'" % db_file)
+        self.db_file = os.path.abspath(db_file)
+        self.size = size
+        self.mmap_size = mmap_size
+        self.immutable = immutable
+        self.lock = threading.Lock()
+        self.idle = []
+        self.version = get_file_version(self.db_file)
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens a new read only connection to the database
+        Return:
+            Returns the connection, whose rows can be accessed by column name as well as by index
+        """
+        immutable = self.immutable
+        if immutable is None:
+            immutable = not os.path.exists(self.db_file + '-wal')
+        uri = 'file:%s?mode=ro%s' % (urllib.parse.quote(self.db_file), '&immutable=1' if immutable else '')
+        logging.debug("Opening database connection: %s", uri)
+
+        db_conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        db_conn.row_factory = sqlite3.Row
+        db_conn.execute('PRAGMA query_only = 1')
+        db_conn.execute('PRAGMA mmap_size = %s' % str(int(self.mmap_size)))
+        return db_conn
+
+    @contextmanager
+    def connection(self):
+        """Provides a connection from the pool for use in a with statement, returning it to the pool afterwards
+        Return:
+            Returns the connection; it's only to be used by one thread at a time
+        """
+        version = get_file_version(self.db_file)
+        with self.lock:
+            if version != self.version:
+                logging.debug("Database '%s' has changed, closing %s pooled connections", self.db_file,
+                              str(len(self.idle)))
+                self._close_idle()
+                self.version = version
+            db_conn = self.idle.pop() if self.idle else None
+        if db_conn is None:
+            db_conn = self.connect()
+
+        try:
+            yield db_conn
+        finally:
+            with self.lock:
+                if len(self.idle) < self.size and version == self.version:
+                    self.idle.append(db_conn)
+                    db_conn = None
+            if db_conn is not None:
+                db_conn.close()
+
+    def _close_idle(self) -> None:
+        """Closes the idle connections; the lock must be held"""
+        for db_conn in self.idle:
+            db_conn.close()
+        self.idle = []
+
+    def close(self) -> None:
+        """Closes the idle connections of the pool; connections in use are closed when they're returned"""
+        with self.lock:
+            self._close_idle()
+            self.size = 0
+
+
+class ResultCache:
+    """Keeps the results of queries, evicting the least recently used results and results older than a maximum age"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES, max_age_sec: int = DEFAULT_CACHE_AGE_SEC):
+        """Initializes the cache
+        Arguments:
+            max_entries: the maximum number of results to keep; zero turns off caching
+            max_age_sec: the number of seconds results are kept
+        """
+        self.max_entries = max_entries
+        self.max_age_sec = max_age_sec
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, loader) -> tuple:
+        """Returns the cached result for the key, calling the loader to get the result when it's not cached
+        Arguments:
+            key: the key of the result
+            loader: function returning the result to cache
+        Return:
+            Returns the result
+        Notes:
+            The loader is called outside of the lock so that other queries aren't blocked
+        """
+        if self.max_entries <= 0:
+            return loader()
+
+        now = time.monotonic()
+        with self.lock:
+            found = self.entries.get(key)
+            if found is not None and now - found[0] <= self.max_age_sec:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return found[1]
+            self.misses += 1
+
+        result = loader()
+
+        with self.lock:
+            self.entries[key] = (now, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return result
+
+    def clear(self) -> None:
+        """Removes all the cached results"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """Returns the statistics of the cache
+        Return:
+            Returns a dictionary of the number of entries, hits, and misses
+        """
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class DiscoveryDatabase:
+    """Runs the common queries of a generated database, caching their results"""
+
+    def __init__(self, db_file: str, pool_size: int = DEFAULT_POOL_SIZE, mmap_size: int = DEFAULT_MMAP_SIZE,
+                 immutable: Optional[bool] = None, cache_entries: int = DEFAULT_CACHE_ENTRIES,
+                 cache_age_sec: int = DEFAULT_CACHE_AGE_SEC):
+        """Initializes the database
+        Arguments:
+            db_file: the path of the generated database
+            pool_size: the maximum number of idle connections to keep (see ConnectionPool)
+            mmap_size: the number of bytes of the database each connection reads through memory mapping
+            immutable: whether the database is opened as immutable (see ConnectionPool)
+            cache_entries: the maximum number of results to cache; zero turns off caching
+            cache_age_sec: the number of seconds results are cached
+        """
+        self.pool = ConnectionPool(db_file, pool_size, mmap_size, immutable)
+        self.cache = ResultCache(cache_entries, cache_age_sec)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the connections to the database"""
+        self.pool.close()
+
+    def query(self, sql: str, params=(), cache: bool = True) -> list:
+        """Runs a query and returns all its rows
+        Arguments:
+            sql: the query, with placeholders for its parameters
+            params: the sequence or dictionary of the query's parameters
+            cache: set to False to run the query even if its results are cached
+        Return:
+            Returns the list of rows, which can be accessed by column name as well as by index
+        Notes:
+            Results are cached by the query, its parameters, and the version of the database file, so that a replaced
+            database isn't answered from the cache
+        """
+        def _load() -> tuple:
+            with self.pool.connection() as db_conn:
+                return tuple(db_conn.execute(sql, params).fetchall())
+
+        if not cache:
+            return list(_load())
+        params_key = tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params)
+        return list(self.cache.get((sql, params_key, get_file_version(self.pool.db_file)), _load))
+
+    def stream(self, sql: str, params=(), chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """Runs a query and returns its rows in chunks, without keeping all of them in memory
+        Arguments:
+            sql: the query, with placeholders for its parameters
+            params: the sequence or dictionary of the query's parameters
+            chunk_rows: the maximum number of rows in each chunk
+        Return:
+            Returns a generator of the lists of rows in each chunk
+        Notes:
+            The connection is kept until the generator is finished or closed. Streamed results aren't cached
+        """
+        with self.pool.connection() as db_conn:
+            cursor = db_conn.execute(sql, params)
+            try:
+                rows = cursor.fetchmany(chunk_rows)
+                while rows:
+                    yield rows
+                    rows = cursor.fetchmany(chunk_rows)
+            finally:
+                cursor.close()
+
+    def has_normalized_folders(self) -> bool:
+        """Returns whether the database was built with normalized folders (see make_files_select())
+        Return:
+            Returns True if the database has a folders table
+        """
+        return self.query("SELECT count(1) FROM sqlite_master WHERE type = 'table' AND name = 'folders'")[0][0] > 0
+
+    def find_files(self, sensor: str = None, start_date: str = None, finish_date: str = None, plot_id: int = None,
+                   cultivar: str = None) -> list:
+        """Finds the files matching all the specified filters
+        Arguments:
+            sensor: the sensor of the files, such as 'RGB'
+            start_date: the first date of the files, in YYYY-MM-DD format
+            finish_date: the last date of the files, in YYYY-MM-DD format; defaults to the start date
+            plot_id: the ID of the plot of the files
+            cultivar: the name of the cultivar of the files' plots
+        Return:
+            Returns the list of files in capture time order, with the columns in FILE_COLUMNS
+        """
+        return self.query(*make_files_sql(sensor, start_date, finish_date, plot_id, cultivar,
+                                          self.has_normalized_folders()))
+
+    def stream_files(self, sensor: str = None, start_date: str = None, finish_date: str = None, plot_id: int = None,
+                     cultivar: str = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """Finds the files matching all the specified filters, returning them in chunks (see find_files() and stream())
+        Return:
+            Returns a generator of the lists of files in each chunk
+        """
+        return self.stream(*make_files_sql(sensor, start_date, finish_date, plot_id, cultivar,
+                                           self.has_normalized_folders()), chunk_rows)
+
+    def file_weather(self, file_id: int) -> list:
+        """Returns the weather readings over a file's capture time
+        Arguments:
+            file_id: the ID of the file
+        Return:
+            Returns the list of rows of the weather table, in time order
+        """
+        return self.query(FILE_WEATHER_SQL, (file_id,))
+
+    def search_files(self, text: str) -> list:
+        """Finds the files having a name, folder, or plot name containing the text
+        Arguments:
+            text: the text to find, of at least three characters; case is ignored
+        Return:
+            Returns the list of matching files in capture time order, with the columns in FILE_COLUMNS
+        Exceptions:
+            Raises RuntimeError if the text is too short, or sqlite3.OperationalError if the database doesn't have a
+            file_search table (see the --file_search option of generate.py)
+        """
+        if len(text) < 3:
+            raise RuntimeError("The text to search for needs to be at least three characters: '%s'" % text)
+        sql = '%s WHERE %s %s' % (make_files_select(self.has_normalized_folders()), SEARCH_FILES_CONDITION, FILE_ORDER)
+        return self.query(sql, {'text': '"%s"' % text.replace('"', '""')})
@@ -2,20 +2,39 @@
 """Generates a SQLite database for discovering files
 """
 import argparse
+import bisect
+import calendar
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import csv
 from datetime import datetime, timedelta
+import functools
+import hashlib
+import heapq
+import importlib.util
+import itertools
 import json
 import logging
+import mmap
+import multiprocessing
 import os
+import shutil
 import sqlite3
+import sys
 import tempfile
+import threading
+import time
 from typing import Callable
 from typing import Optional
-import shutil
 import re
 import requests
 from osgeo import ogr
+from osgeo import osr
 from dateutil.parser import parse
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 LOCAL_START_PATH = '/home/jovyan/work/data/terraref/sites/ua-mac'
 LOCAL_ENVIRONMENT_LOGGER_PATH = 'raw_data/EnvironmentLogger'
@@ -36,9 +55,367 @@ PLOT_INCLUSION_FILTERS = {'city': 'Maricopa'}
 # Regex expression for TERRAREF-style timestamps
 TERRAREF_TIMESTAMP_REGEX = '[0-9]{4}-[0-9]{2}-[0-9]{2}__[0-9]{2}-[0-9]{2}-[0-9]{2}-[0-9]{1,3}'
 
+# Regex expression for the timestamp in EnvironmentLogger file names
+ENVIRONMENT_LOGGER_FILE_TIMESTAMP_REGEX = '[0-9]{4}-[0-9]{2}-[0-9]{2}_[0-9]{2}-[0-9]{2}-[0-9]{2}'
+
+# The start of the epoch used for integer timestamps
+EPOCH_START = datetime(1970, 1, 1)
+
+# Default number of seconds added to each side of a file's capture time when pruning weather
+WEATHER_WINDOW_MARGIN_SEC = 60
+
+# Build locations with special meanings; any other build location is the path of a folder to build in
+BUILD_LOCATION_MEMORY = 'memory'
+BUILD_LOCATION_TARGET = 'target'
+
+# The weather measurement columns of the weather table
+WEATHER_MEASUREMENTS = ('temperature', 'illuminance', 'precipitation', 'sun_direction', 'wind_speed', 'wind_direction',
+                        'relative_humidity')
+
+# The EnvironmentLogger weather station readings of each of the weather measurements, in the same order
+WEATHER_READING_KEYS = ('temperature', 'brightness', 'precipitation', 'sunDirection', 'windVelocity', 'windDirection',
+                        'relHumidity')
+
+# The weather rollup tables and the number of seconds each of their rows covers
+WEATHER_ROLLUPS = (('weather_1min', 60), ('weather_1h', 3600))
+
+# The smallest number of weather files worth starting another process to parse (see load_weather_files())
+WEATHER_FILES_PER_WORKER = 16
+
+# Engines for matching files to weather
+WEATHER_MATCH_PYTHON = 'python'
+WEATHER_MATCH_SQL = 'sql'
+
+# Layouts of the cultivar genes: a column for each gene, or a row for each cultivar and gene
+GENE_LAYOUT_WIDE = 'wide'
+GENE_LAYOUT_LONG = 'long'
+
+# The values stored for the cultivar gene file's text values that indicate there's no gene information
+CULTIVAR_GENE_SENTINELS = {'No WGS': -1, 'NA': -2}
+
+# The number of values of gene files that are converted and inserted together
+GENE_IMPORT_BATCH_VALUES = 100000
+
+# The version of the gene cache databases, which is changed when the imported tables change, and the table in each of
+# them describing the import (see get_save_cached_genes())
+GENE_CACHE_VERSION = 1
+GENE_CACHE_INFO_TABLE = 'gene_cache_info'
+
+# The number of bytes read at a time when hashing a file
+FILE_HASH_CHUNK_SIZE = 1024 * 1024
+
+# The table recording the completed stages of a build, and the arguments that don't change what's built
+BUILD_JOURNAL_TABLE = 'build_journal'
+BUILD_SIGNATURE_IGNORE_ARGS = ('debug', 'build_location', 'resume', 'weather_workers', 'gene_cache_folder',
+                               'export_folder', 'export_format', 'export_tables', 'plan')
+
+# The table readers of a progressively built database use to find what's been completed
+BUILD_PROGRESS_TABLE = 'build_progress'
+
+# The limits of the caches kept between builds by a long running process; caching is off when max_entries is zero
+CACHE_SETTINGS = {'max_entries': 0, 'max_age_sec': 0}
+CACHES = {}
+CACHES_LOCK = threading.Lock()
+
+# The inventory of the site's folders and files used by the current thread's build instead of the file system (see
+# use_inventory())
+INVENTORY = threading.local()
+
+# The versions of the files and folders already looked up by the current thread, when they're remembered (see
+# remember_path_versions())
+PATH_VERSIONS = threading.local()
+
+# How files are assigned to plots: by the plot names in their paths, or by their gantry positions
+PLOT_ASSIGNMENT_PATH = 'path'
+PLOT_ASSIGNMENT_SPATIAL = 'spatial'
+
+# The field scanner's calibration of gantry positions to UTM coordinates, as (a, b, c) for each of the UTM X and Y
+# coordinates where a coordinate is a + b * gantry_x + c * gantry_y, and the EPSG code of the UTM zone (12N)
+GANTRY_UTM_COEFFICIENTS = ((409012.2032, 0.009, -0.9986), (3659974.971, 1.0002, 0.0078))
+GANTRY_UTM_EPSG = 32612
+
+# The blocks of the LemnaTec metadata saved for each file in the file_metadata table
+FILE_METADATA_KEYS = ('gantry_system_variable_metadata', 'sensor_variable_metadata', 'gantry_system_fixed_metadata',
+                      'sensor_fixed_metadata')
+
+# The types that file_metadata columns can be declared as
+METADATA_COLUMN_TYPES = ('NUMERIC', 'INTEGER', 'REAL', 'TEXT')
+
+# The full text index of the files' names, folders, and plot names, and its columns
+FILE_SEARCH_TABLE = 'file_search'
+FILE_SEARCH_COLUMNS = ('filename', 'folder', 'plot_name')
+
+# The number of folders of each sensor and date, weather files of each date, and rows of gene files read to plan a build
+PLAN_SAMPLE_FOLDERS = 3
+PLAN_SAMPLE_WEATHER_FILES = 2
+PLAN_SAMPLE_GENE_ROWS = 20
+
+# The rates of the stages of a build on one CPU, and the bytes each row adds to the database, for planning builds. The
+# rates were measured with the benchmarks and a build of 2400 files and 34560 weather readings, with the metadata rate
+# being that of parsing JSON
+PLAN_RATES = {'files_per_sec': 8000, 'metadata_bytes_per_sec': 50000000, 'weather_readings_per_sec': 25000,
+              'weather_map_files_per_sec': 4000,
+              'gene_values_per_sec': {GENE_LAYOUT_WIDE: 2000000, GENE_LAYOUT_LONG: 250000}}
+PLAN_ROW_BYTES = {'files': 550, 'weather': 150, 'file_metadata': 1,
+                  'gene_value': {GENE_LAYOUT_WIDE: 2, GENE_LAYOUT_LONG: 24}}
+
+# The first command line argument that runs the builds of a manifest instead of a single build
+BATCH_COMMAND = 'batch'
+
+# The first command line argument that copies part of an existing database to a new database
+CARVE_COMMAND = 'carve'
+
+# The first command line argument that exports tables of an existing database to columnar files
+EXPORT_COMMAND = 'export'
+
+# The formats tables can be exported in: Parquet and Arrow IPC files (with pyarrow), or compressed NumPy arrays
+EXPORT_FORMAT_PARQUET = 'parquet'
+EXPORT_FORMAT_ARROW = 'arrow'
+EXPORT_FORMAT_NUMPY = 'numpy'
+EXPORT_FORMATS = (EXPORT_FORMAT_PARQUET, EXPORT_FORMAT_ARROW, EXPORT_FORMAT_NUMPY)
+
+# The tables and views exported by default, and the number of rows read and written at a time
+EXPORT_TABLES = ('unified', 'files', 'weather')
+EXPORT_CHUNK_ROWS = 100000
+
 # NOTE: SENSOR_MAPS global variable is defined after the mapping and other top-level functions (see below)
 
 
+def enable_caches(max_entries: int, max_age_sec: int) -> None:
+    """Turns on the caching of reference data, folder contents, and parsed files between builds
+    Arguments:
+        max_entries: the maximum number of entries to keep in each cache; zero turns caching off
+        max_age_sec: the number of seconds an entry is kept for
+    Notes:
+        Intended for long running processes that make many builds. Folder contents and parsed files are cached by
+        their modification time, so that changes are picked up, while data fetched from BETYdb and BRAPI is only
+        fetched again once its cache entry has expired
+    """
+    with CACHES_LOCK:
+        CACHE_SETTINGS['max_entries'] = max_entries
+        CACHE_SETTINGS['max_age_sec'] = max_age_sec
+        CACHES.clear()
+
+
+def get_cache_stats() -> dict:
+    """Returns the number of entries, hits, and misses of each cache
+    Return:
+        Returns a dictionary of cache names, each associated with a dictionary of its statistics
+    """
+    with CACHES_LOCK:
+        return {name: {'entries': len(cache['entries']), 'hits': cache['hits'], 'misses': cache['misses']}
+                for name, cache in CACHES.items()}
+
+
+def cached_value(cache_name: str, key: tuple, loader: Callable):
+    """Returns the cached value for the key, calling the loader to get the value when it's not cached
+    Arguments:
+        cache_name: the name of the cache to use
+        key: the key of the value in the cache
+        loader: function returning the value to cache
+    Return:
+        Returns the value
+    Notes:
+        The least recently used entries are evicted when a cache is full. Cached values are shared by all builds
+        and must not be modified. The loader is called outside of the lock so that concurrent builds aren't blocked
+    """
+    max_entries = CACHE_SETTINGS['max_entries']
+    if max_entries <= 0:
+        return loader()
+
+    now = time.monotonic()
+    with CACHES_LOCK:
+        cache = CACHES.setdefault(cache_name, {'entries': OrderedDict(), 'hits': 0, 'misses': 0})
+        found = cache['entries'].get(key)
+        if found is not None and now - found[0] <= CACHE_SETTINGS['max_age_sec']:
+            cache['entries'].move_to_end(key)
+            cache['hits'] += 1
+            return found[1]
+        cache['misses'] += 1
+
+    value = loader()
+
+    with CACHES_LOCK:
+        cache['entries'][key] = (now, value)
+        cache['entries'].move_to_end(key)
+        while len(cache['entries']) > max_entries:
+            cache['entries'].popitem(last=False)
+
+    return value
+
+
+def cached_values(cache_name: str, keys: list, loader: Callable) -> list:
+    """Returns the cached values for the keys, calling the loader once for all the keys whose values aren't cached
+    Arguments:
+        cache_name: the name of the cache to use
+        keys: the list of keys of the values in the cache
+        loader: function returning the list of values of the list of keys it's called with, in the same order
+    Return:
+        Returns the list of values in the same order as the keys
+    Notes:
+        Allows the values that aren't cached to be loaded together, such as in parallel (see cached_value())
+    """
+    max_entries = CACHE_SETTINGS['max_entries']
+    if max_entries <= 0:
+        return loader(keys)
+
+    now = time.monotonic()
+    values = [None] * len(keys)
+    missing_indexes = []
+    with CACHES_LOCK:
+        cache = CACHES.setdefault(cache_name, {'entries': OrderedDict(), 'hits': 0, 'misses': 0})
+        for idx, one_key in enumerate(keys):
+            found = cache['entries'].get(one_key)
+            if found is not None and now - found[0] <= CACHE_SETTINGS['max_age_sec']:
+                cache['entries'].move_to_end(one_key)
+                cache['hits'] += 1
+                values[idx] = found[1]
+            else:
+                cache['misses'] += 1
+                missing_indexes.append(idx)
+
+    if not missing_indexes:
+        return values
+
+    loaded_values = loader([keys[idx] for idx in missing_indexes])
+
+    with CACHES_LOCK:
+        for idx, one_value in zip(missing_indexes, loaded_values):
+            values[idx] = one_value
+            cache['entries'][keys[idx]] = (now, one_value)
+            cache['entries'].move_to_end(keys[idx])
+        while len(cache['entries']) > max_entries:
+            cache['entries'].popitem(last=False)
+
+    return values
+
+
+def load_inventory(inventory_file: str, root_folder: str) -> dict:
+    """Loads an inventory of folders and files
+    Arguments:
+        inventory_file: the path of the inventory file (see Notes)
+        root_folder: the folder that relative paths in the inventory are relative to
+    Return:
+        Returns a dictionary with a 'folders' dictionary of folder paths, each associated with the list of its contents
+        (see local_folder_list()), and a 'versions' dictionary of paths, each associated with its modification time and
+        size (see get_path_version())
+    Exceptions:
+        Raises RuntimeError if the inventory doesn't have any entries
+    Notes:
+        Each line of the inventory has the path, size, modification time in seconds since the epoch, and type separated
+        by tabs, as written by "find <folder> -printf '%p\\t%s\\t%T@\\t%y\\n'". The type is 'd' for folders, or 'dir';
+        everything else is treated as a file. Lines that can't be parsed, such as headers, are skipped. Folders that
+        aren't listed themselves are added for the files and folders they contain
+    """
+    folders = {}
+    versions = {}
+    listed_paths = set()
+    line_count = 0
+    skipped_count = 0
+    with open(inventory_file, 'r') as in_file:
+        for one_line in in_file:
+            line_count += 1
+            values = one_line.rstrip('\n').split('\t')
+            try:
+                path, size, mtime, entry_type = values[0], int(values[1]), float(values[2]), values[3]
+            except (IndexError, ValueError):
+                skipped_count += 1
+                continue
+
+            path = os.path.normpath(os.path.join(root_folder, path))
+            versions[path] = (int(mtime * 1000000000), size)
+            if entry_type in ('d', 'dir'):
+                folders.setdefault(path, [])
+                entry_type = 'dir'
+            else:
+                entry_type = 'file'
+
+            # Add the entry to its folder, adding any folders that haven't been seen yet
+            while path not in listed_paths:
+                listed_paths.add(path)
+                parent_path, name = os.path.split(path)
+                if not name or parent_path == path:
+                    break
+                folders.setdefault(parent_path, []).append({'name': name, 'type': entry_type})
+                path, entry_type = parent_path, 'dir'
+
+    if skipped_count:
+        logging.debug("Skipped %s of %s inventory lines", str(skipped_count), str(line_count))
+    if not versions:
+        raise RuntimeError("No entries were found in inventory file '%s'" % inventory_file)
+    logging.info("Loaded inventory of %s entries in %s folders", str(len(versions)), str(len(folders)))
+
+    return {'folders': folders, 'versions': versions}
+
+
+def use_inventory(inventory: Optional[dict]) -> None:
+    """Sets the inventory that the current thread uses instead of the file system to find folders and files
+    Arguments:
+        inventory: the inventory to use (see load_inventory()), or None to use the file system
+    """
+    INVENTORY.current = inventory
+
+
+def get_inventory() -> Optional[dict]:
+    """Returns the inventory used by the current thread (see use_inventory())
+    Return:
+        Returns the inventory or None if the file system is used
+    """
+    return getattr(INVENTORY, 'current', None)
+
+
+def remember_path_versions(path_versions: Optional[dict]) -> None:
+    """Sets the dictionary the current thread remembers the versions of files and folders in, so that each one is only
+    looked up once (see get_path_version())
+    Arguments:
+        path_versions: the dictionary to remember the versions in, or None to look up the versions every time
+    Notes:
+        Changes to the files and folders aren't noticed while their versions are remembered, so this is only used while
+        they're expected to stay the same, such as for the builds of a batch
+    """
+    PATH_VERSIONS.current = path_versions
+
+
+def get_path_version(path: str) -> Optional[tuple]:
+    """Returns values that change when the file or folder is changed, for use in cache keys
+    Arguments:
+        path: the path of the file or folder
+    Return:
+        Returns a tuple of the modification time and size, or None if the path doesn't exist
+    """
+    inventory = get_inventory()
+    if inventory is not None:
+        return inventory['versions'].get(os.path.normpath(path))
+
+    path_versions = getattr(PATH_VERSIONS, 'current', None)
+    if path_versions is not None and path in path_versions:
+        return path_versions[path]
+
+    try:
+        path_stat = os.stat(path)
+        path_version = path_stat.st_mtime_ns, path_stat.st_size
+    except OSError:
+        path_version = None
+
+    if path_versions is not None:
+        path_versions[path] = path_version
+    return path_version
+
+
+def load_json_file(json_path: str):
+    """Loads a JSON file, using the cache when enabled (see enable_caches())
+    Arguments:
+        json_path: the path of the file to load
+    Return:
+        Returns the loaded JSON, which must not be modified
+    """
+    def _load():
+        with open(json_path, 'r') as in_file:
+            return json.load(in_file)
+
+    return cached_value('json_files', (json_path, get_path_version(json_path)), _load)
+
+
 def local_folder_list(folder_path: str) -> list:
     """Returns the contents of the folder as a list
     Arguments:
@@ -47,6 +424,24 @@ def local_folder_list(folder_path: str) -> list:
         Returns a list of dictionary entries consisting of the following keys:
             'name': the name of the file or folder found
             'type': one of 'file' or 'dir', with the latter indicating a sub-folder
+    Notes:
+        The returned list is cached, when caching is enabled (see enable_caches()), and must not be modified. When an
+        inventory is used the list comes from the inventory (see use_inventory())
+    """
+    inventory = get_inventory()
+    if inventory is not None:
+        return inventory['folders'].get(os.path.normpath(folder_path), [])
+
+    return cached_value('folders', (folder_path, get_path_version(folder_path)),
+                        lambda: _read_folder_list(folder_path))
+
+
+def _read_folder_list(folder_path: str) -> list:
+    """Reads the contents of the folder (see local_folder_list())
+    Arguments:
+        folder_path: the path of the folder to search
+    Returns:
+        Returns a list of dictionary entries
     """
     return_list = []
     if not os.path.exists(folder_path):
@@ -126,9 +521,8 @@ def _map_las_file_to_metadata(file_directory: str, file_name: str) -> Optional[s
             dtm_path = os.path.join(file_directory, one_entry['name'])
             if not dtm_path:
                 raise RuntimeError("Unable to retrieve LAS Merged DTM: %s" % one_entry['name'])
-            with open(dtm_path, 'r') as in_file:
-                dtm = json.load(in_file)
-                break
+            dtm = load_json_file(dtm_path)
+            break
     if dtm is None:
         logging.warning("Unable to find DTM JSON file associated with '%s'", os.path.join(file_directory, file_name))
         return None
@@ -214,6 +608,67 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
                         help='column index in cultivar gene file identifying cultivars (columns start at 0 - defaults to 0)')
     parser.add_argument('--cultivar_gene_map_file_ignore', type=int,
                         help='the number of rows to ignore from the start of the cultivar gene map file')
+    parser.add_argument('--gene_layout', choices=[GENE_LAYOUT_WIDE, GENE_LAYOUT_LONG], default=GENE_LAYOUT_WIDE,
+                        help='how cultivar genes are stored: a column for each gene, or a row for each cultivar and gene '
+                        '(defaults to %s)' % GENE_LAYOUT_WIDE)
+    parser.add_argument('--gene_pivot',
+                        help='comma separated list of genes to include as columns in the views when the gene layout is %s' %
+                        GENE_LAYOUT_LONG)
+    parser.add_argument('--gene_cache_folder',
+                        help="folder of previously imported gene files to copy into the database instead of importing the "
+                        "files again; files that aren't in the cache are imported into it")
+    parser.add_argument('--prune_weather', action="store_true",
+                        help="only store the weather readings in, or bracketing, the capture times of the files")
+    parser.add_argument('--prune_weather_margin', type=int, default=WEATHER_WINDOW_MARGIN_SEC,
+                        help='seconds added to each side of a file capture time when pruning weather (defaults to %s)' %
+                        str(WEATHER_WINDOW_MARGIN_SEC))
+    parser.add_argument('--weather_match', choices=[WEATHER_MATCH_PYTHON, WEATHER_MATCH_SQL], default=WEATHER_MATCH_PYTHON,
+                        help='how files are matched to weather: in Python or with a query in SQLite (defaults to %s)' %
+                        WEATHER_MATCH_PYTHON)
+    parser.add_argument('--compact_schema', action="store_true",
+                        help="key tables on their IDs instead of creating separate ID indexes, for a smaller database")
+    parser.add_argument('--normalize_folders', action="store_true",
+                        help="store each folder once in a folders table that the files table refers to")
+    parser.add_argument('--plot_assignment', choices=[PLOT_ASSIGNMENT_PATH, PLOT_ASSIGNMENT_SPATIAL],
+                        default=PLOT_ASSIGNMENT_PATH,
+                        help='how files are assigned to plots: by the plot name in their path, or by the gantry position in '
+                        'their metadata falling back to their path (defaults to %s)' % PLOT_ASSIGNMENT_PATH)
+    parser.add_argument('--file_metadata', action="store_true",
+                        help="save the LemnaTec metadata of each file as JSON in a file_metadata table")
+    parser.add_argument('--metadata_columns',
+                        help='comma separated list of name=path pairs of indexed file_metadata columns, where each path is '
+                        'a JSON path into the metadata such as $.gantry_system_variable_metadata.speed; a name can be '
+                        'followed by a colon and the column type (one of %s, defaults to NUMERIC)' %
+                        ','.join(METADATA_COLUMN_TYPES))
+    parser.add_argument('--file_search', action="store_true",
+                        help="index the file names, folders, and plot names in a %s table for finding files by any part of "
+                        "them" % FILE_SEARCH_TABLE)
+    parser.add_argument('--build_location',
+                        help='where to build the database before publishing it to the output file: "%s", "%s" (the folder of '
+                        'the output file), or the path of a folder such as a tmpfs mount (defaults to the system temporary '
+                        'folder)' % (BUILD_LOCATION_MEMORY, BUILD_LOCATION_TARGET))
+    parser.add_argument('--resume', action="store_true",
+                        help="keep the working database if the build fails and continue from the last completed stage when "
+                        "run again with the same arguments (can't be used with an in memory build location)")
+    parser.add_argument('--inventory_file',
+                        help="path of a listing of the site's folders and files to use instead of listing the folders (see "
+                        "the README for its format)")
+    parser.add_argument('--progressive', action="store_true",
+                        help="build directly in the output file, in WAL mode, so that it can be queried as each date is "
+                        "completed (see the build_progress table)")
+    parser.add_argument('--plan', action="store_true",
+                        help="estimate the size of the database and the time to build it by sampling the folders, and "
+                        "print the estimates as JSON without building the database")
+    parser.add_argument('--weather_workers', type=int, default=0,
+                        help="the number of processes to parse weather files with (defaults to one per CPU)")
+    parser.add_argument('--export_folder',
+                        help="folder to export the tables to as columnar files after the database is published")
+    parser.add_argument('--export_format', choices=EXPORT_FORMATS,
+                        help="the format to export in (defaults to %s when pyarrow is installed, and %s otherwise)" %
+                        (EXPORT_FORMAT_PARQUET, EXPORT_FORMAT_NUMPY))
+    parser.add_argument('--export_tables', default=','.join(EXPORT_TABLES),
+                        help="comma separated list of the tables and views to export (defaults to %s)" %
+                        ','.join(EXPORT_TABLES))
 
     parser.epilog = 'All specified dates need to be in "YYYY-MM-DD" format; date ranges are two dates separated by a '\
         'colon (":") and are inclusive. Environment variables of BETYDB_URL, BETYDB_KEY, BRAPI_URL are supported'
@@ -340,6 +795,43 @@ def prepare_dates(dates_arg: str) -> tuple:
     return tuple(dates)
 
 
+def prepare_metadata_columns(metadata_columns_arg: Optional[str]) -> tuple:
+    """Prepares the metadata columns command line parameter for processing
+    Arguments:
+        metadata_columns_arg: the command line parameter value of comma separated name=path pairs; the name can be
+                              followed by a colon and the column's type (see METADATA_COLUMN_TYPES)
+    Return:
+        Returns a tuple of the column names, types, and JSON paths as tuples
+    Exceptions:
+        RuntimeError is raised if a column name isn't a valid name, is used more than once, has an unknown type, or a
+        path doesn't start with '$'
+    Notes:
+        The type of a column is NUMERIC when it's not specified, so that metadata numbers saved as text, such as
+        "102", are compared as numbers
+    """
+    if not metadata_columns_arg:
+        return ()
+
+    metadata_columns = []
+    for one_item in metadata_columns_arg.split(','):
+        if not one_item.strip():
+            continue
+        column_name, _, json_path = one_item.partition('=')
+        column_name, _, column_type = column_name.partition(':')
+        column_name, column_type, json_path = column_name.strip(), column_type.strip().upper() or 'NUMERIC', json_path.strip()
+        if not re.fullmatch('[A-Za-z_][A-Za-z0-9_]*', column_name) or column_name.lower() in ('file_id', 'metadata'):
+            raise RuntimeError("Invalid metadata column name specified: '%s'" % column_name)
+        if column_type not in METADATA_COLUMN_TYPES:
+            raise RuntimeError("Invalid type specified for metadata column %s: '%s'" % (column_name, column_type))
+        if not json_path.startswith('$'):
+            raise RuntimeError("Invalid JSON path specified for metadata column %s: '%s'" % (column_name, json_path))
+        if column_name.lower() in [one_column[0].lower() for one_column in metadata_columns]:
+            raise RuntimeError("Metadata column specified more than once: '%s'" % column_name)
+        metadata_columns.append((column_name, column_type, json_path))
+
+    return tuple(metadata_columns)
+
+
 def get_betydb_url(betydb_url_arg: str) -> str:
     """Returns the BETYdb URL
     Arguments:
@@ -391,8 +883,8 @@ def get_brapi_url(brapi_url_arg: str) -> str:
     return BRAPI_URL
 
 
-def make_timestamp_instance(timestamp_string: str) -> datetime:
-    """Converts a string timestamp to a timestamp object
+def strptime_timestamp_instance(timestamp_string: str) -> datetime:
+    """Converts a string timestamp to a timestamp object using strptime()
     Arguments:
         timestamp_string: the timestamp to convert (see Notes)
     Return:
@@ -408,6 +900,95 @@ def make_timestamp_instance(timestamp_string: str) -> datetime:
     return datetime.strptime(timestamp_string, '%m/%d/%Y %H:%M:%S')
 
 
+@functools.lru_cache(maxsize=4096)
+def _timestamp_prefix_epoch(prefix: str) -> Optional[int]:
+    """Returns the epoch seconds of the start of the hour of the date and hour portion of a timestamp
+    Arguments:
+        prefix: the date and hour portion of the timestamp, either "MM/DD/YYYY HH" or "YYYY.MM.DD-HH"
+    Return:
+        Returns the number of seconds since the epoch, or None if the prefix isn't a fixed width date and hour in a
+        supported format
+    Notes:
+        The results are cached since timestamps from the same hour share the same prefix
+    """
+    if len(prefix) != 13:
+        return None
+    if prefix[4] == '.' and prefix[7] == '.' and prefix[10] == '-':
+        year, month, day = prefix[0:4], prefix[5:7], prefix[8:10]
+    elif prefix[2] == '/' and prefix[5] == '/' and prefix[10] == ' ':
+        month, day, year = prefix[0:2], prefix[3:5], prefix[6:10]
+    else:
+        return None
+    hour = prefix[11:13]
+    if not (year + month + day + hour).isdigit() or int(hour) > 23:
+        return None
+
+    try:
+        return (datetime(int(year), int(month), int(day)) - EPOCH_START).days * 86400 + int(hour) * 3600
+    except ValueError:
+        return None
+
+
+def parse_timestamp_epoch(timestamp_string: str) -> int:
+    """Converts a string timestamp to the number of seconds since the epoch
+    Arguments:
+        timestamp_string: the timestamp to convert (see Notes)
+    Return:
+        Returns the integer number of seconds since 1970-01-01 00:00:00 (see make_timestamp_epoch())
+    Exceptions:
+        Raises ValueError if the timestamp isn't in a supported format
+    Notes:
+        Accepts the same timestamp formats as strptime_timestamp_instance(). Fixed width timestamps are converted
+        directly, without calling strptime(); anything else is passed to strptime_timestamp_instance()
+    """
+    if len(timestamp_string) == 19 and timestamp_string[13] == ':' and timestamp_string[16] == ':':
+        prefix_epoch = _timestamp_prefix_epoch(timestamp_string[:13])
+        minutes, seconds = timestamp_string[14:16], timestamp_string[17:19]
+        if prefix_epoch is not None and (minutes + seconds).isdigit():
+            minutes, seconds = int(minutes), int(seconds)
+            if minutes < 60 and seconds < 60:
+                return prefix_epoch + minutes * 60 + seconds
+
+    return make_timestamp_epoch(strptime_timestamp_instance(timestamp_string))
+
+
+def timestamp_from_epoch(epoch: int) -> datetime:
+    """Converts the number of seconds since the epoch to a timestamp object
+    Arguments:
+        epoch: the number of seconds since 1970-01-01 00:00:00
+    Return:
+        Returns the timestamp object, with no time zone, representing the epoch value
+    """
+    return EPOCH_START + timedelta(seconds=epoch)
+
+
+def make_timestamp_instance(timestamp_string: str) -> datetime:
+    """Converts a string timestamp to a timestamp object
+    Arguments:
+        timestamp_string: the timestamp to convert (see Notes)
+    Return:
+        Returns a timestamp object representing the timestamp passed in
+    Notes:
+        Only accepts timestamp strings with the following format:
+            "MM/DD/YYYY HH:MI:SS"
+            "YYYY.MM.DD-HH:MI:SS"
+    """
+    return timestamp_from_epoch(parse_timestamp_epoch(timestamp_string))
+
+
+def make_timestamp_epoch(timestamp: datetime) -> int:
+    """Converts a timestamp object to the number of seconds since the epoch
+    Arguments:
+        timestamp: the timestamp to convert
+    Return:
+        Returns the integer number of seconds since 1970-01-01 00:00:00
+    Notes:
+        No time zone conversion is performed; the timestamp is treated as being in the same time zone as the epoch so that
+        the returned values sort in the same order as the site-local timestamps they're generated from
+    """
+    return calendar.timegm(timestamp.timetuple())
+
+
 def get_experiments_by_dates(dates: tuple, betydb_url: str, betydb_key: str, experiment_json_file: str = None) -> tuple:
     """Retrieves the experiments associated with dates
     Arguments:
@@ -429,13 +1010,15 @@ def get_experiments_by_dates(dates: tuple, betydb_url: str, betydb_key: str, exp
 
         # Get the experiments and find matches
         url = os.path.join(betydb_url, 'api/v1/experiments')
-        result = requests.get(url, params=query_params, verify=False)
-        result.raise_for_status()
 
-        result_json = result.json()
+        def _fetch():
+            result = requests.get(url, params=query_params, verify=False)
+            result.raise_for_status()
+            return result.json()
+
+        result_json = cached_value('betydb', (url, betydb_key), _fetch)
     else:
-        with open(experiment_json_file, "r") as in_file:
-            result_json = json.load(in_file)
+        result_json = load_json_file(experiment_json_file)
     if 'data' in result_json:
         experiments = result_json['data']
     else:
@@ -492,7 +1075,19 @@ def get_cultivars_brapi(study_id: str, brapi_url: str) -> list:
     Returns:
         Returns the list of results containing the information on the study
     Notes:
-        Will make calls until all pages of data are returned for the study
+        Will make calls until all pages of data are returned for the study. The results are cached when caching is
+        enabled (see enable_caches())
+    """
+    return cached_value('brapi', (str(study_id), brapi_url), lambda: _fetch_cultivars_brapi(study_id, brapi_url))
+
+
+def _fetch_cultivars_brapi(study_id: str, brapi_url: str) -> list:
+    """Fetches the cultivar information of a study from BRAPI (see get_cultivars_brapi())
+    Arguments:
+        study_id: the ID of the study (experiment in BETYdb terms)
+        brapi_url: the base BRAPI URL to use when making calls
+    Returns:
+        Returns the list of results containing the information on the study
     """
     base_url = os.path.join(brapi_url, 'studies', str(study_id), 'layouts')
     params = {'page': -1}   # Start at -1 since we pre-increment before making a call
@@ -570,8 +1165,24 @@ def get_bounds_from_wkt(wkt: str) -> tuple:
     return envelope[2], envelope[0], envelope[3], envelope[1]
 
 
+def id_column_definition(column_name: str, compact_schema: bool) -> str:
+    """Returns the SQL definition of an integer ID column of a table
+    Arguments:
+        column_name: the name of the column
+        compact_schema: when True the column is defined as an alias of the table's rowid (see Notes)
+    Return:
+        Returns the column definition for use in a CREATE TABLE statement
+    Notes:
+        A rowid alias (INTEGER PRIMARY KEY) is stored as the key of the table's B-tree, instead of being stored in each row
+        and again in a separate unique index
+    """
+    if compact_schema:
+        return column_name + ' INTEGER PRIMARY KEY'
+    return column_name + ' INTEGER'
+
+
 def get_save_experiments(dates: tuple, db_conn: sqlite3.Connection, betydb_url: str, betydb_key: str,
-                         brapi_url: str, experiment_json_file: str = None) -> Optional[tuple]:
+                         brapi_url: str, experiment_json_file: str = None, compact_schema: bool = False) -> Optional[tuple]:
     """Retrieves the experiments associated with the dates and saves them into the database
     Arguments:
         dates: the dates to fetch experiment information on
@@ -580,6 +1191,7 @@ def get_save_experiments(dates: tuple, db_conn: sqlite3.Connection, betydb_url:
         betydb_key: the key to use in association with the BETYdb URL
         brapi_url: the BRAPI URL to fetch data from
         experiment_json_file: optional path to json file containing experiment data from BETYdb
+        compact_schema: when True the table is keyed on its unique columns, instead of having a separate index
     Return:
         A tuple consisting of the list of experiments saved to the SQLite database, a list of their associated cultivars,
         and a dictionary of dates with their associated experiment IDs
@@ -606,9 +1218,15 @@ def get_save_experiments(dates: tuple, db_conn: sqlite3.Connection, betydb_url:
 
     # Create the experiments table
     exp_cursor = db_conn.cursor()
-    exp_cursor.execute('''CREATE TABLE season_info
-                          (id INTEGER, plot_name TEXT, season_id INTEGER, season TEXT, cultivar_id INTEGER, 
-                          plot_bb_min_lat FLOAT, plot_bb_min_lon FLOAT, plot_bb_max_lat FLOAT, plot_bb_max_lon FLOAT)''')
+    if compact_schema:
+        exp_cursor.execute('''CREATE TABLE season_info
+                              (id INTEGER, plot_name TEXT, season_id INTEGER, season TEXT, cultivar_id INTEGER,
+                              plot_bb_min_lat FLOAT, plot_bb_min_lon FLOAT, plot_bb_max_lat FLOAT, plot_bb_max_lon FLOAT,
+                              PRIMARY KEY (id, cultivar_id)) WITHOUT ROWID''')
+    else:
+        exp_cursor.execute('''CREATE TABLE season_info
+                              (id INTEGER, plot_name TEXT, season_id INTEGER, season TEXT, cultivar_id INTEGER, 
+                              plot_bb_min_lat FLOAT, plot_bb_min_lon FLOAT, plot_bb_max_lat FLOAT, plot_bb_max_lon FLOAT)''')
 
     # Insert the data and commit every so often
     problem_found = False
@@ -667,7 +1285,8 @@ def get_save_experiments(dates: tuple, db_conn: sqlite3.Connection, betydb_url:
                 num_inserted = 0
 
     # Create an index
-    exp_cursor.execute("CREATE UNIQUE INDEX 'season_info_index' on 'season_info' ('id', 'cultivar_id' asc)")
+    if not compact_schema:
+        exp_cursor.execute("CREATE UNIQUE INDEX 'season_info_index' on 'season_info' ('id', 'cultivar_id' asc)")
 
     db_conn.commit()
     exp_cursor.close()
@@ -682,16 +1301,21 @@ def get_save_experiments(dates: tuple, db_conn: sqlite3.Connection, betydb_url:
     return found_experiments, cultivars_matched, date_experiment_ids
 
 
-def save_cultivars(cultivars: list, db_conn: sqlite3.Connection) -> None:
+def save_cultivars(cultivars: list, db_conn: sqlite3.Connection, compact_schema: bool = False) -> None:
     """Saves the cultivars to the database
     Arguments:
         cultivars: the list of cultivars to save
         db_conn: the database to write to
+        compact_schema: when True the table is keyed on its unique columns, instead of having a separate index
     """
     # Create the cultivars table
     cult_cursor = db_conn.cursor()
-    cult_cursor.execute('''CREATE TABLE cultivars
-                          (id INTEGER, name TEXT)''')
+    if compact_schema:
+        cult_cursor.execute('''CREATE TABLE cultivars
+                              (id INTEGER, name TEXT, PRIMARY KEY (id, name)) WITHOUT ROWID''')
+    else:
+        cult_cursor.execute('''CREATE TABLE cultivars
+                              (id INTEGER, name TEXT)''')
 
     # Write to the table
     num_inserted = 0
@@ -706,7 +1330,8 @@ def save_cultivars(cultivars: list, db_conn: sqlite3.Connection) -> None:
             num_inserted = 0
 
     # Create an index
-    cult_cursor.execute("CREATE UNIQUE INDEX 'cultivars_index' on 'cultivars' ('id', 'name' asc)")
+    if not compact_schema:
+        cult_cursor.execute("CREATE UNIQUE INDEX 'cultivars_index' on 'cultivars' ('id', 'name' asc)")
 
     db_conn.commit()
     cult_cursor.close()
@@ -813,16 +1438,15 @@ def local_get_files_details(date_files_info: dict) -> Optional[dict]:
             fixed_metadata = {}
             local_path = one_file['json_file']
             logging.debug("Loading JSON file %s for file %s", local_path, one_file['filename'])
-            with open(local_path, 'r') as in_file:
-                metadata = json.load(in_file)
-                if 'lemnatec_measurement_metadata' in metadata:
-                    lmm = metadata['lemnatec_measurement_metadata']
-                    for one_key in ['gantry_system_variable_metadata', 'sensor_variable_metadata']:
-                        if one_key in lmm:
-                            variable_metadata[one_key] = lmm[one_key]
-                    for one_key in ['gantry_system_fixed_metadata', 'sensor_fixed_metadata']:
-                        if one_key in lmm:
-                            fixed_metadata[one_key] = lmm[one_key]
+            metadata = load_json_file(local_path)
+            if 'lemnatec_measurement_metadata' in metadata:
+                lmm = metadata['lemnatec_measurement_metadata']
+                for one_key in ['gantry_system_variable_metadata', 'sensor_variable_metadata']:
+                    if one_key in lmm:
+                        variable_metadata[one_key] = lmm[one_key]
+                for one_key in ['gantry_system_fixed_metadata', 'sensor_fixed_metadata']:
+                    if one_key in lmm:
+                        fixed_metadata[one_key] = lmm[one_key]
 
             pos_x, pos_y, pos_z, start_time = None, None, None, None
             if 'gantry_system_variable_metadata' in variable_metadata:
@@ -951,8 +1575,142 @@ def map_file_to_plot_id(file_path: str, season_id: str, seasons: list) -> str:
     return found_plot_id
 
 
+def gantry_to_latlon(gantry_x, gantry_y, transform) -> Optional[tuple]:
+    """Converts a gantry position to a latitude and longitude
+    Arguments:
+        gantry_x: the gantry's X position, in meters
+        gantry_y: the gantry's Y position, in meters
+        transform: the transformation from UTM coordinates to latitude and longitude (see build_plot_grid())
+    Return:
+        Returns a tuple of the latitude and longitude, or None if the position isn't a pair of numbers
+    Notes:
+        The gantry position is converted to UTM coordinates with the field scanner's calibration (see
+        GANTRY_UTM_COEFFICIENTS) before being converted to a latitude and longitude
+    """
+    try:
+        pos_x, pos_y = float(gantry_x), float(gantry_y)
+    except (TypeError, ValueError):
+        return None
+
+    (ax, bx, cx), (ay, by, cy) = GANTRY_UTM_COEFFICIENTS
+    lon, lat, _ = transform.TransformPoint(ax + bx * pos_x + cx * pos_y, ay + by * pos_x + cy * pos_y)
+    return lat, lon
+
+
+def build_plot_grid(db_conn: sqlite3.Connection) -> dict:
+    """Builds a grid of the plot bounding boxes of each season for finding plots by location
+    Arguments:
+        db_conn: the database containing the season_info table
+    Return:
+        Returns a dictionary with the grid of each season ID, and the transformation for converting gantry positions
+        (see find_plot_by_position())
+    Notes:
+        Each season's grid cells are the size of its largest plot, so each plot overlaps at most four cells and a
+        location only needs the plots of its own cell to be checked
+    """
+    plot_cursor = db_conn.cursor()
+    plot_cursor.execute('''SELECT DISTINCT season_id, id, plot_bb_min_lat, plot_bb_min_lon, plot_bb_max_lat, plot_bb_max_lon
+                           FROM season_info WHERE plot_bb_min_lat IS NOT NULL ORDER BY season_id, id''')
+    season_plots = {}
+    for season_id, plot_id, min_lat, min_lon, max_lat, max_lon in plot_cursor:
+        season_plots.setdefault(season_id, []).append((plot_id, min_lat, min_lon, max_lat, max_lon))
+    plot_cursor.close()
+
+    season_grids = {}
+    for season_id, plots in season_plots.items():
+        cell_lat = max([max_lat - min_lat for _, min_lat, _, max_lat, _ in plots] + [1e-9])
+        cell_lon = max([max_lon - min_lon for _, _, min_lon, _, max_lon in plots] + [1e-9])
+        cells = {}
+        for one_plot in plots:
+            _, min_lat, min_lon, max_lat, max_lon = one_plot
+            for lat_idx in range(int(min_lat // cell_lat), int(max_lat // cell_lat) + 1):
+                for lon_idx in range(int(min_lon // cell_lon), int(max_lon // cell_lon) + 1):
+                    cells.setdefault((lat_idx, lon_idx), []).append(one_plot)
+        season_grids[season_id] = (cell_lat, cell_lon, cells)
+        logging.debug("Built a plot grid of %s cells for %s plots of season %s", str(len(cells)), str(len(plots)),
+                      str(season_id))
+
+    utm_ref = osr.SpatialReference()
+    utm_ref.ImportFromEPSG(GANTRY_UTM_EPSG)
+    latlon_ref = osr.SpatialReference()
+    latlon_ref.ImportFromEPSG(4326)
+    # Keep longitude before latitude, as the WKT geometries of the plots are (GDAL 3 and later swaps them otherwise)
+    if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+        latlon_ref.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    return {'seasons': season_grids, 'transform': osr.CoordinateTransformation(utm_ref, latlon_ref)}
+
+
+def find_plot_by_position(plot_grid: dict, season_id, gantry_x, gantry_y) -> Optional[int]:
+    """Finds the plot containing a gantry position
+    Arguments:
+        plot_grid: the grid of the plots (see build_plot_grid())
+        season_id: the ID of the season to find the plot in
+        gantry_x: the gantry's X position
+        gantry_y: the gantry's Y position
+    Return:
+        Returns the ID of the plot whose bounding box contains the position, or None if the position isn't known or
+        isn't in a plot. When the position is on the shared edge of plots, the plot with the closest center is returned
+    """
+    if season_id not in plot_grid['seasons']:
+        return None
+    location = gantry_to_latlon(gantry_x, gantry_y, plot_grid['transform'])
+    if location is None:
+        return None
+
+    lat, lon = location
+    cell_lat, cell_lon, cells = plot_grid['seasons'][season_id]
+    found_plots = [one_plot for one_plot in cells.get((int(lat // cell_lat), int(lon // cell_lon)), ())
+                   if one_plot[1] <= lat <= one_plot[3] and one_plot[2] <= lon <= one_plot[4]]
+    if not found_plots:
+        return None
+    return min(found_plots, key=lambda one_plot: (lat - (one_plot[1] + one_plot[3]) / 2) ** 2 +
+               (lon - (one_plot[2] + one_plot[4]) / 2) ** 2)[0]
+
+
+def assign_file_plot_id(file_path: str, season_id, seasons: list, file_info: dict, plot_grid: Optional[dict],
+                        disagreements: list) -> int:
+    """Assigns a file to a plot, by its gantry position when a plot grid is specified and by its path otherwise
+    Arguments:
+        file_path: the path to the file
+        season_id: the ID of the season associated with the file
+        seasons: the list of seasons
+        file_info: the details of the file, with its gantry position
+        plot_grid: the grid of the plots to find the plot of the file's position in (see build_plot_grid())
+        disagreements: the list to add the file path and both plot IDs to when the position and path are of different
+                       plots
+    Return:
+        Returns the plot ID
+    Exceptions:
+        Raises RuntimeError if the plot isn't found
+    Notes:
+        The path is used when the file's position isn't known or isn't in a plot, and is always checked against the
+        position so that the differences can be reported
+    """
+    if plot_grid is None:
+        return map_file_to_plot_id(file_path, season_id, seasons)
+
+    position_plot_id = find_plot_by_position(plot_grid, season_id, file_info.get('gantry_x'), file_info.get('gantry_y'))
+    try:
+        path_plot_id = map_file_to_plot_id(file_path, season_id, seasons)
+    except RuntimeError:
+        if position_plot_id is None:
+            raise
+        path_plot_id = None
+
+    if position_plot_id is None:
+        logging.debug("Using the path to find the plot of file %s", file_path)
+        return path_plot_id
+    if path_plot_id is not None and path_plot_id != position_plot_id:
+        logging.info("File %s is positioned in plot %s but its path is of plot %s", file_path, str(position_plot_id),
+                     str(path_plot_id))
+        disagreements.append((file_path, position_plot_id, path_plot_id))
+    return position_plot_id
+
+
 def local_get_save_files(local_folder: str, sensors: tuple, seasons: list, date_season_ids: dict,
-                         db_conn: sqlite3.Connection) -> dict:
+                         db_conn: sqlite3.Connection, compact_schema: bool = False, normalize_folders: bool = False,
+                         metadata_columns: Optional[tuple] = None, plot_assignment: str = PLOT_ASSIGNMENT_PATH) -> dict:
     """Fetches file information associated with the sensors and dates from locally and updates the database
     Arguments:
         local_folder: the local endpoint to access
@@ -960,11 +1718,22 @@ def local_get_save_files(local_folder: str, sensors: tuple, seasons: list, date_
         seasons: the list of seasons
         date_season_ids: dates with their associated season ID
         db_conn: the database to write to
+        compact_schema: when True the file ID is an alias of the table's rowid (see id_column_definition())
+        normalize_folders: when True the folders are saved once in a separate table and the files table refers to them
+                           by their ID in a folder_id column (instead of having a folder column)
+        metadata_columns: when specified, the metadata of each file is saved in the file_metadata table with a column
+                          for each of these names, types, and JSON paths (see prepare_metadata_columns())
+        plot_assignment: how files are assigned to plots (see assign_file_plot_id())
     Return:
         Returns a dictionary of file IDs, and their associated start and finish timestamps as a tuple
     Exceptions:
         RuntimeError is raised if a problem is detected.
         All caught exceptions are logged and re-raised
+    Notes:
+        If the files table already exists the files are added to it, allowing files to be saved one date at a time.
+        The file_metadata table has the blocks of each file's LemnaTec metadata (see FILE_METADATA_KEYS) as compact
+        JSON, keyed by the file's ID. Its metadata columns are generated from the JSON when they're read and are
+        indexed, so that queries filtering on them don't need to read the JSON of every file
     """
     files_timestamp = {}
 
@@ -974,14 +1743,36 @@ def local_get_save_files(local_folder: str, sensors: tuple, seasons: list, date_
 
     # Create the table for file information
     file_cursor = db_conn.cursor()
-    file_cursor.execute('''CREATE TABLE files
-                          (id INTEGER, folder TEXT, filename TEXT, format TEXT, sensor TEXT, start_time TEXT, finish_time TEXT,
-                           gantry_x FLOAT, gantry_y FLOAT, gantry_z FLOAT, plot_id INTEGER, season_id INTEGER)''')
+    file_cursor.execute('''CREATE TABLE IF NOT EXISTS files
+                          (%s, %s, filename TEXT, format TEXT, sensor TEXT, start_time TEXT, finish_time TEXT,
+                           gantry_x FLOAT, gantry_y FLOAT, gantry_z FLOAT, plot_id INTEGER, season_id INTEGER,
+                           start_time_epoch INTEGER, finish_time_epoch INTEGER)''' %
+                        (id_column_definition('id', compact_schema), 'folder_id INTEGER' if normalize_folders else 'folder TEXT'))
+
+    # Create the table for the folders of the files
+    folder_ids = {}
+    if normalize_folders:
+        file_cursor.execute('CREATE TABLE IF NOT EXISTS folders (%s, folder TEXT)' % id_column_definition('id', compact_schema))
+        file_cursor.execute('SELECT folder, id FROM folders')
+        folder_ids = dict(file_cursor.fetchall())
+
+    # Create the table for the metadata of the files
+    if metadata_columns is not None:
+        file_cursor.execute('CREATE TABLE IF NOT EXISTS file_metadata (%s, metadata TEXT%s)' %
+                            (id_column_definition('file_id', compact_schema),
+                             ''.join([", %s %s AS (json_extract(metadata, '%s'))" %
+                                      (column_name, column_type, json_path.replace("'", "''"))
+                                      for column_name, column_type, json_path in metadata_columns])))
+
+    # Find the plots of files by their positions
+    plot_grid = build_plot_grid(db_conn) if plot_assignment == PLOT_ASSIGNMENT_SPATIAL else None
+    plot_disagreements = []
 
     # Loop through each sensor and dates and get the associated file information
     num_inserted = 0
     total_records = 0
-    file_id = 1
+    file_cursor.execute('SELECT coalesce(max(id), 0) + 1 FROM files')
+    file_id = file_cursor.fetchone()[0]
     try:
         for one_sensor in sensors:
             sensor = one_sensor
@@ -1004,16 +1795,33 @@ def local_get_save_files(local_folder: str, sensors: tuple, seasons: list, date_
                     date_files = files[one_date]
                     season_id = date_season_ids[one_date]
                     for one_file in date_files:
-                        plot_id = map_file_to_plot_id(os.path.join(one_file['directory'], one_file['filename']),
-                                                      season_id, seasons)
-                        file_cursor.execute('INSERT INTO files VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                            [file_id, one_file['directory'], one_file['filename'], one_file['format'],
+                        plot_id = assign_file_plot_id(os.path.join(one_file['directory'], one_file['filename']),
+                                                      season_id, seasons, one_file, plot_grid, plot_disagreements)
+                        start_epoch = parse_timestamp_epoch(one_file['start_time'])
+                        finish_epoch = parse_timestamp_epoch(one_file['finish_time'])
+                        folder = one_file['directory']
+                        if normalize_folders:
+                            if one_file['directory'] not in folder_ids:
+                                folder_ids[one_file['directory']] = len(folder_ids) + 1
+                                file_cursor.execute('INSERT INTO folders VALUES(?, ?)',
+                                                    [folder_ids[one_file['directory']], one_file['directory']])
+                            folder = folder_ids[one_file['directory']]
+                        file_cursor.execute('INSERT INTO files VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                            [file_id, folder, one_file['filename'], one_file['format'],
                                              sensor, one_file['start_time'], one_file['finish_time'],
                                              one_file['gantry_x'],
-                                             one_file['gantry_y'], one_file['gantry_z'], plot_id, season_id])
+                                             one_file['gantry_y'], one_file['gantry_z'], plot_id, season_id,
+                                             start_epoch, finish_epoch])
 
-                        files_timestamp[file_id] = (make_timestamp_instance(one_file['start_time']),
-                                                    make_timestamp_instance(one_file['finish_time']))
+                        if metadata_columns is not None:
+                            file_metadata = {**one_file.get('variable_metadata', {}), **one_file.get('fixed_metadata', {})}
+                            if file_metadata:
+                                file_cursor.execute('INSERT INTO file_metadata (file_id, metadata) VALUES(?, ?)',
+                                                    [file_id, json.dumps({key: file_metadata[key] for key in
+                                                                          FILE_METADATA_KEYS if key in file_metadata},
+                                                                         separators=(',', ':'))])
+
+                        files_timestamp[file_id] = (timestamp_from_epoch(start_epoch), timestamp_from_epoch(finish_epoch))
 
                         file_id += 1
                         num_inserted += 1
@@ -1029,7 +1837,22 @@ def local_get_save_files(local_folder: str, sensors: tuple, seasons: list, date_
         raise ex
 
     # Create the indexes
-    file_cursor.execute("CREATE UNIQUE INDEX 'files_index' on 'files' ('id', 'plot_id' ASC)")
+    if compact_schema:
+        file_cursor.execute("CREATE INDEX IF NOT EXISTS 'files_plot_index' on 'files' ('plot_id' ASC)")
+    else:
+        file_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'files_index' on 'files' ('id', 'plot_id' ASC)")
+    file_cursor.execute("CREATE INDEX IF NOT EXISTS 'files_time_index' on 'files' ('start_time_epoch', 'finish_time_epoch' ASC)")
+    if normalize_folders:
+        if not compact_schema:
+            file_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'folders_index' on 'folders' ('id' ASC)")
+        file_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'folders_folder_index' on 'folders' ('folder' ASC)")
+        logging.debug("Have %s folder records", str(len(folder_ids)))
+    if metadata_columns is not None:
+        if not compact_schema:
+            file_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'file_metadata_index' on 'file_metadata' ('file_id' ASC)")
+        for column_name, _, _ in metadata_columns:
+            file_cursor.execute("CREATE INDEX IF NOT EXISTS 'file_metadata_%s_index' on 'file_metadata' ('%s' ASC)" %
+                                (column_name, column_name))
 
     db_conn.commit()
     file_cursor.close()
@@ -1038,98 +1861,383 @@ def local_get_save_files(local_folder: str, sensors: tuple, seasons: list, date_
         logging.warning("No file records were written")
     else:
         logging.debug("Wrote %s file records", str(total_records))
+    if plot_disagreements:
+        logging.warning("The positions and paths of %s files are of different plots; the positions were used. For "
+                        "example, file %s is in plot %s instead of plot %s", str(len(plot_disagreements)),
+                        *[str(value) for value in plot_disagreements[0]])
 
     return files_timestamp
 
 
-def local_get_all_weather(dates: list) -> dict:
-    """Returns a dictionary of all the weather found for the dates provided
+def compute_capture_windows(files_timestamps: dict, margin_seconds: int) -> tuple:
+    """Returns the time windows that cover the capture times of all the files
     Arguments:
-        dates: the list of dates to get
+        files_timestamps: a dictionary of the file IDs and their starting and finishing timestamps
+        margin_seconds: the number of seconds to widen each file's capture time by, on both sides
     Return:
-        Returns a dictionary with dates as keys, each associated with a list of informational dict's on the weather for those dates
+        Returns an ordered tuple of non-overlapping (start, finish) timestamp tuples
     """
-    found_weather = {}
-    base_path = os.path.join(LOCAL_START_PATH, LOCAL_ENVIRONMENT_LOGGER_PATH)
+    margin = timedelta(seconds=max(margin_seconds, 0))
+    spans = sorted((start_ts - margin, finish_ts + margin) for start_ts, finish_ts in files_timestamps.values())
+
+    windows = []
+    for start_ts, finish_ts in spans:
+        if windows and start_ts <= windows[-1][1]:
+            if finish_ts > windows[-1][1]:
+                windows[-1] = (windows[-1][0], finish_ts)
+        else:
+            windows.append((start_ts, finish_ts))
 
-    # Setup for getting files that aren't local
-    dates_files = {}
-    for one_date in dates:
-        cur_path = os.path.join(base_path, one_date)
-        logging.debug("Local path: %s", cur_path)
-        path_contents = local_folder_list(cur_path)
-        dates_files[one_date] = []
-        for one_entry in path_contents:
-            if one_entry['type'] == 'file':
-                json_path = os.path.join(cur_path, one_entry['name'])
-                logging.debug("Local file path: %s", json_path)
-                dates_files[one_date].append(json_path)
+    logging.debug("Merged %s file capture times into %s time windows", str(len(spans)), str(len(windows)))
+    return tuple(windows)
 
-    # Loop through and load all the data
-    problems_found = False
-    for one_date, date_file_list in dates_files.items():
-        if date_file_list:
-            found_weather[one_date] = []
-            logging.debug("Loading %s weather files for date %s", len(date_file_list), one_date)
-            for one_file in date_file_list:
-                with open(one_file, 'r') as in_file:
-                    weather = json.load(in_file)
-                    if 'environment_sensor_readings' in weather:
-                        for one_reading in weather['environment_sensor_readings']:
-                            weather_info = {'timestamp': one_reading['timestamp']}
-                            for one_sensor, sensor_readings in one_reading['weather_station'].items():
-                                weather_info[one_sensor] = sensor_readings['value']
-                            found_weather[one_date].append(weather_info)
-                    else:
-                        logging.error("Unknown JSON file format for weather file '%s'", one_file)
-                        problems_found = True
-        else:
-            logging.debug("Found no files to load for date %s", one_date)
+
+def select_date_time_windows(time_windows: tuple, dates: list) -> tuple:
+    """Returns the time windows that overlap the dates
+    Arguments:
+        time_windows: the ordered tuple of (start, finish) timestamps
+        dates: the list of dates in YYYY-MM-DD format
+    Return:
+        Returns the ordered tuple of the time windows that overlap at least one of the dates
+    Notes:
+        Used to keep the windows of other dates from keeping the first and last readings of a date when weather is
+        loaded one date at a time
+    """
+    date_spans = []
+    for one_date in dates:
+        date_start = datetime.strptime(one_date, '%Y-%m-%d')
+        date_spans.append((date_start, date_start + timedelta(days=1)))
+
+    return tuple(one_window for one_window in time_windows
+                 if any(one_window[0] < date_finish and date_start <= one_window[1] for date_start, date_finish in date_spans))
+
+
+def prune_weather_files(file_list: list, time_windows: tuple) -> list:
+    """Removes the weather files that can't contain readings in, or bracketing, the time windows
+    Arguments:
+        file_list: the list of weather file paths for a date
+        time_windows: the ordered tuple of (start, finish) timestamps of interest
+    Return:
+        Returns the list of weather files to load
+    Notes:
+        Each file is assumed to hold the readings between the timestamp in its name and the timestamp in the name
+        of the next file. Files that don't have a timestamp in their name are always kept. The files on either side
+        of a kept file are also kept so that the readings bracketing a window are available
+    """
+    named_files = []
+    kept_files = []
+    for one_file in file_list:
+        match = re.search(ENVIRONMENT_LOGGER_FILE_TIMESTAMP_REGEX, os.path.basename(one_file))
+        if match:
+            named_files.append((datetime.strptime(match[0], '%Y-%m-%d_%H-%M-%S'), one_file))
+        else:
+            kept_files.append(one_file)
+    named_files.sort()
+
+    keep_indexes = set()
+    for idx, (file_start, _) in enumerate(named_files):
+        file_finish = named_files[idx + 1][0] if idx + 1 < len(named_files) else datetime.max
+        for window_start, window_finish in time_windows:
+            if window_start < file_finish and file_start <= window_finish:
+                keep_indexes.update((idx - 1, idx, idx + 1))
+                break
+
+    kept_files.extend([one_file for idx, (_, one_file) in enumerate(named_files) if idx in keep_indexes])
+    logging.debug("Keeping %s of %s weather files", str(len(kept_files)), str(len(file_list)))
+    return kept_files
+
+
+def prune_weather_readings(found_weather: dict, time_windows: tuple) -> dict:
+    """Removes the weather readings that are not in, or don't bracket, the time windows
+    Arguments:
+        found_weather: a dictionary with dates as keys, each associated with a list of weather readings
+        time_windows: the ordered tuple of (start, finish) timestamps of interest
+    Return:
+        Returns a dictionary with the same dates as keys, each associated with the time ordered list of kept readings
+    """
+    all_readings = []
+    for one_date, date_readings in found_weather.items():
+        for one_reading in date_readings:
+            all_readings.append((timestamp_from_epoch(one_reading[0]), one_date, one_reading))
+    all_readings.sort(key=lambda reading: reading[0])
+    all_timestamps = [reading[0] for reading in all_readings]
+
+    # Keep the readings in each window and the closest reading on either side of it
+    keep_indexes = set()
+    for window_start, window_finish in time_windows:
+        first_idx = max(bisect.bisect_left(all_timestamps, window_start) - 1, 0)
+        last_idx = min(bisect.bisect_right(all_timestamps, window_finish) + 1, len(all_timestamps))
+        keep_indexes.update(range(first_idx, last_idx))
+
+    pruned_weather = {one_date: [] for one_date in found_weather}
+    for idx in sorted(keep_indexes):
+        pruned_weather[all_readings[idx][1]].append(all_readings[idx][2])
+
+    logging.info("Keeping %s of %s weather readings", str(len(keep_indexes)), str(len(all_readings)))
+    return pruned_weather
+
+
+def parse_weather_file(weather_file: str) -> Optional[tuple]:
+    """Parses the readings of an EnvironmentLogger weather file
+    Arguments:
+        weather_file: the path of the file to parse
+    Return:
+        Returns a tuple of the file's readings in timestamp order, or None if the file isn't in a known format. Each
+        reading is a tuple of its timestamp as seconds since the epoch, its timestamp string, and a tuple of its values
+        in the same order as WEATHER_READING_KEYS
+    Notes:
+        Called in the weather parsing processes (see load_weather_files()). The file is memory mapped instead of being
+        read into a buffer, and is parsed with orjson when it's installed
+    """
+    with open(weather_file, 'rb') as in_file:
+        if os.fstat(in_file.fileno()).st_size <= 0:
+            weather = json.loads(in_file.read())
+        else:
+            with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if orjson is not None:
+                    with memoryview(mapped) as mapped_view:
+                        weather = orjson.loads(mapped_view)
+                else:
+                    weather = json.loads(mapped[:])
+    if 'environment_sensor_readings' not in weather:
+        return None
+
+    file_weather = []
+    for one_reading in weather['environment_sensor_readings']:
+        sensor_readings = one_reading['weather_station']
+        file_weather.append((parse_timestamp_epoch(one_reading['timestamp']), one_reading['timestamp'],
+                             tuple(sensor_readings[one_key]['value'] for one_key in WEATHER_READING_KEYS)))
+    file_weather.sort(key=lambda reading: reading[0])
+    return tuple(file_weather)
+
+
+def load_weather_files(weather_files: list, workers: int = 0) -> list:
+    """Loads the readings of EnvironmentLogger weather files, using the cache when enabled (see enable_caches())
+    Arguments:
+        weather_files: the paths of the files to load
+        workers: the number of processes to parse the files with; zero uses one process per CPU
+    Return:
+        Returns the list of parsed files in the same order as the paths, which must not be modified (see
+        parse_weather_file())
+    Notes:
+        Files are only parsed in other processes when there are enough of them that aren't cached (see
+        WEATHER_FILES_PER_WORKER). The processes are spawned, instead of forked, since builds can run in threads
+        (see build_server.py)
+    """
+    def _load(keys: list) -> list:
+        file_list = [one_key[0] for one_key in keys]
+        max_workers = min(workers or os.cpu_count() or 1, len(file_list) // WEATHER_FILES_PER_WORKER)
+        if max_workers <= 1:
+            return [parse_weather_file(one_file) for one_file in file_list]
+
+        logging.debug("Parsing %s weather files with %s processes", str(len(file_list)), str(max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            return list(executor.map(parse_weather_file, file_list,
+                                     chunksize=max(1, len(file_list) // (max_workers * 4))))
+
+    return cached_values('weather_files', [(one_file, get_path_version(one_file)) for one_file in weather_files],
+                         _load)
+
+
+def local_get_all_weather(dates: list, time_windows: tuple = None, workers: int = 0) -> dict:
+    """Returns a dictionary of all the weather found for the dates provided
+    Arguments:
+        dates: the list of dates to get
+        time_windows: optional ordered tuple of (start, finish) timestamps to restrict the weather to
+        workers: the number of processes to parse the weather files with; zero uses one process per CPU
+    Return:
+        Returns a dictionary with dates as keys, each associated with the timestamp ordered list of the weather readings
+        for those dates (see parse_weather_file())
+    Notes:
+        When time windows are specified, only the readings in the windows, and the readings immediately before and after
+        each window, are returned
+    """
+    found_weather = {}
+    base_path = os.path.join(LOCAL_START_PATH, LOCAL_ENVIRONMENT_LOGGER_PATH)
+
+    # Setup for getting files that aren't local
+    dates_files = {}
+    for one_date in dates:
+        cur_path = os.path.join(base_path, one_date)
+        logging.debug("Local path: %s", cur_path)
+        path_contents = local_folder_list(cur_path)
+        dates_files[one_date] = []
+        for one_entry in path_contents:
+            if one_entry['type'] == 'file':
+                json_path = os.path.join(cur_path, one_entry['name'])
+                logging.debug("Local file path: %s", json_path)
+                dates_files[one_date].append(json_path)
+
+    # Load the files of all the dates together so that they can be parsed in parallel
+    all_files = []
+    for one_date, date_file_list in dates_files.items():
+        if date_file_list:
+            if time_windows is not None:
+                date_file_list = prune_weather_files(date_file_list, time_windows)
+            logging.debug("Loading %s weather files for date %s", len(date_file_list), one_date)
+            all_files.extend([(one_date, one_file) for one_file in date_file_list])
+            found_weather[one_date] = []
+        else:
+            logging.debug("Found no files to load for date %s", one_date)
+    all_file_weather = load_weather_files([one_file for _, one_file in all_files], workers)
+
+    # Merge the readings of each date's files in timestamp order
+    problems_found = False
+    dates_file_weather = {one_date: [] for one_date in found_weather}
+    for (one_date, one_file), file_weather in zip(all_files, all_file_weather):
+        if file_weather is not None:
+            dates_file_weather[one_date].append(file_weather)
+        else:
+            logging.error("Unknown JSON file format for weather file '%s'", one_file)
+            problems_found = True
 
     if problems_found:
         raise RuntimeError("Unable to complete loading weather data due to previous problems")
 
+    for one_date, date_file_weather in dates_file_weather.items():
+        found_weather[one_date] = list(heapq.merge(*date_file_weather, key=lambda reading: reading[0]))
+
+    if time_windows is not None:
+        found_weather = prune_weather_readings(found_weather, time_windows)
+
     return found_weather
 
 
-def get_save_weather(date_experiment_ids: dict, db_conn: sqlite3.Connection) -> dict:
+def update_weather_rollups(rollups: dict, weather_epoch: int, measurements: list) -> None:
+    """Adds a weather reading to the rollups
+    Arguments:
+        rollups: a dictionary of rollup table names, each associated with a dictionary of the rollup rows (see Notes)
+        weather_epoch: the timestamp of the reading as the number of seconds since the epoch
+        measurements: the reading's values, in the same order as WEATHER_MEASUREMENTS
+    Notes:
+        The rollup rows are keyed by the epoch of the start of the period they cover. Each row is a list containing the
+        number of readings followed by the count, sum, minimum, and maximum of each measurement's non-null values
+    """
+    for one_table, period_sec in WEATHER_ROLLUPS:
+        period_start = weather_epoch - weather_epoch % period_sec
+        rollup_row = rollups[one_table].get(period_start)
+        if rollup_row is None:
+            rollup_row = [0] + [0, 0.0, None, None] * len(WEATHER_MEASUREMENTS)
+            rollups[one_table][period_start] = rollup_row
+
+        rollup_row[0] += 1
+        for idx, value in enumerate(measurements):
+            if value is None:
+                continue
+            offset = 1 + idx * 4
+            rollup_row[offset] += 1
+            rollup_row[offset + 1] += value
+            if rollup_row[offset + 2] is None or value < rollup_row[offset + 2]:
+                rollup_row[offset + 2] = value
+            if rollup_row[offset + 3] is None or value > rollup_row[offset + 3]:
+                rollup_row[offset + 3] = value
+
+
+def save_weather_rollups(rollups: dict, db_conn: sqlite3.Connection, compact_schema: bool = False) -> None:
+    """Saves the weather rollups to the database
+    Arguments:
+        rollups: a dictionary of rollup table names, each associated with a dictionary of the rollup rows (see
+                 update_weather_rollups())
+        db_conn: the database to write to
+        compact_schema: when True the period start epoch is an alias of the table's rowid (see id_column_definition())
+    """
+    stats_columns = []
+    for one_measurement in WEATHER_MEASUREMENTS:
+        stats_columns.extend([one_measurement + '_min FLOAT', one_measurement + '_mean FLOAT', one_measurement + '_max FLOAT'])
+
+    rollup_cursor = db_conn.cursor()
+    for one_table, _ in WEATHER_ROLLUPS:
+        rollup_cursor.execute('CREATE TABLE %s (timestamp TEXT, %s, reading_count INTEGER, %s)' %
+                              (one_table, id_column_definition('timestamp_epoch', compact_schema), ', '.join(stats_columns)))
+        insert_sql = 'INSERT INTO %s VALUES(%s)' % (one_table, ', '.join(['?'] * (len(WEATHER_MEASUREMENTS) * 3 + 3)))
+
+        num_inserted = 0
+        total_records = 0
+        for period_start in sorted(rollups[one_table]):
+            rollup_row = rollups[one_table][period_start]
+            insert_values = [timestamp_from_epoch(period_start).strftime('%Y.%m.%d-%H:%M:%S'), period_start, rollup_row[0]]
+            for idx in range(0, len(WEATHER_MEASUREMENTS)):
+                value_count, value_sum, value_min, value_max = rollup_row[1 + idx * 4:5 + idx * 4]
+                insert_values.extend([value_min, value_sum / value_count if value_count else None, value_max])
+            rollup_cursor.execute(insert_sql, insert_values)
+
+            num_inserted += 1
+            total_records += 1
+            if num_inserted >= MAX_INSERT_BEFORE_COMMIT:
+                db_conn.commit()
+                num_inserted = 0
+
+        # Create the index
+        if not compact_schema:
+            rollup_cursor.execute("CREATE UNIQUE INDEX '%s_time_index' ON '%s' ('timestamp_epoch' ASC)" %
+                                  (one_table, one_table))
+        db_conn.commit()
+
+        logging.debug("Wrote %s %s records", str(total_records), one_table)
+
+    rollup_cursor.close()
+
+
+def define_weather_table(db_cursor: sqlite3.Cursor, compact_schema: bool = False) -> None:
+    """Creates the weather table, if it doesn't already exist
+    Arguments:
+        db_cursor: the cursor to create the table with
+        compact_schema: when True the weather ID is an alias of the table's rowid (see id_column_definition())
+    """
+    db_cursor.execute('''CREATE TABLE IF NOT EXISTS weather
+                      (%s, timestamp TEXT, temperature FLOAT, illuminance FLOAT, precipitation FLOAT, 
+                       sun_direction FLOAT, wind_speed FLOAT, wind_direction FLOAT, relative_humidity FLOAT,
+                       timestamp_epoch INTEGER)''' % id_column_definition('id', compact_schema))
+
+
+def get_save_weather(date_experiment_ids: dict, db_conn: sqlite3.Connection, time_windows: tuple = None,
+                     keep_timestamps: bool = True, compact_schema: bool = False, rollups: dict = None,
+                     weather_workers: int = 0) -> dict:
     """Retrieves  and  saves weather  data
     Arguments:
         date_experiment_ids: dates with their associated experiment ID
         db_conn: the database to write to
+        time_windows: optional ordered tuple of (start, finish) timestamps to restrict the saved weather to
+        keep_timestamps: set to False to not return the weather timestamps (when they're not needed)
+        compact_schema: when True the weather ID is an alias of the table's rowid (see id_column_definition())
+        rollups: optional rollups to add the weather to (see update_weather_rollups()); when specified the rollups are
+                 not saved, allowing them to be accumulated over several calls and saved with save_weather_rollups()
+        weather_workers: the number of processes to parse the weather files with; zero uses one process per CPU
     Return:
-        Returns a dict of the weather ID and its associated timestamp
+        Returns a dict of the weather ID and its associated timestamp; the dict is empty if keep_timestamps is False
+    Notes:
+        If the weather table already exists the weather is added to it, allowing weather to be saved one date at a time
     """
     weather_timestamps = {}
 
     # Create the table for file information
     weather_cursor = db_conn.cursor()
-    weather_cursor.execute('''CREATE TABLE weather
-                           (id INTEGER, timestamp TEXT, temperature FLOAT, illuminance FLOAT, precipitation FLOAT, 
-                            sun_direction FLOAT, wind_speed FLOAT, wind_direction FLOAT, relative_humidity FLOAT)''')
+    define_weather_table(weather_cursor, compact_schema)
 
     # Loop through each sensor and dates and get the associated file information
     num_inserted = 0
     total_records = 0
     problems_found = 0
-    weather_id = 1
+    weather_cursor.execute('SELECT coalesce(max(id), 0) + 1 FROM weather')
+    weather_id = weather_cursor.fetchone()[0]
+    save_rollups = rollups is None
+    if save_rollups:
+        rollups = {one_table: {} for one_table, _ in WEATHER_ROLLUPS}
     # Load all the data to be found and check for missing dates (aka: missing data) below
-    all_weather = local_get_all_weather(list(date_experiment_ids.keys()))
+    all_weather = local_get_all_weather(list(date_experiment_ids.keys()), time_windows, weather_workers)
     for one_date in date_experiment_ids:
         if one_date not in all_weather:
             logging.warning("Unable to find weather data for date %s", one_date)
             problems_found = True
             continue
 
-        for one_weather in all_weather[one_date]:
-            weather_cursor.execute('INSERT INTO weather VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                   [weather_id, one_weather['timestamp'], one_weather['temperature'],
-                                    one_weather['brightness'],
-                                    one_weather['precipitation'], one_weather['sunDirection'],
-                                    one_weather['windVelocity'],
-                                    one_weather['windDirection'], one_weather['relHumidity']])
+        for weather_epoch, weather_timestamp, measurements in all_weather[one_date]:
+            weather_cursor.execute('INSERT INTO weather VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                   (weather_id, weather_timestamp) + measurements + (weather_epoch,))
+            update_weather_rollups(rollups, weather_epoch, measurements)
 
-            weather_timestamps[weather_id] = make_timestamp_instance(one_weather['timestamp'])
+            if keep_timestamps:
+                weather_timestamps[weather_id] = timestamp_from_epoch(weather_epoch)
 
             weather_id += 1
             num_inserted += 1
@@ -1139,11 +2247,19 @@ def get_save_weather(date_experiment_ids: dict, db_conn: sqlite3.Connection) ->
                 num_inserted = 0
 
     # Create the index
-    weather_cursor.execute("CREATE UNIQUE INDEX 'weather_index' ON 'weather' ('id' ASC)")
+    if compact_schema:
+        # The rowid alias is already part of every index entry
+        weather_cursor.execute("CREATE INDEX IF NOT EXISTS 'weather_time_index' ON 'weather' ('timestamp_epoch' ASC)")
+    else:
+        weather_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'weather_index' ON 'weather' ('id' ASC)")
+        weather_cursor.execute("CREATE INDEX IF NOT EXISTS 'weather_time_index' ON 'weather' ('timestamp_epoch', 'id' ASC)")
 
     db_conn.commit()
     weather_cursor.close()
 
+    if save_rollups:
+        save_weather_rollups(rollups, db_conn, compact_schema)
+
     if problems_found:
         raise RuntimeError("Unable to retrieve weather data for all dates")
 
@@ -1160,15 +2276,11 @@ def get_ordered_weather_ids_timestamps(weather_timestamps: dict) -> tuple:
     Arguments:
         weather_timestamps: the dictionary of weather IDs and their timestamps
     Return:
-        A tuple containing an ordered tuple of weather IDs and and ordered tuple of timestamps
+        A tuple containing a tuple of weather IDs and a tuple of their timestamps, both in timestamp order
     """
-    ids = list(weather_timestamps.keys())
-    tss = list(weather_timestamps.values())
+    ordered = sorted(weather_timestamps.items(), key=lambda id_ts: (id_ts[1], id_ts[0]))
 
-    ids.sort()
-    tss.sort()
-
-    return tuple(ids), tuple(tss)
+    return tuple(one_id for one_id, _ in ordered), tuple(one_ts for _, one_ts in ordered)
 
 
 def find_file_weather_ids(start_ts: datetime, finish_ts: datetime, ordered_weather_ids: tuple,
@@ -1182,8 +2294,8 @@ def find_file_weather_ids(start_ts: datetime, finish_ts: datetime, ordered_weath
     Return:
         A tuple containing the ID of the starting and ending weather timestamps that encompass the file's timestamps
     Notes:
-        Assumes the ascending numerical order of weather IDs are directly related to the ascending temporal order of
-        the weather timestamp (in other words a larger ID value occurs later than any of the smaller ID values)
+        The weather IDs are expected to be in the same order as their timestamps (see
+        get_ordered_weather_ids_timestamps())
     """
     assert len(ordered_weather_ids) == len(ordered_weather_timestamps)
 
@@ -1260,17 +2372,29 @@ def find_file_weather_ids(start_ts: datetime, finish_ts: datetime, ordered_weath
     return ordered_weather_ids[start_index], ordered_weather_ids[finish_index]
 
 
-def create_weather_files_table(weather_timestamps: dict, files_timestamps: dict, db_conn: sqlite3.Connection) -> None:
+def define_weather_file_map_table(db_cursor: sqlite3.Cursor, compact_schema: bool = False) -> None:
+    """Creates the table mapping files to their weather, if it doesn't already exist
+    Arguments:
+        db_cursor: the cursor to create the table with
+        compact_schema: when True the ID is an alias of the table's rowid (see id_column_definition())
+    """
+    db_cursor.execute('''CREATE TABLE IF NOT EXISTS weather_file_map
+                      (%s, file_id INTEGER, min_weather_id INTEGER, max_weather_id INTEGER)''' %
+                      id_column_definition('id', compact_schema))
+
+
+def create_weather_files_table(weather_timestamps: dict, files_timestamps: dict, db_conn: sqlite3.Connection,
+                               compact_schema: bool = False) -> None:
     """Creates a mapping table between the weather and files
     Arguments:
         weather_timestamps: a dictionary of the weather IDs and their timestamp
         files_timestamps: a dictionary of the file IDs and their starting and finishing timestamps
         db_conn: the database to write to
+        compact_schema: when True the ID is an alias of the table's rowid (see id_column_definition())
     """
     # Create the table for file information
     wf_cursor = db_conn.cursor()
-    wf_cursor.execute('''CREATE TABLE weather_file_map
-                           (id INTEGER, file_id INTEGER, min_weather_id INTEGER, max_weather_id INTEGER)''')
+    define_weather_file_map_table(wf_cursor, compact_schema)
 
     # Loop through each sensor and dates and get the associated file information
     num_inserted = 0
@@ -1293,7 +2417,8 @@ def create_weather_files_table(weather_timestamps: dict, files_timestamps: dict,
             num_inserted = 0
 
     # Create the index
-    wf_cursor.execute("CREATE UNIQUE INDEX 'weather_file_map_index' ON 'weather_file_map' ('id' ASC)")
+    if not compact_schema:
+        wf_cursor.execute("CREATE UNIQUE INDEX 'weather_file_map_index' ON 'weather_file_map' ('id' ASC)")
     wf_cursor.execute(
         "CREATE INDEX 'weather_file_map_lookup_index' ON 'weather_file_map' ('min_weather_id', 'max_weather_id' ASC)")
 
@@ -1309,14 +2434,327 @@ def create_weather_files_table(weather_timestamps: dict, files_timestamps: dict,
     logging.debug("Wrote %s weather files mapping records", str(total_records))
 
 
+def create_weather_files_table_sql(db_conn: sqlite3.Connection, compact_schema: bool = False,
+                                   map_all: bool = True) -> None:
+    """Creates a mapping table between the weather and files using a single query in the database
+    Arguments:
+        db_conn: the database to write to
+        compact_schema: when True the ID is an alias of the table's rowid (see id_column_definition())
+        map_all: set to False to leave files that don't have weather on both sides of their start and finish times
+                 to a later call, instead of raising an exception or warning that the table is empty
+    Exceptions:
+        Raises RuntimeError if weather can't be found before and after the start and finish times of every file
+    Notes:
+        Produces the same mapping as create_weather_files_table() without loading the timestamps into memory. The
+        epoch columns, and their indexes, on the files and weather tables are used to find the weather readings closest
+        to each file's start and finish times. Only files that aren't already in the table are added to it, allowing
+        the table to be built up as weather is saved
+    """
+    wf_cursor = db_conn.cursor()
+    define_weather_file_map_table(wf_cursor, compact_schema)
+    wf_cursor.execute('SELECT coalesce(max(id), 0) FROM weather_file_map')
+    last_id = wf_cursor.fetchone()[0]
+
+    logging.info("Looking up files for their associated weather in the database")
+    wf_cursor.execute('''INSERT INTO weather_file_map (id, file_id, min_weather_id, max_weather_id)
+                         SELECT ROW_NUMBER() OVER (ORDER BY b.file_id) + ?, b.file_id,
+                            CASE WHEN b.start_epoch - b.before_start_epoch > b.after_start_epoch - b.start_epoch
+                                THEN b.after_start_id ELSE b.before_start_id END,
+                            CASE WHEN b.finish_epoch - b.before_finish_epoch < b.after_finish_epoch - b.finish_epoch
+                                THEN b.before_finish_id ELSE b.after_finish_id END
+                         FROM (SELECT f.id AS file_id, f.start_time_epoch AS start_epoch, f.finish_time_epoch AS finish_epoch,
+                            (SELECT max(w.timestamp_epoch) FROM weather w WHERE w.timestamp_epoch <= f.start_time_epoch)
+                                AS before_start_epoch,
+                            (SELECT w.id FROM weather w WHERE w.timestamp_epoch <= f.start_time_epoch
+                                ORDER BY w.timestamp_epoch DESC, w.id DESC LIMIT 1) AS before_start_id,
+                            (SELECT min(w.timestamp_epoch) FROM weather w WHERE w.timestamp_epoch >= f.start_time_epoch)
+                                AS after_start_epoch,
+                            (SELECT w.id FROM weather w WHERE w.timestamp_epoch >= f.start_time_epoch
+                                ORDER BY w.timestamp_epoch ASC, w.id ASC LIMIT 1) AS after_start_id,
+                            (SELECT max(w.timestamp_epoch) FROM weather w WHERE w.timestamp_epoch <= f.finish_time_epoch)
+                                AS before_finish_epoch,
+                            (SELECT w.id FROM weather w WHERE w.timestamp_epoch <= f.finish_time_epoch
+                                ORDER BY w.timestamp_epoch DESC, w.id DESC LIMIT 1) AS before_finish_id,
+                            (SELECT min(w.timestamp_epoch) FROM weather w WHERE w.timestamp_epoch >= f.finish_time_epoch)
+                                AS after_finish_epoch,
+                            (SELECT w.id FROM weather w WHERE w.timestamp_epoch >= f.finish_time_epoch
+                                ORDER BY w.timestamp_epoch ASC, w.id ASC LIMIT 1) AS after_finish_id
+                            FROM files f WHERE f.id NOT IN (SELECT file_id FROM weather_file_map)) b
+                         WHERE b.before_start_id IS NOT NULL AND b.after_start_id IS NOT NULL
+                            AND b.before_finish_id IS NOT NULL AND b.after_finish_id IS NOT NULL
+                         ORDER BY b.file_id''', [last_id])
+    total_records = wf_cursor.rowcount
+
+    # Create the index
+    if not compact_schema:
+        wf_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'weather_file_map_index' ON 'weather_file_map' ('id' ASC)")
+    wf_cursor.execute("CREATE INDEX IF NOT EXISTS 'weather_file_map_lookup_index' ON 'weather_file_map' "
+                      "('min_weather_id', 'max_weather_id' ASC)")
+
+    db_conn.commit()
+
+    wf_cursor.execute("SELECT count(1) FROM files WHERE id NOT IN (SELECT file_id FROM weather_file_map)")
+    missing_count = wf_cursor.fetchone()[0]
+    wf_cursor.execute("SELECT count(1) FROM weather_file_map")
+    table_count = wf_cursor.fetchone()[0]
+    wf_cursor.close()
+
+    if missing_count > 0 and map_all:
+        raise RuntimeError("Unable to find weather associated with the timestamps of %s files" % str(missing_count))
+
+    # Earlier calls may have mapped all the files
+    if table_count <= 0 and map_all:
+        logging.warning("No weather records were written")
+
+    logging.debug("Wrote %s weather files mapping records", str(total_records))
+
+
+def define_file_weather_stats_table(db_cursor: sqlite3.Cursor, compact_schema: bool = False) -> None:
+    """Creates the table of the weather statistics of each file, if it doesn't already exist
+    Arguments:
+        db_cursor: the cursor to create the table with
+        compact_schema: when True the file ID is an alias of the table's rowid (see id_column_definition())
+    """
+    stats_columns = []
+    for one_measurement in WEATHER_MEASUREMENTS:
+        stats_columns.extend([one_measurement + '_min FLOAT', one_measurement + '_mean FLOAT', one_measurement + '_max FLOAT'])
+    db_cursor.execute('CREATE TABLE IF NOT EXISTS file_weather_stats (%s, weather_count INTEGER, %s)' %
+                      (id_column_definition('file_id', compact_schema), ', '.join(stats_columns)))
+
+
+def create_file_weather_stats_table(db_conn: sqlite3.Connection, compact_schema: bool = False,
+                                    warn_empty: bool = True) -> None:
+    """Creates a table of the weather statistics over each file's capture time
+    Arguments:
+        db_conn: the database to write to
+        compact_schema: when True the file ID is an alias of the table's rowid (see id_column_definition())
+        warn_empty: set to False to not warn when the table is empty, such as while it's being built up
+    Notes:
+        The statistics cover the weather readings from a file's min_weather_id to its max_weather_id, inclusive, in
+        time order, in the weather_file_map table. They're calculated in the database with the weather_time_index
+        finding each file's readings, so only the readings of one file are worked on at a time. Only the files without
+        statistics are added, allowing the table to be built up as files are mapped to weather
+    """
+    stats_cursor = db_conn.cursor()
+    define_file_weather_stats_table(stats_cursor, compact_schema)
+
+    # Put each file's first and last readings in time order; grouping by the rowid of the mapping table, which is
+    # scanned in rowid order, doesn't need the rows to be sorted
+    first_sql = '(w1.timestamp_epoch, w1.id) <= (w2.timestamp_epoch, w2.id)'
+    stats_columns = []
+    for one_measurement in WEATHER_MEASUREMENTS:
+        stats_columns.extend(['%s(w.%s)' % (one_stat, one_measurement) for one_stat in ('min', 'avg', 'max')])
+    stats_cursor.execute('''INSERT INTO file_weather_stats
+                            SELECT b.file_id, count(1), %s
+                            FROM (SELECT m.rowid AS map_rowid, m.file_id AS file_id,
+                                CASE WHEN %s THEN w1.timestamp_epoch ELSE w2.timestamp_epoch END AS first_epoch,
+                                CASE WHEN %s THEN w1.id ELSE w2.id END AS first_id,
+                                CASE WHEN %s THEN w2.timestamp_epoch ELSE w1.timestamp_epoch END AS last_epoch,
+                                CASE WHEN %s THEN w2.id ELSE w1.id END AS last_id
+                                FROM weather_file_map m JOIN weather w1 ON w1.id = m.min_weather_id
+                                    JOIN weather w2 ON w2.id = m.max_weather_id
+                                WHERE m.file_id NOT IN (SELECT file_id FROM file_weather_stats)) b
+                            JOIN weather w
+                                ON (w.timestamp_epoch, w.id) BETWEEN (b.first_epoch, b.first_id) AND (b.last_epoch, b.last_id)
+                            GROUP BY b.map_rowid''' % ((', '.join(stats_columns),) + (first_sql,) * 4))
+    total_records = stats_cursor.rowcount
+
+    # Create the index
+    if not compact_schema:
+        stats_cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS 'file_weather_stats_index' ON 'file_weather_stats' "
+                             "('file_id' ASC)")
+
+    db_conn.commit()
+    stats_cursor.execute('SELECT count(1) FROM file_weather_stats')
+    table_count = stats_cursor.fetchone()[0]
+    stats_cursor.close()
+
+    # Earlier calls may have added all the files
+    if table_count <= 0 and warn_empty:
+        logging.warning("No file weather statistics records were written")
+
+    logging.debug("Wrote %s file weather statistics records", str(total_records))
+
+
+def create_file_search_table(db_conn: sqlite3.Connection, normalize_folders: bool = False) -> None:
+    """Creates the full text index of the files' names, folders, and plot names
+    Arguments:
+        db_conn: the database to write to
+        normalize_folders: set to True when the files table refers to the folders table for the folder of each file
+    Exceptions:
+        Raises RuntimeError if SQLite doesn't have the FTS5 extension with the trigram tokenizer (SQLite 3.34.0 or later)
+    Notes:
+        The file_search table is an FTS5 table with the file ID as its rowid. The trigram tokenizer indexes every three
+        characters of the values, so that MATCH queries and LIKE and GLOB patterns with at least three characters in a
+        row find substrings with the index instead of reading every file (see find_file_ids())
+    """
+    if normalize_folders:
+        folder_column = 'd.folder'
+        folder_join = 'left join folders as d on f.folder_id = d.id'
+    else:
+        folder_column = 'f.folder'
+        folder_join = ''
+
+    search_cursor = db_conn.cursor()
+    try:
+        search_cursor.execute("CREATE VIRTUAL TABLE %s USING fts5(%s, tokenize='trigram')" %
+                              (FILE_SEARCH_TABLE, ', '.join(FILE_SEARCH_COLUMNS)))
+    except sqlite3.OperationalError as ex:
+        raise RuntimeError("Unable to create the %s table, SQLite %s needs the FTS5 extension with the trigram "
+                           "tokenizer: %s" % (FILE_SEARCH_TABLE, sqlite3.sqlite_version, str(ex))) from ex
+    search_cursor.execute('''INSERT INTO %s (rowid, filename, folder, plot_name)
+                          select f.id, f.filename, %s, e.plot_name from files as f
+                              left join season_info as e on f.plot_id = e.id
+                              %s''' % (FILE_SEARCH_TABLE, folder_column, folder_join))
+    logging.info("Indexed %s files for searching", str(search_cursor.rowcount))
+    search_cursor.execute("INSERT INTO %s (%s) VALUES('optimize')" % (FILE_SEARCH_TABLE, FILE_SEARCH_TABLE))
+
+    db_conn.commit()
+    search_cursor.close()
+
+
+def find_file_ids(db_conn: sqlite3.Connection, fragment: str, columns: tuple = FILE_SEARCH_COLUMNS) -> list:
+    """Finds the files having a name, folder, or plot name containing the text
+    Arguments:
+        db_conn: the database to search
+        fragment: the text to find; case is ignored
+        columns: the columns of the file_search table to look in (see FILE_SEARCH_COLUMNS)
+    Return:
+        Returns the sorted list of the IDs of the matching files
+    Notes:
+        Text of three or more characters is found with the trigram index of the file_search table (see
+        create_file_search_table()). Shorter text can't be found with the index and each row of the table is checked
+    """
+    unknown_columns = [one_column for one_column in columns if one_column not in FILE_SEARCH_COLUMNS]
+    if unknown_columns or not columns:
+        raise RuntimeError("Unknown file search columns: %s" % ','.join(unknown_columns))
+
+    search_cursor = db_conn.cursor()
+    if len(fragment) >= 3:
+        search_cursor.execute('SELECT rowid FROM %s WHERE %s MATCH ? ORDER BY rowid' %
+                              (FILE_SEARCH_TABLE, FILE_SEARCH_TABLE),
+                              ['{%s} : "%s"' % (' '.join(columns), fragment.replace('"', '""'))])
+    else:
+        pattern = '%' + re.sub(r'([\\%_])', r'\\\1', fragment) + '%'
+        search_cursor.execute('SELECT rowid FROM %s WHERE %s ORDER BY rowid' %
+                              (FILE_SEARCH_TABLE, ' OR '.join(["%s LIKE ? ESCAPE '\\'" % one_column
+                                                               for one_column in columns])),
+                              [pattern] * len(columns))
+    file_ids = [row[0] for row in search_cursor.fetchall()]
+    search_cursor.close()
+
+    return file_ids
+
+
+def make_gene_column_name(csv_column: str) -> str:
+    """Returns the database column name of a gene CSV file column
+    Arguments:
+        csv_column: the name of the column in the CSV header
+    Return:
+        Returns the column name with spaces and periods replaced, in lower case
+    """
+    return csv_column.replace(' ', '_').replace('.', '_').lower()
+
+
+def convert_cultivar_gene_value(csv_value: Optional[str]):
+    """Converts a value of the cultivar gene file for storing in the database
+    Arguments:
+        csv_value: the value from the CSV file
+    Return:
+        Returns the value of sentinels such as 'No WGS' (see CULTIVAR_GENE_SENTINELS), integer values as integers, and
+        anything else unchanged
+    """
+    if not csv_value:
+        return csv_value
+    sentinel_value = CULTIVAR_GENE_SENTINELS.get(csv_value)
+    if sentinel_value is not None:
+        return sentinel_value
+    if csv_value.isdecimal() or (csv_value[0] in '-+' and csv_value[1:].isdecimal()):
+        return int(csv_value)
+    return csv_value
+
+
+def get_cultivar_gene_converters(sample_rows: list) -> list:
+    """Returns the function to convert the values of each column of the cultivar gene file, based upon a sample of rows
+    Arguments:
+        sample_rows: the rows to determine the column types from (see read_gene_file_batches())
+    Return:
+        Returns a list with a function for each column that is passed a sequence of the column's values and returns the
+        list of converted values
+    Notes:
+        Columns that only have integer, sentinel, or empty values in the sample have each value converted (see
+        convert_cultivar_gene_value()). Since these columns usually have few distinct values, each distinct value is
+        only converted once and then looked up. Only the sentinels are converted in other columns, such as the cultivar
+        names; their integer values are still stored as integers in INTEGER columns due to the column's type affinity
+    """
+    class _ConvertedValues(dict):
+        """Converts and remembers values as they're looked up"""
+        def __missing__(self, key):
+            self[key] = convert_cultivar_gene_value(key)
+            return self[key]
+
+    converted_values = _ConvertedValues()
+
+    def _convert_integers(values: tuple) -> list:
+        return list(map(converted_values.__getitem__, values))
+
+    def _convert_sentinels(values: tuple) -> list:
+        return list(map(CULTIVAR_GENE_SENTINELS.get, values, values))
+
+    converters = []
+    for column_values in zip(*sample_rows):
+        if all(isinstance(convert_cultivar_gene_value(one_value), int) for one_value in column_values if one_value):
+            converters.append(_convert_integers)
+        else:
+            converters.append(_convert_sentinels)
+    logging.debug("Found %s integer columns of %s in the cultivar gene file sample",
+                  str(converters.count(_convert_integers)), str(len(converters)))
+    return converters
+
+
+def read_gene_file_batches(in_file, batch_values: int = GENE_IMPORT_BATCH_VALUES) -> tuple:
+    """Reads the rows of a gene CSV file in batches
+    Arguments:
+        in_file: the open file, positioned at the header row
+        batch_values: the number of values to read in each batch; each batch has at least one row
+    Return:
+        Returns a tuple containing the tuple of the header's column names, and a generator of the lists of rows in
+        each batch. Each row is a tuple with a value for each of the header's columns
+    Notes:
+        Blank lines are skipped. Rows with fewer values than the header are padded with None, and any values beyond the
+        header's columns are ignored
+    """
+    reader = csv.reader(in_file)
+    column_order = tuple(next(reader, ()))
+    num_columns = len(column_order)
+    batch_rows = max(1, batch_values // max(1, num_columns))
+
+    def _batches():
+        batch = []
+        for one_row in reader:
+            if not one_row:
+                continue
+            if len(one_row) != num_columns:
+                one_row = (one_row + [None] * num_columns)[:num_columns]
+            batch.append(tuple(one_row))
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    return column_order, _batches()
+
+
 def save_gene_markers(gene_marker_file: str, key_column_index: int, file_row_ignore: int,
-                      db_conn: sqlite3.Connection) -> dict:
+                      db_conn: sqlite3.Connection, compact_schema: bool = False) -> dict:
     """Saves the gene marker file into the database
     Arguments:
         gene_marker_file: path to the gene marker file to import
         key_column_index: the index of the column to provide key values
         file_row_ignore: number of rows to ignore at the start of the file
         db_conn: the database to write to
+        compact_schema: when True the ID is an alias of the table's rowid (see id_column_definition())
     Return:
         Returns a dictionary of row IDs and the key value
     """
@@ -1333,7 +2771,6 @@ def save_gene_markers(gene_marker_file: str, key_column_index: int, file_row_ign
 
     id_key_map = {}
     created_table = False
-    column_order = None
     insert_sql = None
     rows_inserted = 0
     with open(gene_marker_file, 'r') as in_file:
@@ -1346,19 +2783,19 @@ def save_gene_markers(gene_marker_file: str, key_column_index: int, file_row_ign
             skip_count -= 1
 
         # Process the rest of the file
-        reader = csv.DictReader(in_file)
+        column_order, batches = read_gene_file_batches(in_file)
         row_id = 1
-        for row in reader:
+        for batch in batches:
             # Create the table the first time through
             if not created_table:
-                column_order = tuple(row.keys())
                 if key_index >= len(column_order):
                     raise RuntimeError(
                         'Gene mapping key column index value (%s) is greater than the number of columns: %s' %
                         (str(key_index), str(len(column_order))))
-                column_names = tuple([column.replace(' ', '_').replace('.', '_').lower() for column in column_order])
+                column_names = tuple([make_gene_column_name(column) for column in column_order])
                 logging.info('Creating gene_markers table with columns: %s', str(column_names))
-                create_sql = 'CREATE TABLE gene_markers (%s)' % ('id INTEGER, ' + ' TEXT, '.join(column_names) + ' TEXT')
+                create_sql = 'CREATE TABLE gene_markers (%s)' % (id_column_definition('id', compact_schema) + ', ' +
+                                                                 ' TEXT, '.join(column_names) + ' TEXT')
                 logging.debug('Create gene_markers SQL: %s', create_sql)
                 gene_cursor.execute(create_sql)
                 insert_sql = 'INSERT INTO gene_markers(id, ' + ','.join(column_names) + ') VALUES(' + \
@@ -1366,17 +2803,16 @@ def save_gene_markers(gene_marker_file: str, key_column_index: int, file_row_ign
                 logging.debug('Insert gene_markers SQL: %s', insert_sql)
                 created_table = True
 
-            # Add the row
-            insert_values = [row_id]
-            for one_column in column_order:
-                insert_values.append(row[one_column])
-            gene_cursor.execute(insert_sql, insert_values)
-            id_key_map[row_id] = row[column_order[key_index]]
-            rows_inserted += 1
-            row_id += 1
+            # Add the rows
+            batch_ids = range(row_id, row_id + len(batch))
+            gene_cursor.executemany(insert_sql, [(one_id,) + one_row for one_id, one_row in zip(batch_ids, batch)])
+            id_key_map.update(zip(batch_ids, [one_row[key_index] for one_row in batch]))
+            rows_inserted += len(batch)
+            row_id += len(batch)
 
     # Create the index
-    gene_cursor.execute("CREATE UNIQUE INDEX 'gene_markers_index' ON 'gene_markers' ('id' ASC)")
+    if created_table and not compact_schema:
+        gene_cursor.execute("CREATE UNIQUE INDEX 'gene_markers_index' ON 'gene_markers' ('id' ASC)")
 
     db_conn.commit()
     gene_cursor.close()
@@ -1388,16 +2824,46 @@ def save_gene_markers(gene_marker_file: str, key_column_index: int, file_row_ign
     return id_key_map
 
 
+def create_cultivar_gene_names(gene_names: list, db_cursor: sqlite3.Cursor, compact_schema: bool = False) -> None:
+    """Creates the tables of the long cultivar gene layout and saves the names of the genes
+    Arguments:
+        gene_names: the column names of the genes in the cultivar gene file, in file order
+        db_cursor: the cursor to use
+        compact_schema: when True the ID is an alias of the table's rowid (see id_column_definition())
+    Notes:
+        The genes are given IDs in file order, starting at one. The cultivar_gene_values table is keyed on the cultivar
+        and gene ID, so that the values of a cultivar are stored together, and is created without a rowid
+    """
+    logging.info('Creating cultivar_gene_names table with %s genes', str(len(gene_names)))
+    db_cursor.execute('CREATE TABLE cultivar_gene_names (%s, name TEXT)' % id_column_definition('id', compact_schema))
+    db_cursor.executemany('INSERT INTO cultivar_gene_names(id, name) VALUES(?, ?)',
+                          [(gene_id, one_name) for gene_id, one_name in enumerate(gene_names, 1)])
+    if not compact_schema:
+        db_cursor.execute("CREATE UNIQUE INDEX 'cultivar_gene_names_index' ON 'cultivar_gene_names' ('id' ASC)")
+    db_cursor.execute("CREATE INDEX 'cultivar_gene_names_name_index' ON 'cultivar_gene_names' ('name' ASC)")
+
+    db_cursor.execute('''CREATE TABLE cultivar_gene_values (cultivar TEXT, gene_id INTEGER, value INTEGER,
+                      PRIMARY KEY (cultivar, gene_id)) WITHOUT ROWID''')
+
+
 def save_cultivar_genes(cultivar_gene_file: str, key_column_index: int, file_row_ignore: int,
-                        db_conn: sqlite3.Connection) -> tuple:
+                        db_conn: sqlite3.Connection, compact_schema: bool = False,
+                        gene_layout: str = GENE_LAYOUT_WIDE) -> tuple:
     """Saves the cultivar to genes file into the database
     Arguments:
         cultivar_gene_file: path to the cultivar gene file to import
         key_column_index: the index of the column to provide key values
         file_row_ignore: number of rows to ignore at the start of the file
         db_conn: the database to write to
+        compact_schema: when True the ID is an alias of the table's rowid (see id_column_definition())
+        gene_layout: the layout of the saved genes (see Notes)
     Return:
         Returns the a tuple containing the column name of the cultivar field, and a list of table columns from the file
+    Notes:
+        The wide layout saves the file as the cultivar_genes table, with a column for each column of the file. The long
+        layout saves the gene names in the cultivar_gene_names table and a row for each cultivar and gene in the
+        cultivar_gene_values table, which isn't limited by the number of columns SQLite allows. When a cultivar is in
+        the long layout file more than once, its later values replace the earlier ones
     """
     if not key_column_index:
         key_index = 0
@@ -1412,8 +2878,8 @@ def save_cultivar_genes(cultivar_gene_file: str, key_column_index: int, file_row
 
     cultivar_column_name = None
     created_table = False
-    column_order = None
     column_names = None
+    converters = None
     insert_sql = None
     rows_inserted = 0
     with open(cultivar_gene_file, 'r') as in_file:
@@ -1426,49 +2892,61 @@ def save_cultivar_genes(cultivar_gene_file: str, key_column_index: int, file_row
             skip_count -= 1
 
         # Process the rest of the file
-        reader = csv.DictReader(in_file)
+        column_order, batches = read_gene_file_batches(in_file)
+        gene_columns = [idx for idx in range(0, len(column_order)) if idx != key_index]
         row_id = 1
-        for row in reader:
-            # Create the table the first time through
+        for batch in batches:
+            # Create the table the first time through, using the first batch to find the column types
             if not created_table:
-                column_order = tuple(row.keys())
                 if key_index >= len(column_order):
                     raise RuntimeError(
                         'Cultivar gene key column index value (%s) is greater than the number of columns: %s' %
                         (str(key_index), str(len(column_order))))
-                column_names = tuple([column.replace(' ', '_').replace('.', '_').lower() for column in column_order])
+                column_names = tuple([make_gene_column_name(column) for column in column_order])
                 cultivar_column_name = column_names[key_index]
-                logging.debug("Cultivar column name for cultivar_genes table: %s", cultivar_column_name)
-                logging.info('Creating cultivar_genes table with columns: %s', str(column_names))
-                create_sql = 'CREATE TABLE cultivar_genes (%s)' % \
-                             ('id INTEGER, ' + column_names[0] + ' TEXT, ' + ' INTEGER, '.join(
-                                 column_names[1:]) + ' INTEGER')
-                logging.debug('Create cultivar_genes SQL: %s', create_sql)
-                cg_cursor.execute(create_sql)
-                insert_sql = 'INSERT INTO cultivar_genes(id, ' + ','.join(column_names) + ') VALUES(' + \
-                             ','.join(['?' for _ in range(0, len(column_names) + 1)]) + ')'
-                logging.debug('Insert cultivar_genes SQL: %s', insert_sql)
+                converters = get_cultivar_gene_converters(batch)
+                if gene_layout == GENE_LAYOUT_LONG:
+                    create_cultivar_gene_names([column_names[idx] for idx in gene_columns], cg_cursor, compact_schema)
+                    insert_sql = 'INSERT OR REPLACE INTO cultivar_gene_values(cultivar, gene_id, value) VALUES(?, ?, ?)'
+                else:
+                    logging.debug("Cultivar column name for cultivar_genes table: %s", cultivar_column_name)
+                    logging.info('Creating cultivar_genes table with columns: %s', str(column_names))
+                    create_sql = 'CREATE TABLE cultivar_genes (%s)' % \
+                                 (id_column_definition('id', compact_schema) + ', ' + column_names[0] + ' TEXT, ' +
+                                  ' INTEGER, '.join(column_names[1:]) + ' INTEGER')
+                    logging.debug('Create cultivar_genes SQL: %s', create_sql)
+                    cg_cursor.execute(create_sql)
+                    insert_sql = 'INSERT INTO cultivar_genes(id, ' + ','.join(column_names) + ') VALUES(' + \
+                                 ','.join(['?' for _ in range(0, len(column_names) + 1)]) + ')'
+                    logging.debug('Insert cultivar_genes SQL: %s', insert_sql)
                 created_table = True
 
-            # Add the row
-            insert_values = [row_id]
-            for one_column in column_order:
-                int_match = re.search('^[-+]?\\d+$', row[one_column])
-                if row[one_column] == 'No WGS':
-                    insert_values.append(-1)
-                elif row[one_column] == 'NA':
-                    insert_values.append(-2)
-                elif int_match is not None:
-                    insert_values.append(int(row[one_column]))
-                else:
-                    insert_values.append(row[one_column])
-            cg_cursor.execute(insert_sql, insert_values)
-            rows_inserted += 1
-            row_id += 1
+            # Convert the values a column at a time and add the rows
+            batch_columns = list(zip(*batch))
+            if gene_layout == GENE_LAYOUT_LONG:
+                gene_ids = range(1, len(gene_columns) + 1)
+                gene_values = zip(*[converters[idx](batch_columns[idx]) for idx in gene_columns])
+                cg_cursor.executemany(insert_sql, itertools.chain.from_iterable(
+                    zip(itertools.repeat(cultivar_name), gene_ids, row_values)
+                    for cultivar_name, row_values in zip(batch_columns[key_index], gene_values)))
+            else:
+                cg_cursor.executemany(insert_sql, zip(range(row_id, row_id + len(batch)),
+                                                      *[one_converter(one_column) for one_converter, one_column
+                                                        in zip(converters, batch_columns)]))
+            rows_inserted += len(batch)
+            row_id += len(batch)
 
     # Create the index
-    cg_cursor.execute(
-        "CREATE UNIQUE INDEX 'cultivar_genes_index' ON 'cultivar_genes' ('id','" + cultivar_column_name + "' ASC)")
+    if created_table and gene_layout == GENE_LAYOUT_LONG:
+        # Finds the cultivars having a value of a gene without reading the other genes
+        cg_cursor.execute("CREATE INDEX 'cultivar_gene_values_index' ON 'cultivar_gene_values' "
+                          "('gene_id', 'value', 'cultivar' ASC)")
+    elif created_table and compact_schema:
+        cg_cursor.execute(
+            "CREATE INDEX 'cultivar_genes_index' ON 'cultivar_genes' ('" + cultivar_column_name + "' ASC)")
+    elif created_table:
+        cg_cursor.execute(
+            "CREATE UNIQUE INDEX 'cultivar_genes_index' ON 'cultivar_genes' ('id','" + cultivar_column_name + "' ASC)")
 
     db_conn.commit()
     cg_cursor.close()
@@ -1480,35 +2958,147 @@ def save_cultivar_genes(cultivar_gene_file: str, key_column_index: int, file_row
     return cultivar_column_name, column_names
 
 
+def get_file_hash(file_path: str) -> str:
+    """Returns the SHA-256 hash of a file's contents, using the cache when enabled (see enable_caches())
+    Arguments:
+        file_path: the path of the file
+    Return:
+        Returns the hexadecimal hash
+    """
+    def _hash() -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as in_file:
+            for chunk in iter(lambda: in_file.read(FILE_HASH_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    file_stat = os.stat(file_path)
+    return cached_value('file_hashes', (os.path.abspath(file_path), file_stat.st_mtime_ns, file_stat.st_size), _hash)
+
+
+def get_save_cached_genes(cache_folder: str, gene_file: str, import_options: dict, db_conn: sqlite3.Connection,
+                          loader: Callable):
+    """Copies the tables imported from a gene file into the database from the gene cache, importing the file into the
+       cache first when needed
+    Arguments:
+        cache_folder: the folder of the cached gene databases
+        gene_file: the path of the gene file
+        import_options: the options the file is imported with, which are part of the cache key
+        db_conn: the database to copy the tables to
+        loader: function that is passed a database connection and imports the gene file into it, returning a value
+                that can be converted to JSON
+    Return:
+        Returns the value returned by the loader when the file was imported, as converted to and from JSON
+    Exceptions:
+        Raises RuntimeError if the cache folder doesn't exist
+    Notes:
+        Each gene file is cached as a separate database named after the hash of the file's contents and the import
+        options, so that a changed file or options are imported again. The tables are created in the database with
+        their indexes and copied with "INSERT INTO ... SELECT *", which SQLite performs by copying the tables' and
+        indexes' records directly instead of decoding and re-inserting each row
+    """
+    if not os.path.isdir(cache_folder):
+        raise RuntimeError("Gene cache folder is not an existing folder: '%s'" % cache_folder)
+
+    cache_key = hashlib.sha256(json.dumps([GENE_CACHE_VERSION, get_file_hash(gene_file), import_options],
+                                          sort_keys=True).encode('utf-8')).hexdigest()
+    cache_file = os.path.join(cache_folder, 'genes_%s.sqlite' % cache_key[:32])
+    if os.path.exists(cache_file):
+        logging.info("Using cached gene database '%s' for '%s'", cache_file, gene_file)
+    else:
+        logging.info("Caching the import of '%s' in '%s'", gene_file, cache_file)
+        file_handle, working_filename = tempfile.mkstemp(dir=cache_folder, prefix=os.path.basename(cache_file) + '.',
+                                                         suffix='.tmp')
+        os.close(file_handle)
+        try:
+            cache_db = sqlite3.connect(working_filename)
+            try:
+                result = loader(cache_db)
+                cache_db.execute('CREATE TABLE %s (gene_file TEXT, import_options TEXT, result TEXT)' %
+                                 GENE_CACHE_INFO_TABLE)
+                cache_db.execute('INSERT INTO %s VALUES(?, ?, ?)' % GENE_CACHE_INFO_TABLE,
+                                 [os.path.abspath(gene_file), json.dumps(import_options), json.dumps(result)])
+                cache_db.commit()
+            finally:
+                cache_db.close()
+            os.replace(working_filename, cache_file)
+        finally:
+            if os.path.exists(working_filename):
+                os.unlink(working_filename)
+
+    # Create the tables and their indexes before copying so that the records are copied as they are
+    copy_cursor = db_conn.cursor()
+    copy_cursor.execute('ATTACH DATABASE ? AS gene_cache', [cache_file])
+    copy_cursor.execute('SELECT result FROM gene_cache.%s' % GENE_CACHE_INFO_TABLE)
+    result = json.loads(copy_cursor.fetchone()[0])
+    copy_cursor.execute("SELECT type, name, sql FROM gene_cache.sqlite_master WHERE sql IS NOT NULL AND tbl_name != ? "
+                        "ORDER BY type DESC", [GENE_CACHE_INFO_TABLE])
+    cache_schema = copy_cursor.fetchall()
+    for _, _, sql in cache_schema:
+        copy_cursor.execute(sql)
+    for obj_type, name, _ in cache_schema:
+        if obj_type == 'table':
+            copy_cursor.execute('INSERT INTO main.%s SELECT * FROM gene_cache.%s' % (name, name))
+            logging.info("Copied %s cached %s records", str(copy_cursor.rowcount), name)
+    db_conn.commit()
+
+    copy_cursor.execute('DETACH DATABASE gene_cache')
+    copy_cursor.close()
+
+    return result
+
+
 def create_db_views(db_conn: sqlite3.Connection, cultivar_genes_cultivar_column_name: str,
-                    cultivar_genes_all_column_names: list) -> None:
+                    cultivar_genes_all_column_names: list, normalize_folders: bool = False,
+                    gene_layout: str = GENE_LAYOUT_WIDE, pivot_genes: tuple = None) -> None:
     """Adds views to the database
     Arguments:
         db_conn: the database to write to
         cultivar_genes_cultivar_column_name: the column name in the cultivar_genes table that contains the cultivars
         cultivar_genes_all_column_names: the list of all column names in the cultivar_genes table
+        normalize_folders: set to True when the files table refers to the folders table for the folder of each file
+        gene_layout: the layout the cultivar genes were saved in (see save_cultivar_genes())
+        pivot_genes: the names of the genes to have columns in the views when the genes are in the long layout
+    Exceptions:
+        Raises RuntimeError if any of the pivot genes aren't in the cultivar_gene_names table
+    Notes:
+        With the long layout, the cultivar_gene_map view has the gene names of the values, and the cultivar_gene_pivot
+        view has a column for each of the pivot genes. The pivot gene columns of the views look up each value by its
+        key, so only the pivot genes are read however many genes there are
     """
     view_cursor = db_conn.cursor()
 
+    # The views always have a folder column; find it in the folders table when the files don't have it
+    if normalize_folders:
+        folder_column = 'd.folder'
+        folder_join = 'left join folders as d on f.folder_id = d.id'
+    else:
+        folder_column = 'f.folder'
+        folder_join = ''
+
     view_cursor.execute('''CREATE VIEW cultivar_files AS select e.id as plot_id, e.plot_name as plot_name, e.season as season,
                         e.plot_bb_min_lat as plot_bb_min_lat, e.plot_bb_min_lon as plot_bb_min_lon,
                         e.plot_bb_max_lat as plot_bb_max_lat, e.plot_bb_max_lon as plot_bb_max_lon,
-                        f.id as file_id, f.folder as folder, f.filename as filename, f.format as format, f.sensor as sensor,
+                        f.id as file_id, %s as folder, f.filename as filename, f.format as format, f.sensor as sensor,
                         f.start_time as start_time, f.finish_time as finish_time, f.gantry_x as gantry_x, f.gantry_y as gantry_y,
-                        f.gantry_z as gantry_z, c.name as cultivar_name
+                        f.gantry_z as gantry_z, c.name as cultivar_name,
+                        f.start_time_epoch as start_time_epoch, f.finish_time_epoch as finish_time_epoch
                         from season_info as e left join files as f on e.id = f.plot_id 
-                            left join cultivars as c on e.cultivar_id = c.id''')
+                            left join cultivars as c on e.cultivar_id = c.id
+                            %s''' % (folder_column, folder_join))
 
     view_cursor.execute('''CREATE VIEW weather_files AS select * from (select w.timestamp as timestamp, w.temperature as temperature,
                         w.illuminance as illuminance, w.precipitation as precipitation, w.sun_direction as sun_direction,
                         w.wind_speed as wind_speed, w.wind_direction as wind_direction, w.relative_humidity as relative_humidity, 
-                        f.id as file_id, f.folder as folder, f.filename as filename, f.format as format, f.sensor as sensor,
+                        f.id as file_id, %s as folder, f.filename as filename, f.format as format, f.sensor as sensor,
                         f.start_time as start_time, f.finish_time as finish_time, f.gantry_x as gantry_x, f.gantry_y as gantry_y,
-                        f.gantry_z as gantry_z
+                        f.gantry_z as gantry_z, w.timestamp_epoch as timestamp_epoch,
+                        f.start_time_epoch as start_time_epoch, f.finish_time_epoch as finish_time_epoch
                         from weather as w left join weather_file_map as wf on w.id = wf.min_weather_id
-                            left join files as f on wf.file_id = f.id) a where not a.file_id is NULL''')
+                            left join files as f on wf.file_id = f.id
+                            %s) a where not a.file_id is NULL''' % (folder_column, folder_join))
 
-    view_template = '''CREATE VIEW unified as select f.id as file_id, f.folder as folder, f.filename as filename,
+    view_template = '''CREATE VIEW unified as select f.id as file_id, ''' + folder_column + ''' as folder, f.filename as filename,
                     f.format as format, f.sensor as sensor, f.start_time as start_time, f.finish_time as finish_time,
                     f.gantry_x as gantry_x, f.gantry_y as gantry_y, f.gantry_z as gantry_z,
                     e.id as plot_id, e.plot_name as plot_name, e.season as season,
@@ -1518,25 +3108,76 @@ def create_db_views(db_conn: sqlite3.Connection, cultivar_genes_cultivar_column_
                     %s
                     w.timestamp as weather_timestamp, w.temperature as temperature,
                     w.illuminance as illuminance, w.precipitation as precipitation, w.sun_direction as sun_direction,
-                    w.wind_speed as wind_speed, w.wind_direction as wind_direction, w.relative_humidity as relative_humidity
+                    w.wind_speed as wind_speed, w.wind_direction as wind_direction, w.relative_humidity as relative_humidity,
+                    f.start_time_epoch as start_time_epoch, f.finish_time_epoch as finish_time_epoch,
+                    w.timestamp_epoch as weather_timestamp_epoch, fws.weather_count as weather_count,
+                    %s
                     from files f left join season_info as e on f.plot_id = e.id
                         left join cultivars as c on e.cultivar_id = c.id
                         %s
-                        left join weather_files as w on f.id = w.file_id'''
-
-    if cultivar_genes_cultivar_column_name:
+                        left join weather_files as w on f.id = w.file_id
+                        left join file_weather_stats as fws on f.id = fws.file_id
+                        ''' + folder_join
+
+    stats_columns = []
+    for one_measurement in WEATHER_MEASUREMENTS:
+        stats_columns.extend(['fws.%s_%s as %s_%s' % (one_measurement, one_stat, one_measurement, one_stat)
+                              for one_stat in ('min', 'mean', 'max')])
+
+    if cultivar_genes_cultivar_column_name and gene_layout == GENE_LAYOUT_LONG:
+        view_cursor.execute('''CREATE VIEW cultivar_gene_map AS select v.cultivar as cultivar, n.name as gene,
+                            v.value as value from cultivar_gene_values as v join cultivar_gene_names as n
+                            on v.gene_id = n.id''')
+        pivot_columns = get_pivot_gene_columns(db_conn, pivot_genes or (), 'v.cultivar')
+        if pivot_columns:
+            view_cursor.execute('''CREATE VIEW cultivar_gene_pivot AS select v.cultivar as cultivar, %s
+                                from (select distinct cultivar from cultivar_gene_values) as v''' %
+                                ', '.join(pivot_columns))
+        pivot_columns = get_pivot_gene_columns(db_conn, pivot_genes or (), 'c.name')
+        view_sql = view_template % (''.join([one_column + ', ' for one_column in pivot_columns]),
+                                    ', '.join(stats_columns), '')
+    elif cultivar_genes_cultivar_column_name:
         join_columns = ['cg.' + one_name for one_name in cultivar_genes_all_column_names
                         if one_name not in ['id', cultivar_genes_cultivar_column_name]]
-        view_sql = view_template % (','.join(join_columns) + ', ', 'left join cultivar_genes as cg on c.name = cg.' +
-                                    cultivar_genes_cultivar_column_name)
+        view_sql = view_template % (','.join(join_columns) + ', ', ', '.join(stats_columns),
+                                    'left join cultivar_genes as cg on c.name = cg.' + cultivar_genes_cultivar_column_name)
     else:
-        view_sql = view_template % ('', '')
+        view_sql = view_template % ('', ', '.join(stats_columns), '')
     logging.debug('Unified view SQL: %s', view_sql)
     view_cursor.execute(view_sql)
 
     view_cursor.close()
 
 
+def get_pivot_gene_columns(db_conn: sqlite3.Connection, pivot_genes: tuple, cultivar_column: str) -> list:
+    """Returns the view column definitions that look up the values of genes saved in the long layout
+    Arguments:
+        db_conn: the database to query
+        pivot_genes: the names of the genes to return columns for, as in the cultivar gene file's header
+        cultivar_column: the qualified name of the column with the name of the cultivar to look up
+    Return:
+        Returns the list of column definitions, in the order of the pivot genes, each named after its gene
+    Exceptions:
+        Raises RuntimeError if any of the genes aren't in the cultivar_gene_names table
+    """
+    gene_ids = {}
+    gene_cursor = db_conn.cursor()
+    for one_gene in pivot_genes:
+        gene_cursor.execute('SELECT id, name FROM cultivar_gene_names WHERE name = ?', [make_gene_column_name(one_gene)])
+        found = gene_cursor.fetchone()
+        if found is not None:
+            gene_ids[found[1]] = found[0]
+        else:
+            logging.error("Unable to find the pivot gene '%s' in the cultivar genes", one_gene)
+    gene_cursor.close()
+
+    if len(gene_ids) < len(set(make_gene_column_name(one_gene) for one_gene in pivot_genes)):
+        raise RuntimeError("Unable to find all the pivot genes in the cultivar genes")
+
+    return ['(select value from cultivar_gene_values where cultivar = %s and gene_id = %s) as "%s"' %
+            (cultivar_column, str(gene_id), gene_name.replace('"', '""')) for gene_name, gene_id in gene_ids.items()]
+
+
 def count_final_records(db_conn: sqlite3.Connection) -> int:
     """Adds views to the database
     Arguments:
@@ -1557,65 +3198,633 @@ def count_final_records(db_conn: sqlite3.Connection) -> int:
     return 0
 
 
-def generate() -> None:
-    """Performs all the steps needed to generate the SQLite database
+def get_build_folder(build_location: Optional[str], output_file: str) -> Optional[str]:
+    """Returns the folder to build the database in
+    Arguments:
+        build_location: where to build the database (see open_working_database())
+        output_file: the path of the file the database will be published to
+    Return:
+        Returns the path of the folder, or None for the system temporary folder
     Exceptions:
-        RuntimeError exceptions are raised when something goes wrong
+        Raises RuntimeError if the build location isn't an existing folder
     """
-    parser = argparse.ArgumentParser(description="Generate SQLite database for file discovery")
-    add_arguments(parser)
-    args = parser.parse_args()
+    if build_location == BUILD_LOCATION_TARGET:
+        build_folder = os.path.dirname(os.path.abspath(output_file))
+    else:
+        build_folder = build_location
+    if build_folder and not os.path.isdir(build_folder):
+        raise RuntimeError("Build location is not an existing folder: '%s'" % build_folder)
 
-    # Check for debugging
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
-    logging.debug("Command line args: %s", str(args))
+    return build_folder
 
-    # Break apart any command line arguments that may be multi-part
-    sensors = prepare_sensors(args.sensors)
-    dates = prepare_dates(args.dates)
-    logging.info("Specified sensors: %s", str(sensors))
-    logging.info("Specified dates: %s", str(dates))
 
-    # Get other values we'll need
-    betydb_url = get_betydb_url(args.betydb_url)
-    betydb_key = get_betydb_key(args.betydb_key)
-    brapi_url = get_brapi_url(args.brapi_url)
+def open_working_database(build_location: Optional[str], output_file: str) -> tuple:
+    """Opens the database to build
+    Arguments:
+        build_location: where to build the database (see Notes)
+        output_file: the path of the file the database will be published to
+    Return:
+        Returns a tuple containing the database connection and the path of the working file; the path is None when the
+        database is in memory
+    Exceptions:
+        Raises RuntimeError if the build location isn't an existing folder
+    Notes:
+        The build location can be BUILD_LOCATION_MEMORY, to build in memory, BUILD_LOCATION_TARGET, to build in the folder
+        of the output file, or the path to a folder. The system temporary folder is used when the build location is
+        not specified
+    """
+    if build_location == BUILD_LOCATION_MEMORY:
+        logging.info("Building the database in memory")
+        return sqlite3.connect(':memory:'), None
+
+    build_folder = get_build_folder(build_location, output_file)
+    file_handle, working_filename = tempfile.mkstemp(dir=build_folder, suffix='.db')
+    os.close(file_handle)
+    logging.info("Building the database in file '%s'", working_filename)
+    return sqlite3.connect(working_filename), working_filename
+
+
+def get_build_signature(args: argparse.Namespace) -> str:
+    """Returns a string identifying what the command line arguments build
+    Arguments:
+        args: the parsed command line arguments
+    Return:
+        Returns the JSON of the arguments that change the contents of the database
+    """
+    return json.dumps({key: value for key, value in vars(args).items() if key not in BUILD_SIGNATURE_IGNORE_ARGS},
+                      sort_keys=True)
+
+
+def open_resumable_database(build_location: Optional[str], output_file: str, build_signature: str) -> tuple:
+    """Opens the database to build, reopening the working database of an earlier build that didn't finish
+    Arguments:
+        build_location: where to build the database (see open_working_database())
+        output_file: the path of the file the database will be published to
+        build_signature: identifies what's being built (see get_build_signature())
+    Return:
+        Returns a tuple containing the database connection and the path of the working file
+    Exceptions:
+        Raises RuntimeError if the build location is in memory or isn't an existing folder
+    Notes:
+        The working file is named after the output file so that a rerun finds it. A working file built with a different
+        signature is removed and the build starts over
+    """
+    if build_location == BUILD_LOCATION_MEMORY:
+        raise RuntimeError("Unable to resume a build in memory, please specify a different build location")
+
+    build_folder = get_build_folder(build_location, output_file)
+    if not build_folder:
+        build_folder = tempfile.gettempdir()
+    output_path = os.path.abspath(output_file)
+    working_filename = os.path.join(build_folder, '%s.%s.partial' % (os.path.basename(output_path),
+                                                                      hashlib.sha1(output_path.encode('utf-8')).hexdigest()[:12]))
+
+    if os.path.exists(working_filename):
+        db_conn = sqlite3.connect(working_filename)
+        try:
+            previous_signature = get_journal_result(db_conn, 'arguments')
+        except sqlite3.DatabaseError as ex:
+            logging.debug("Unable to read build journal of '%s': %s", working_filename, str(ex))
+            previous_signature = None
+        if previous_signature == build_signature:
+            logging.info("Resuming the build in file '%s'", working_filename)
+            return db_conn, working_filename
+
+        logging.warning("Starting over since the unfinished build in '%s' used different arguments", working_filename)
+        db_conn.close()
+        os.unlink(working_filename)
+
+    logging.info("Building the database in file '%s'", working_filename)
+    db_conn = sqlite3.connect(working_filename)
+    record_journal_stage(db_conn, 'arguments', result=build_signature)
+    return db_conn, working_filename
+
+
+def get_journal_result(db_conn: sqlite3.Connection, stage: str, date: str = '') -> Optional[str]:
+    """Returns the result recorded for a completed build stage
+    Arguments:
+        db_conn: the database being built
+        stage: the name of the stage
+        date: the date, or dates, the stage covers for stages that are run per date
+    Return:
+        Returns the recorded result, or None if the stage hasn't been completed
+    """
+    journal_cursor = db_conn.cursor()
+    journal_cursor.execute('CREATE TABLE IF NOT EXISTS %s (stage TEXT, date TEXT, result TEXT)' % BUILD_JOURNAL_TABLE)
+    journal_cursor.execute('SELECT result FROM %s WHERE stage = ? AND date = ?' % BUILD_JOURNAL_TABLE, [stage, date])
+    found = journal_cursor.fetchone()
+    journal_cursor.close()
+
+    return found[0] if found else None
+
+
+def record_journal_stage(db_conn: sqlite3.Connection, stage: str, date: str = '', result: str = '') -> None:
+    """Records a build stage as completed
+    Arguments:
+        db_conn: the database being built
+        stage: the name of the stage
+        date: the date, or dates, the stage covers for stages that are run per date
+        result: the result of the stage that later stages need when the stage is skipped
+    """
+    journal_cursor = db_conn.cursor()
+    journal_cursor.execute('CREATE TABLE IF NOT EXISTS %s (stage TEXT, date TEXT, result TEXT)' % BUILD_JOURNAL_TABLE)
+    journal_cursor.execute('INSERT INTO %s VALUES(?, ?, ?)' % BUILD_JOURNAL_TABLE, [stage, date, result])
+    db_conn.commit()
+    journal_cursor.close()
+
+
+def remove_unjournaled_rows(db_conn: sqlite3.Connection, table_name: str, stage: str, id_column: str = 'id') -> None:
+    """Removes rows left behind by a per date stage that didn't complete
+    Arguments:
+        db_conn: the database being built
+        table_name: the name of the table the stage writes to
+        stage: the name of the stage
+        id_column: the name of the table's column of the IDs recorded by the stage
+    Notes:
+        Each completed date of the stage records the largest ID in the table as its result; rows with larger IDs
+        were written by a date that didn't complete
+    """
+    table_cursor = db_conn.cursor()
+    table_cursor.execute("SELECT count(1) FROM sqlite_master WHERE type = 'table' AND name = ?", [table_name])
+    if table_cursor.fetchone()[0]:
+        table_cursor.execute('SELECT coalesce(max(CAST(result AS INTEGER)), 0) FROM %s WHERE stage = ?' %
+                             BUILD_JOURNAL_TABLE, [stage])
+        last_id = table_cursor.fetchone()[0]
+        table_cursor.execute('DELETE FROM %s WHERE %s > ?' % (table_name, id_column), [last_id])
+        if table_cursor.rowcount > 0:
+            logging.info("Removed %s %s records of an unfinished date", str(table_cursor.rowcount), table_name)
+        db_conn.commit()
+    table_cursor.close()
+
+
+def drop_tables(db_conn: sqlite3.Connection, table_names: tuple) -> None:
+    """Removes tables from the database so that the stage creating them can be run again
+    Arguments:
+        db_conn: the database being built
+        table_names: the names of the tables to remove
+    """
+    drop_cursor = db_conn.cursor()
+    for one_table in table_names:
+        drop_cursor.execute('DROP TABLE IF EXISTS %s' % one_table)
+    db_conn.commit()
+    drop_cursor.close()
+
+
+def load_files_timestamps(db_conn: sqlite3.Connection) -> dict:
+    """Loads the start and finish timestamps of the files already saved to the database
+    Arguments:
+        db_conn: the database being built
+    Return:
+        Returns a dictionary of file IDs, and their associated start and finish timestamps as a tuple
+    """
+    files_cursor = db_conn.cursor()
+    files_cursor.execute('SELECT id, start_time_epoch, finish_time_epoch FROM files ORDER BY id')
+    files_timestamps = {file_id: (timestamp_from_epoch(start_epoch), timestamp_from_epoch(finish_epoch))
+                        for file_id, start_epoch, finish_epoch in files_cursor}
+    files_cursor.close()
+
+    return files_timestamps
+
+
+def load_weather_timestamps(db_conn: sqlite3.Connection) -> dict:
+    """Loads the timestamps of the weather already saved to the database
+    Arguments:
+        db_conn: the database being built
+    Return:
+        Returns a dictionary of the weather IDs and their associated timestamps
+    """
+    weather_cursor = db_conn.cursor()
+    weather_cursor.execute('SELECT id, timestamp_epoch FROM weather ORDER BY id')
+    weather_timestamps = {weather_id: timestamp_from_epoch(weather_epoch) for weather_id, weather_epoch in weather_cursor}
+    weather_cursor.close()
+
+    return weather_timestamps
+
+
+def load_weather_rollups(db_conn: sqlite3.Connection) -> dict:
+    """Builds the weather rollups from the weather already saved to the database
+    Arguments:
+        db_conn: the database being built
+    Return:
+        Returns the rollups (see update_weather_rollups())
+    """
+    rollups = {one_table: {} for one_table, _ in WEATHER_ROLLUPS}
+    weather_cursor = db_conn.cursor()
+    weather_cursor.execute('SELECT timestamp_epoch, %s FROM weather ORDER BY id' % ', '.join(WEATHER_MEASUREMENTS))
+    for one_row in weather_cursor:
+        update_weather_rollups(rollups, one_row[0], one_row[1:])
+    weather_cursor.close()
+
+    return rollups
+
+
+def table_max_id(db_conn: sqlite3.Connection, table_name: str) -> int:
+    """Returns the largest ID in a table
+    Arguments:
+        db_conn: the database being built
+        table_name: the name of the table
+    Return:
+        Returns the largest ID, or zero if the table is empty or doesn't exist
+    """
+    id_cursor = db_conn.cursor()
+    id_cursor.execute("SELECT count(1) FROM sqlite_master WHERE type = 'table' AND name = ?", [table_name])
+    max_id = 0
+    if id_cursor.fetchone()[0]:
+        id_cursor.execute('SELECT coalesce(max(id), 0) FROM %s' % table_name)
+        max_id = id_cursor.fetchone()[0]
+    id_cursor.close()
+
+    return max_id
+
+
+def get_date_groups(date_ids: dict, per_date: bool) -> list:
+    """Returns the groups of dates to process together
+    Arguments:
+        date_ids: the dates with their associated IDs
+        per_date: set to True to process each date on its own
+    Return:
+        Returns a list of tuples containing the journal name of each group and the dictionary of its dates and IDs
+    """
+    if per_date:
+        return [(one_date, {one_date: date_ids[one_date]}) for one_date in sorted(date_ids)]
+
+    return [('', date_ids)]
+
+
+def open_progressive_database(output_file: str) -> sqlite3.Connection:
+    """Opens the output file to build the database in, so that it can be queried while it's built
+    Arguments:
+        output_file: the path of the database file
+    Return:
+        Returns the database connection
+    Notes:
+        Any existing output file is removed. The database is put into WAL mode so that readers see each committed
+        date without blocking, or being blocked by, the build
+    """
+    for one_suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(output_file + one_suffix):
+            logging.debug("Removing existing file '%s'", output_file + one_suffix)
+            os.unlink(output_file + one_suffix)
+
+    logging.info("Building the database progressively in file '%s'", output_file)
+    db_conn = sqlite3.connect(output_file)
+    db_conn.execute('PRAGMA journal_mode=WAL')
+    db_conn.execute('PRAGMA synchronous=NORMAL')
+
+    return db_conn
+
+
+def init_build_progress(db_conn: sqlite3.Connection, date_groups: list) -> None:
+    """Creates the table that tracks the progress of the build
+    Arguments:
+        db_conn: the database being built
+        date_groups: the groups of dates being built (see get_date_groups())
+    Notes:
+        There's a row for the files and weather of each date, and a row for the build as a whole with an empty date.
+        Each row's status is one of 'pending', 'complete', or 'failed'
+    """
+    progress_cursor = db_conn.cursor()
+    progress_cursor.execute('''CREATE TABLE %s (stage TEXT, date TEXT, status TEXT, record_count INTEGER,
+                               updated TEXT, PRIMARY KEY (stage, date))''' % BUILD_PROGRESS_TABLE)
+    progress_cursor.execute('INSERT INTO %s VALUES(?, ?, ?, NULL, ?)' % BUILD_PROGRESS_TABLE,
+                            ['build', '', 'pending', datetime.now().isoformat(' ', 'seconds')])
+    for one_stage in ('files', 'weather'):
+        for group_name, _ in date_groups:
+            progress_cursor.execute('INSERT INTO %s VALUES(?, ?, ?, NULL, NULL)' % BUILD_PROGRESS_TABLE,
+                                    [one_stage, group_name, 'pending'])
+    db_conn.commit()
+    progress_cursor.close()
 
-    # Get our temporary file name
-    _, working_filename = tempfile.mkstemp()
-    sql_db = sqlite3.connect(working_filename)
 
+def update_build_progress(db_conn: sqlite3.Connection, stage: str, date: str, status: str,
+                          record_count: int = None) -> None:
+    """Updates the progress of a build stage
+    Arguments:
+        db_conn: the database being built
+        stage: the name of the stage
+        date: the date the stage covers, or an empty string for the build as a whole
+        status: the status of the stage
+        record_count: the number of records the stage saved
+    """
+    progress_cursor = db_conn.cursor()
+    progress_cursor.execute('UPDATE %s SET status = ?, record_count = ?, updated = ? WHERE stage = ? AND date = ?' %
+                            BUILD_PROGRESS_TABLE,
+                            [status, record_count, datetime.now().isoformat(' ', 'seconds'), stage, date])
+    db_conn.commit()
+    progress_cursor.close()
+
+
+def finish_progressive_database(db_conn: sqlite3.Connection) -> None:
+    """Marks a progressively built database as complete and closes it
+    Arguments:
+        db_conn: the database being built
+    Notes:
+        The WAL is checkpointed into the database and the database is switched back to a rollback journal so that
+        it can be read from read-only locations. The database is left in WAL mode if readers prevent the switch
+    """
+    update_build_progress(db_conn, 'build', '', 'complete')
+    db_conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    try:
+        db_conn.execute('PRAGMA journal_mode=DELETE')
+    except sqlite3.OperationalError as ex:
+        logging.warning("Leaving the database in WAL mode since it's being read: %s", str(ex))
+    db_conn.close()
+
+
+def publish_database(db_conn: sqlite3.Connection, working_filename: Optional[str], output_file: str) -> None:
+    """Publishes the working database to the output file and closes the database
+    Arguments:
+        db_conn: the working database
+        working_filename: the path of the working database file, or None if the database is in memory
+        output_file: the path of the file to publish to
+    Notes:
+        A working file on the same file system as the output file is renamed to the output file. Otherwise the
+        database is copied with the SQLite backup API to a temporary file next to the output file, which is then renamed.
+        Either way the output file is replaced in one step and the database is only written once to the output
+        file system
+    """
+    output_folder = os.path.dirname(os.path.abspath(output_file))
+
+    if working_filename and os.stat(working_filename).st_dev == os.stat(output_folder).st_dev:
+        db_conn.close()
+        logging.debug("Renaming working database '%s' to '%s'", working_filename, output_file)
+        os.replace(working_filename, output_file)
+        return
+
+    file_handle, publish_filename = tempfile.mkstemp(dir=output_folder, prefix=os.path.basename(output_file) + '.',
+                                                     suffix='.tmp')
+    os.close(file_handle)
     try:
-        # Generate the experiments table
-        experiments, cultivars, date_experiment_ids = get_save_experiments(dates, sql_db, betydb_url, betydb_key,
-                                                                           brapi_url, args.experiment_json)
+        logging.debug("Copying working database to '%s'", publish_filename)
+        publish_db = sqlite3.connect(publish_filename)
+        try:
+            db_conn.backup(publish_db)
+        finally:
+            publish_db.close()
+        db_conn.close()
+        os.replace(publish_filename, output_file)
+    finally:
+        if os.path.exists(publish_filename):
+            os.unlink(publish_filename)
 
-        # Generating the cultivars table
-        save_cultivars(cultivars, sql_db)
 
+def build_database(args: argparse.Namespace, sensors: tuple, dates: tuple, sql_db: sqlite3.Connection) -> None:
+    """Builds the database, skipping the stages recorded as completed by an earlier build
+    Arguments:
+        args: the parsed command line arguments
+        sensors: the sensors to include
+        dates: the dates to include
+        sql_db: the database to build
+    Exceptions:
+        RuntimeError exceptions are raised when something goes wrong
+    Notes:
+        When resuming, the files and weather are saved one date at a time so that only the date being worked on when
+        a build stopped needs to be redone. The experiments are always fetched again since later stages rely on them.
+        When building progressively, the empty weather tables and the views are created up front. Each date's files,
+        weather, file to weather mapping, and weather statistics are then saved before moving on to the next date; when
+        the weather is pruned, the next date's files are saved before a date's weather so that the same weather is kept
+        as in other builds
+    """
+    # Get other values we'll need
+    betydb_url = get_betydb_url(args.betydb_url)
+    betydb_key = get_betydb_key(args.betydb_key)
+    brapi_url = get_brapi_url(args.brapi_url)
+    metadata_columns = prepare_metadata_columns(args.metadata_columns)
+
+    # Generate the experiments table
+    drop_tables(sql_db, ('season_info', 'cultivars'))
+    experiments, cultivars, date_experiment_ids = get_save_experiments(dates, sql_db, betydb_url, betydb_key,
+                                                                       brapi_url, args.experiment_json,
+                                                                       args.compact_schema)
+
+    # Generating the cultivars table
+    save_cultivars(cultivars, sql_db, args.compact_schema)
+
+    date_groups = get_date_groups(date_experiment_ids, args.resume or args.progressive)
+    if args.progressive:
+        # Readers can query the views, which are empty until the first date is complete
+        init_build_progress(sql_db, date_groups)
+        table_cursor = sql_db.cursor()
+        define_weather_table(table_cursor, args.compact_schema)
+        define_weather_file_map_table(table_cursor, args.compact_schema)
+        define_file_weather_stats_table(table_cursor, args.compact_schema)
+        table_cursor.close()
+        sql_db.commit()
+        create_db_views(sql_db, None, None, args.normalize_folders)
+
+    match_in_sql = args.weather_match == WEATHER_MATCH_SQL or args.progressive
+    keep_timestamps = not match_in_sql
+    weather_rollups = {one_table: {} for one_table, _ in WEATHER_ROLLUPS}
+
+    def _save_group_files(group_name: str, group_date_ids: dict) -> dict:
+        """Saves the files of a group of dates and returns their timestamps"""
+        remove_unjournaled_rows(sql_db, 'files', 'files')
+        if args.normalize_folders:
+            remove_unjournaled_rows(sql_db, 'folders', 'folders')
+        if args.file_metadata:
+            remove_unjournaled_rows(sql_db, 'file_metadata', 'files', 'file_id')
+        group_files_timestamps = local_get_save_files(LOCAL_START_PATH, sensors, experiments, group_date_ids, sql_db,
+                                                      args.compact_schema, args.normalize_folders,
+                                                      metadata_columns if args.file_metadata else None,
+                                                      args.plot_assignment)
+        if args.progressive:
+            update_build_progress(sql_db, 'files', group_name, 'complete', len(group_files_timestamps))
+        if args.normalize_folders:
+            record_journal_stage(sql_db, 'folders', group_name, str(table_max_id(sql_db, 'folders')))
+        record_journal_stage(sql_db, 'files', group_name, str(table_max_id(sql_db, 'files')))
+        return group_files_timestamps
+
+    def _save_group_weather(group_name: str, group_date_ids: dict, time_windows: Optional[tuple]) -> dict:
+        """Saves the weather of a group of dates and returns their timestamps (when they're kept)"""
+        remove_unjournaled_rows(sql_db, 'weather', 'weather')
+        if time_windows is not None and group_name:
+            time_windows = select_date_time_windows(time_windows, list(group_date_ids.keys()))
+        first_weather_id = table_max_id(sql_db, 'weather')
+        group_weather_timestamps = get_save_weather(group_date_ids, sql_db, time_windows, keep_timestamps,
+                                                    args.compact_schema, weather_rollups, args.weather_workers)
+        if args.progressive:
+            # Match the files saved so far to the weather so that they can be queried
+            create_weather_files_table_sql(sql_db, args.compact_schema, map_all=False)
+            create_file_weather_stats_table(sql_db, args.compact_schema, warn_empty=False)
+            update_build_progress(sql_db, 'weather', group_name, 'complete',
+                                  table_max_id(sql_db, 'weather') - first_weather_id)
+        record_journal_stage(sql_db, 'weather', group_name, str(table_max_id(sql_db, 'weather')))
+        return group_weather_timestamps
+
+    files_timestamps = {}
+    weather_timestamps = {}
+    files_resumed = False
+    weather_resumed = False
+    if args.progressive:
+        # Each date is completed, through to its files' weather statistics, before the next date is started. When
+        # pruning, the files of the next date are saved first since the capture windows of files near midnight reach
+        # into the neighbouring date, and the weather is pruned to the windows of all the files saved so far
+        files_saved = 0
+        for group_idx, (group_name, group_date_ids) in enumerate(date_groups):
+            last_files_idx = min(group_idx + 1 if args.prune_weather else group_idx, len(date_groups) - 1)
+            while files_saved <= last_files_idx:
+                group_files_timestamps = _save_group_files(*date_groups[files_saved])
+                if args.prune_weather:
+                    files_timestamps.update(group_files_timestamps)
+                files_saved += 1
+            time_windows = None
+            if args.prune_weather:
+                time_windows = compute_capture_windows(files_timestamps, args.prune_weather_margin)
+            _save_group_weather(group_name, group_date_ids, time_windows)
+    else:
         # Create the files table
-        files_timestamps = local_get_save_files(LOCAL_START_PATH, sensors, experiments, date_experiment_ids, sql_db)
+        for group_name, group_date_ids in date_groups:
+            if get_journal_result(sql_db, 'files', group_name) is not None:
+                logging.info("Skipping saving files for completed dates: %s", ','.join(group_date_ids.keys()))
+                files_resumed = True
+                continue
+            files_timestamps.update(_save_group_files(group_name, group_date_ids))
+        if files_resumed:
+            files_timestamps = load_files_timestamps(sql_db)
 
         # Create the weather table
-        weather_timestamps = get_save_weather(date_experiment_ids, sql_db)
+        time_windows = None
+        if args.prune_weather:
+            time_windows = compute_capture_windows(files_timestamps, args.prune_weather_margin)
+        for group_name, group_date_ids in date_groups:
+            if get_journal_result(sql_db, 'weather', group_name) is not None:
+                logging.info("Skipping saving weather for completed dates: %s", ','.join(group_date_ids.keys()))
+                weather_resumed = True
+                continue
+            weather_timestamps.update(_save_group_weather(group_name, group_date_ids, time_windows))
+        if weather_resumed and keep_timestamps:
+            weather_timestamps = load_weather_timestamps(sql_db)
+
+    if args.prune_weather:
+        # Rollups of the readings kept around the files' capture times would be missing most of each period's readings
+        logging.info("Not creating the weather rollup tables since the weather is pruned")
+    elif get_journal_result(sql_db, 'weather_rollups') is None:
+        if weather_resumed:
+            weather_rollups = load_weather_rollups(sql_db)
+        drop_tables(sql_db, tuple(one_table for one_table, _ in WEATHER_ROLLUPS))
+        save_weather_rollups(weather_rollups, sql_db, args.compact_schema)
+        record_journal_stage(sql_db, 'weather_rollups')
+    del weather_rollups
+
+    # Create supporting tables, finishing those built up while building progressively
+    if get_journal_result(sql_db, 'weather_file_map') is None:
+        if not args.progressive:
+            drop_tables(sql_db, ('weather_file_map',))
+        if match_in_sql:
+            create_weather_files_table_sql(sql_db, args.compact_schema)
+        else:
+            create_weather_files_table(weather_timestamps, files_timestamps, sql_db, args.compact_schema)
+        record_journal_stage(sql_db, 'weather_file_map')
+    if get_journal_result(sql_db, 'file_weather_stats') is None:
+        if not args.progressive:
+            drop_tables(sql_db, ('file_weather_stats',))
+        create_file_weather_stats_table(sql_db, args.compact_schema)
+        record_journal_stage(sql_db, 'file_weather_stats')
+
+    # Add gene marker information
+    cultivar_column_name = None
+    cultivar_genes_column_names = None
+    if args.gene_marker_file and get_journal_result(sql_db, 'gene_markers') is None:
+        drop_tables(sql_db, ('gene_markers',))
+        if args.gene_cache_folder:
+            get_save_cached_genes(args.gene_cache_folder, args.gene_marker_file,
+                                  {'table': 'gene_markers', 'key': args.gene_marker_file_key,
+                                   'ignore': args.gene_marker_file_ignore, 'compact_schema': args.compact_schema},
+                                  sql_db, lambda cache_db: save_gene_markers(args.gene_marker_file,
+                                                                             args.gene_marker_file_key,
+                                                                             args.gene_marker_file_ignore, cache_db,
+                                                                             args.compact_schema))
+        else:
+            _ = save_gene_markers(args.gene_marker_file, args.gene_marker_file_key, args.gene_marker_file_ignore,
+                                  sql_db, args.compact_schema)
+        record_journal_stage(sql_db, 'gene_markers')
+    if args.cultivar_gene_map_file:
+        cultivar_genes_result = get_journal_result(sql_db, 'cultivar_genes')
+        if cultivar_genes_result is None:
+            drop_tables(sql_db, ('cultivar_genes', 'cultivar_gene_names', 'cultivar_gene_values'))
+            if args.gene_cache_folder:
+                cultivar_column_name, cultivar_genes_column_names = get_save_cached_genes(
+                    args.gene_cache_folder, args.cultivar_gene_map_file,
+                    {'table': 'cultivar_genes', 'key': args.cultivar_gene_file_key,
+                     'ignore': args.cultivar_gene_map_file_ignore, 'compact_schema': args.compact_schema,
+                     'gene_layout': args.gene_layout},
+                    sql_db, lambda cache_db: save_cultivar_genes(args.cultivar_gene_map_file, args.cultivar_gene_file_key,
+                                                                 args.cultivar_gene_map_file_ignore, cache_db,
+                                                                 args.compact_schema, args.gene_layout))
+            else:
+                cultivar_column_name, cultivar_genes_column_names = save_cultivar_genes(
+                    args.cultivar_gene_map_file, args.cultivar_gene_file_key, args.cultivar_gene_map_file_ignore,
+                    sql_db, args.compact_schema, args.gene_layout)
+            record_journal_stage(sql_db, 'cultivar_genes',
+                                 result=json.dumps([cultivar_column_name, cultivar_genes_column_names]))
+        else:
+            cultivar_column_name, cultivar_genes_column_names = json.loads(cultivar_genes_result)
+
+    # Index the files for searching
+    if args.file_search and get_journal_result(sql_db, FILE_SEARCH_TABLE) is None:
+        drop_tables(sql_db, (FILE_SEARCH_TABLE,))
+        create_file_search_table(sql_db, args.normalize_folders)
+        record_journal_stage(sql_db, FILE_SEARCH_TABLE)
+
+    # Create the views
+    view_cursor = sql_db.cursor()
+    for one_view in ('cultivar_files', 'weather_files', 'unified', 'cultivar_gene_map', 'cultivar_gene_pivot'):
+        view_cursor.execute('DROP VIEW IF EXISTS %s' % one_view)
+    view_cursor.close()
+    pivot_genes = tuple(one_gene.strip() for one_gene in args.gene_pivot.split(',')) if args.gene_pivot else None
+    create_db_views(sql_db, cultivar_column_name, cultivar_genes_column_names, args.normalize_folders,
+                    args.gene_layout, pivot_genes)
 
-        # Create supporting tables
-        create_weather_files_table(weather_timestamps, files_timestamps, sql_db)
+    # The journal isn't needed once the build is complete
+    drop_tables(sql_db, (BUILD_JOURNAL_TABLE,))
 
-        # Add gene marker information
-        cultivar_column_name = None
-        cultivar_genes_column_names = None
-        if args.gene_marker_file:
-            _ = save_gene_markers(args.gene_marker_file, args.gene_marker_file_key, args.gene_marker_file_ignore, sql_db)
-        if args.cultivar_gene_map_file:
-            cultivar_column_name, cultivar_genes_column_names = save_cultivar_genes(args.cultivar_gene_map_file,
-                                                                                    args.cultivar_gene_file_key,
-                                                                                    args.cultivar_gene_map_file_ignore,
-                                                                                    sql_db)
 
-        # Create the views
-        create_db_views(sql_db, cultivar_column_name, cultivar_genes_column_names)
+def make_database(args: argparse.Namespace) -> int:
+    """Builds and publishes the database requested by the command line arguments
+    Arguments:
+        args: the parsed command line arguments (see add_arguments())
+    Return:
+        Returns the number of records available in the database
+    Exceptions:
+        RuntimeError exceptions are raised when something goes wrong
+    """
+    # Break apart any command line arguments that may be multi-part
+    sensors = prepare_sensors(args.sensors)
+    dates = prepare_dates(args.dates)
+    logging.info("Specified sensors: %s", str(sensors))
+    logging.info("Specified dates: %s", str(dates))
+
+    if args.gene_pivot and args.gene_layout != GENE_LAYOUT_LONG:
+        raise RuntimeError("Pivot genes can only be specified with the %s gene layout" % GENE_LAYOUT_LONG)
+    if args.metadata_columns and not args.file_metadata:
+        raise RuntimeError("Metadata columns can only be specified when the file metadata is saved")
+    if args.weather_workers < 0:
+        raise RuntimeError("The number of weather workers can't be negative: %s" % str(args.weather_workers))
+    export_tables = tuple(one_table.strip() for one_table in args.export_tables.split(',') if one_table.strip())
+    export_format = get_export_format(args.export_format) if args.export_folder else None
+
+    # Load the inventory to find folders and files from instead of the file system, before any database is opened so
+    # that a bad inventory doesn't leave one behind
+    inventory = None
+    if args.inventory_file:
+        inventory = cached_value('inventory', (args.inventory_file, get_path_version(args.inventory_file)),
+                                 lambda: load_inventory(args.inventory_file, LOCAL_START_PATH))
+
+    # Open the database to build
+    if args.progressive and (args.resume or args.build_location):
+        raise RuntimeError("A progressive build is made in the output file and can't be resumed or built elsewhere")
+    if args.progressive:
+        sql_db, working_filename = open_progressive_database(args.output_file), None
+    elif args.resume:
+        sql_db, working_filename = open_resumable_database(args.build_location, args.output_file,
+                                                           get_build_signature(args))
+    else:
+        sql_db, working_filename = open_working_database(args.build_location, args.output_file)
+
+    published = False
+    try:
+        use_inventory(inventory)
+        build_database(args, sensors, dates, sql_db)
 
         # Count the number of final records
         final_count = count_final_records(sql_db)
@@ -1624,16 +3833,924 @@ def generate() -> None:
         else:
             logging.warning("No records are available")
 
-        sql_db.close()
-        shutil.move(working_filename, args.output_file)
+        if args.progressive:
+            finish_progressive_database(sql_db)
+        else:
+            publish_database(sql_db, working_filename, args.output_file)
+        sql_db = None
+        published = True
+    except Exception:
+        if args.progressive and sql_db:
+            update_build_progress(sql_db, 'build', '', 'failed')
+        raise
+    finally:
+        if sql_db:
+            sql_db.close()
+        del sql_db
+        if working_filename and os.path.exists(working_filename):
+            if args.resume and not published:
+                logging.warning("Keeping the unfinished database '%s' to resume the build from", working_filename)
+            else:
+                os.unlink(working_filename)
+        use_inventory(None)
+
+    if args.export_folder:
+        export_database(args.output_file, args.export_folder, export_tables, export_format)
+
+    return final_count
+
+
+def plan_sensor_files(sensor: str, dates: list) -> dict:
+    """Estimates the number of files of a sensor, and the size of their metadata, by sampling the folders of each date
+    Arguments:
+        sensor: the sensor to estimate the files of
+        dates: the dates to estimate the files of
+    Return:
+        Returns a dictionary of the estimates (see plan_database())
+    Notes:
+        The folders of each date are listed and up to PLAN_SAMPLE_FOLDERS of them, spread across the list, are read in
+        the same way as when building. The time taken to read the samples is used to estimate the time to find all the
+        files, since it depends on the file system
+    """
+    folder_count = 0
+    sampled_count = 0
+    sampled_files = 0
+    sampled_metadata_files = set()
+    sampled_metadata_bytes = 0
+    sampled_seconds = 0.0
+    metadata_file_mapper = SENSOR_MAPS[sensor]['metadata_file_mapper']
+    for one_path in SENSOR_MAPS[sensor]['file_paths']:
+        for one_date in dates:
+            date_path = os.path.join(LOCAL_START_PATH, one_path['path'], one_date)
+            sub_folders = [one_entry['name'] for one_entry in local_folder_list(date_path) if one_entry['type'] == 'dir']
+            folder_count += len(sub_folders)
+            sample_count = min(len(sub_folders), PLAN_SAMPLE_FOLDERS)
+            for idx in range(0, sample_count):
+                sub_path = os.path.join(date_path, sub_folders[idx * len(sub_folders) // sample_count])
+                start_time = time.monotonic()
+                files_info = local_get_files_info(sub_path, one_path['ext'], metadata_file_mapper,
+                                                  one_path.get('exclude_check')) or []
+                for one_file in files_info:
+                    if one_file['filename'].endswith('_metadata.json'):
+                        continue
+                    sampled_files += 1
+                    if 'json_file' not in one_file:
+                        continue
+                    json_path = os.path.join(one_file['directory'], one_file['json_file'])
+                    if json_path not in sampled_metadata_files:
+                        sampled_metadata_files.add(json_path)
+                        sampled_metadata_bytes += (get_path_version(json_path) or (0, 0))[1]
+                sampled_seconds += time.monotonic() - start_time
+                sampled_count += 1
+
+    scale = folder_count / sampled_count if sampled_count else 0
+    return {
+        'folders': folder_count,
+        'sampled_folders': sampled_count,
+        'files': int(sampled_files * scale),
+        'metadata_files': int(len(sampled_metadata_files) * scale),
+        'metadata_bytes': int(sampled_metadata_bytes * scale),
+        'find_seconds': round(sampled_seconds * scale, 1),
+    }
+
+
+def plan_weather(dates: list) -> dict:
+    """Estimates the number of weather readings of the dates by sampling their weather files
+    Arguments:
+        dates: the dates to estimate the weather of
+    Return:
+        Returns a dictionary of the estimates (see plan_database())
+    Notes:
+        Each date's weather folder is listed, and up to PLAN_SAMPLE_WEATHER_FILES of its files are parsed for their
+        sizes and the number of readings in them
+    """
+    file_count = 0
+    sampled_files = []
+    for one_date in dates:
+        date_path = os.path.join(LOCAL_START_PATH, LOCAL_ENVIRONMENT_LOGGER_PATH, one_date)
+        date_files = [one_entry['name'] for one_entry in local_folder_list(date_path) if one_entry['type'] == 'file']
+        file_count += len(date_files)
+        sample_count = min(len(date_files), PLAN_SAMPLE_WEATHER_FILES)
+        sampled_files.extend([os.path.join(date_path, date_files[idx * len(date_files) // sample_count])
+                              for idx in range(0, sample_count)])
+
+    sampled_bytes = 0
+    sampled_readings = 0
+    for one_file in sampled_files:
+        sampled_bytes += (get_path_version(one_file) or (0, 0))[1]
+        file_weather = parse_weather_file(one_file)
+        sampled_readings += len(file_weather) if file_weather else 0
+
+    scale = file_count / len(sampled_files) if sampled_files else 0
+    return {
+        'files': file_count,
+        'sampled_files': len(sampled_files),
+        'bytes': int(sampled_bytes * scale),
+        'readings': int(sampled_readings * scale),
+    }
+
+
+def plan_gene_file(gene_file: str, file_row_ignore: int) -> dict:
+    """Estimates the number of values in a gene CSV file from its size and first rows
+    Arguments:
+        gene_file: the path of the gene file
+        file_row_ignore: number of rows to ignore at the start of the file
+    Return:
+        Returns a dictionary of the estimates (see plan_database())
+    """
+    file_bytes = os.path.getsize(gene_file)
+    with open(gene_file, 'r') as in_file:
+        for _ in range(0, file_row_ignore or 0):
+            in_file.readline()
+        header = in_file.readline()
+        sample_lines = [in_file.readline() for _ in range(0, PLAN_SAMPLE_GENE_ROWS)]
+        sample_lines = [one_line for one_line in sample_lines if one_line.strip()]
+        data_offset = in_file.tell() - sum([len(one_line.encode('utf-8')) for one_line in sample_lines])
+
+    columns = len(next(csv.reader([header]), []))
+    rows = 0
+    if sample_lines:
+        rows = int((file_bytes - data_offset) * len(sample_lines) / sum([len(one_line.encode('utf-8'))
+                                                                         for one_line in sample_lines]))
+    return {'bytes': file_bytes, 'columns': columns, 'rows': rows, 'values': rows * max(columns - 1, 0)}
+
+
+def plan_database(args: argparse.Namespace) -> dict:
+    """Estimates the size of the database requested by the command line arguments and the time to build it, without
+    building it
+    Arguments:
+        args: the parsed command line arguments (see add_arguments())
+    Return:
+        Returns a dictionary of the experiments found, the estimated numbers of files, weather readings, and gene
+        values, the estimated size of the database in bytes, and the estimated seconds of each stage of the build
+    Exceptions:
+        RuntimeError exceptions are raised when something goes wrong
+    Notes:
+        The sensor and weather folders are sampled (see plan_sensor_files() and plan_weather()) and the build is
+        estimated from the rates in PLAN_RATES and PLAN_ROW_BYTES. Those were measured with the benchmarks on a
+        single CPU and are approximate; the time to find the files is measured while sampling since it depends on the
+        file system
+    """
+    sensors = prepare_sensors(args.sensors)
+    dates = prepare_dates(args.dates)
+
+    found_experiments, date_experiment_ids, remaining_dates = get_experiments_by_dates(
+        dates, get_betydb_url(args.betydb_url), get_betydb_key(args.betydb_key), args.experiment_json)
+    if remaining_dates:
+        logging.warning("Unable to find experiments for all dates and date ranges specified: %s", ','.join(remaining_dates))
+    experiment_dates = sorted(date_experiment_ids.keys())
+
+    if args.inventory_file:
+        use_inventory(cached_value('inventory', (args.inventory_file, get_path_version(args.inventory_file)),
+                                   lambda: load_inventory(args.inventory_file, LOCAL_START_PATH)))
+    try:
+        sensor_plans = {one_sensor: plan_sensor_files(one_sensor, experiment_dates) for one_sensor in sensors}
+        weather_plan = plan_weather(experiment_dates)
+    finally:
+        use_inventory(None)
+
+    file_count = sum([one_plan['files'] for one_plan in sensor_plans.values()])
+    metadata_bytes = sum([one_plan['metadata_bytes'] for one_plan in sensor_plans.values()])
+    stage_seconds = {
+        'files': sum([one_plan['find_seconds'] for one_plan in sensor_plans.values()]) +
+                 file_count / PLAN_RATES['files_per_sec'] + metadata_bytes / PLAN_RATES['metadata_bytes_per_sec'],
+        'weather': weather_plan['readings'] / PLAN_RATES['weather_readings_per_sec'],
+        'weather_file_map': file_count / PLAN_RATES['weather_map_files_per_sec'],
+    }
+    database_bytes = file_count * PLAN_ROW_BYTES['files'] + weather_plan['readings'] * PLAN_ROW_BYTES['weather']
+    if args.file_metadata:
+        database_bytes += metadata_bytes * PLAN_ROW_BYTES['file_metadata']
+
+    gene_plans = {}
+    for gene_file, row_ignore, gene_layout in ((args.gene_marker_file, args.gene_marker_file_ignore, GENE_LAYOUT_WIDE),
+                                               (args.cultivar_gene_map_file, args.cultivar_gene_map_file_ignore,
+                                                args.gene_layout)):
+        if not gene_file:
+            continue
+        if not os.path.exists(gene_file):
+            raise RuntimeError("Unable to find gene file: '%s'" % gene_file)
+        gene_plans[gene_file] = plan_gene_file(gene_file, row_ignore)
+        stage_seconds['genes'] = stage_seconds.get('genes', 0) + \
+            gene_plans[gene_file]['values'] / PLAN_RATES['gene_values_per_sec'][gene_layout]
+        database_bytes += gene_plans[gene_file]['values'] * PLAN_ROW_BYTES['gene_value'][gene_layout]
+
+    plan = {
+        'experiments': [one_experiment['name'] for one_experiment in found_experiments],
+        'dates': len(experiment_dates),
+        'dates_without_experiments': list(remaining_dates),
+        'sensors': sensor_plans,
+        'files': file_count,
+        'metadata_bytes': metadata_bytes,
+        'weather': weather_plan,
+        'genes': gene_plans,
+        'database_bytes': int(database_bytes),
+        'stage_seconds': {stage: round(seconds, 1) for stage, seconds in stage_seconds.items()},
+        'total_seconds': round(sum(stage_seconds.values()), 1),
+    }
+    logging.info("Estimated %s files and %s weather readings in a %.1f MB database, built in %.1f minutes",
+                 str(file_count), str(weather_plan['readings']), database_bytes / 1000000, plan['total_seconds'] / 60)
+    if args.prune_weather:
+        logging.info("The weather estimates are of all the weather since the weather is pruned when building")
+
+    return plan
+
+
+def generate() -> None:
+    """Performs all the steps needed to generate the SQLite database
+    Exceptions:
+        RuntimeError exceptions are raised when something goes wrong
+    """
+    parser = argparse.ArgumentParser(description="Generate SQLite database for file discovery")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # Check for debugging
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    logging.debug("Command line args: %s", str(args))
+
+    if args.plan:
+        print(json.dumps(plan_database(args), indent=2))
+    else:
+        make_database(args)
+
+
+def load_batch_manifest(manifest_file: str) -> list:
+    """Loads the builds listed in a batch manifest
+    Arguments:
+        manifest_file: the path of the JSON manifest file (see Notes)
+    Return:
+        Returns the list of the parsed arguments of each build
+    Exceptions:
+        Raises RuntimeError if the manifest isn't valid
+    Notes:
+        The manifest is a JSON object with a "jobs" list and an optional "defaults" object. Each job is an object
+        with "sensors", "dates", and "output_file" values, and any of the other command line options using their
+        argument names (for example "gene_marker_file"). Values in "defaults" are used by all jobs that don't specify
+        them. Options that don't take a value are specified as true or false. The values are checked and converted in
+        the same way as those on the command line
+    """
+    with open(manifest_file, 'r') as in_file:
+        manifest = json.load(in_file)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list):
+        raise RuntimeError("Batch manifest '%s' is missing its list of jobs" % manifest_file)
+
+    parser = argparse.ArgumentParser(exit_on_error=False)
+    add_arguments(parser)
+    options = {}
+    for one_action in parser._actions:  # pylint: disable=protected-access
+        for one_option in one_action.option_strings:
+            if one_option.startswith('--'):
+                options[one_option[2:]] = one_action
+                options.setdefault(one_action.dest, one_action)
+    positionals = ('sensors', 'dates', 'output_file')
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    for idx, one_job in enumerate(manifest['jobs']):
+        job_values = {**defaults, **one_job}
+        missing = [key for key in positionals if not job_values.get(key)]
+        if missing:
+            raise RuntimeError("Batch job %s is missing values for: %s" % (str(idx + 1), ','.join(missing)))
+
+        # Make the job's command line so that its values are checked and converted in the same way
+        job_argv = [str(job_values[key]) for key in positionals]
+        for key, value in job_values.items():
+            if key in positionals:
+                continue
+            if key not in options:
+                raise RuntimeError("Unknown option '%s' for batch job %s" % (key, str(idx + 1)))
+            option_string = max(options[key].option_strings, key=len)
+            if options[key].nargs == 0:
+                if not isinstance(value, bool):
+                    raise RuntimeError("Option '%s' for batch job %s needs to be true or false" % (key, str(idx + 1)))
+                if value:
+                    job_argv.append(option_string)
+            elif value is not None:
+                job_argv.append(option_string + '=' + str(value))
+        try:
+            jobs.append(parser.parse_args(job_argv))
+        except argparse.ArgumentError as ex:
+            raise RuntimeError("Invalid option for batch job %s: %s" % (str(idx + 1), str(ex))) from ex
+
+    output_files = [os.path.abspath(one_job.output_file) for one_job in jobs]
+    if len(set(output_files)) != len(output_files):
+        raise RuntimeError("Batch jobs need to have different output files")
+
+    return jobs
+
+
+def prefetch_batch_inputs(jobs: list) -> None:
+    """Loads the inputs needed by all the builds into the caches, reading each one once
+    Arguments:
+        jobs: the list of parsed arguments of each build
+    Notes:
+        The files of the union of the sensors are found for the union of the dates, and the weather of the union of
+        the dates of the jobs that don't prune their weather is loaded, with the largest number of weather parsing
+        processes of those jobs. Jobs using different inventory files are prefetched separately. Caching needs to be
+        enabled (see enable_caches())
+    """
+    inventory_jobs = {}
+    for one_job in jobs:
+        inventory_jobs.setdefault(one_job.inventory_file, []).append(one_job)
+
+    for inventory_file, group_jobs in inventory_jobs.items():
+        all_sensors = set()
+        all_dates = set()
+        weather_dates = set()
+        weather_workers = None
+        for one_job in group_jobs:
+            all_sensors.update(prepare_sensors(one_job.sensors))
+            job_dates = prepare_dates(one_job.dates)
+            all_dates.update(job_dates)
+            if not one_job.prune_weather:
+                weather_dates.update(job_dates)
+                if weather_workers is None or one_job.weather_workers == 0 or \
+                        0 < weather_workers < one_job.weather_workers:
+                    weather_workers = one_job.weather_workers
+        logging.info("Batch jobs cover sensors %s over %s dates", ','.join(sorted(all_sensors)), str(len(all_dates)))
+
+        if inventory_file:
+            use_inventory(cached_value('inventory', (inventory_file, get_path_version(inventory_file)),
+                                       lambda: load_inventory(inventory_file, LOCAL_START_PATH)))
+        try:
+            all_date_ids = {one_date: None for one_date in sorted(all_dates)}
+            for one_sensor in sorted(all_sensors):
+                for one_path in SENSOR_MAPS[one_sensor]['file_paths']:
+                    found_files = local_get_files(LOCAL_START_PATH, one_path['path'], one_path['ext'], all_date_ids,
+                                                  SENSOR_MAPS[one_sensor]['metadata_file_mapper'],
+                                                  one_path.get('exclude_check'))
+                    logging.debug("Prefetched %s files for sensor %s",
+                                  str(sum(len(date_files) for date_files in found_files.values())), one_sensor)
+            if weather_dates:
+                found_weather = local_get_all_weather(sorted(weather_dates), workers=weather_workers)
+                logging.debug("Prefetched %s weather readings",
+                              str(sum(len(date_weather) for date_weather in found_weather.values())))
+        finally:
+            use_inventory(None)
+
+
+def batch() -> None:
+    """Builds all the databases listed in a manifest, sharing the inputs they have in common
+    Exceptions:
+        RuntimeError is raised if the manifest isn't valid or any of the builds fail
+    """
+    parser = argparse.ArgumentParser(prog='generate.py ' + BATCH_COMMAND,
+                                     description="Generate the SQLite databases listed in a manifest")
+    parser.add_argument('manifest_file', help="the JSON manifest of the databases to build")
+    parser.add_argument('--debug', action="store_true", help="turns on debugging messages")
+    args = parser.parse_args(sys.argv[2:])
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    jobs = load_batch_manifest(args.manifest_file)
+    logging.info("Running %s batch jobs", str(len(jobs)))
+
+    # Keep everything that's read, and the versions of the files and folders it was read from, until all the jobs are
+    # done
+    enable_caches(sys.maxsize, sys.maxsize)
+    remember_path_versions({})
+    try:
+        prefetch_batch_inputs(jobs)
+
+        failed_outputs = []
+        for one_job in jobs:
+            logging.info("Building '%s'", one_job.output_file)
+            try:
+                make_database(one_job)
+            except Exception as ex:
+                logging.exception("Unable to build '%s': %s", one_job.output_file, str(ex))
+                failed_outputs.append(one_job.output_file)
+        logging.debug("Batch cache statistics: %s", str(get_cache_stats()))
+    finally:
+        enable_caches(0, 0)
+        remember_path_versions(None)
+
+    if failed_outputs:
+        raise RuntimeError("Unable to build %s of %s databases: %s" %
+                           (str(len(failed_outputs)), str(len(jobs)), ','.join(failed_outputs)))
+
+
+def get_date_epoch_ranges(dates: tuple) -> list:
+    """Returns the epoch ranges covered by the dates
+    Arguments:
+        dates: the dates in YYYY-MM-DD format
+    Return:
+        Returns a list of (start, finish) epoch tuples, with each start inclusive and finish exclusive
+    """
+    ranges = []
+    for one_date in sorted(set(dates)):
+        date_start = make_timestamp_epoch(datetime.strptime(one_date, '%Y-%m-%d'))
+        ranges.append((date_start, date_start + 24 * 60 * 60))
+
+    return ranges
+
+
+def get_epoch_ranges_sql(column_name: str, epoch_ranges: list) -> str:
+    """Returns the SQL condition to match a column to any of the epoch ranges
+    Arguments:
+        column_name: the name of the epoch column
+        epoch_ranges: the list of (start, finish) epoch tuples (see get_date_epoch_ranges())
+    Return:
+        Returns the SQL condition
+    """
+    return '(' + ' OR '.join(['(%s >= %s AND %s < %s)' % (column_name, str(start), column_name, str(finish))
+                              for start, finish in epoch_ranges]) + ')'
+
+
+def carve_database(source_file: str, db_conn: sqlite3.Connection, dates: tuple = None, sensors: tuple = None,
+                   plot_ids: tuple = None, cultivar_names: tuple = None) -> None:
+    """Copies the part of a generated database that matches the filters into another database
+    Arguments:
+        source_file: the path of the database to copy from
+        db_conn: the empty database to copy to
+        dates: optional dates to restrict the files and weather to
+        sensors: optional sensors to restrict the files to
+        plot_ids: optional plot IDs to restrict the plots and files to
+        cultivar_names: optional cultivar names to restrict the plots and files to
+    Exceptions:
+        Raises RuntimeError if the source database isn't a generated database
+    Notes:
+        The source database is attached to the destination database and the rows are copied with queries. The
+        table, index, and view definitions are copied from the source database so the copy has the same schema.
+        Weather is only restricted by dates, and includes the readings bracketing the copied files. Tables without
+        a filter, such as gene_markers, are copied whole
+    """
+    carve_cursor = db_conn.cursor()
+    carve_cursor.execute('ATTACH DATABASE ? AS src', [source_file])
+    carve_cursor.execute("SELECT type, name, tbl_name, sql FROM src.sqlite_master WHERE sql IS NOT NULL")
+    source_schema = carve_cursor.fetchall()
+    source_tables = [name for obj_type, name, _, _ in source_schema if obj_type == 'table']
+    if 'files' not in source_tables or 'season_info' not in source_tables:
+        raise RuntimeError("Database '%s' is not a generated database" % source_file)
+
+    # Find the plots, files, and weather to copy
+    plot_filters = []
+    plot_values = []
+    if plot_ids:
+        plot_filters.append('id IN (%s)' % ','.join(['?'] * len(plot_ids)))
+        plot_values.extend(plot_ids)
+    if cultivar_names:
+        plot_filters.append('cultivar_id IN (SELECT id FROM src.cultivars WHERE name IN (%s))' %
+                            ','.join(['?'] * len(cultivar_names)))
+        plot_values.extend(cultivar_names)
+    carve_cursor.execute('CREATE TEMP TABLE carve_plots AS SELECT DISTINCT id FROM src.season_info %s' %
+                         ('WHERE ' + ' AND '.join(plot_filters) if plot_filters else ''), plot_values)
+
+    file_filters = []
+    file_values = []
+    if plot_filters:
+        file_filters.append('plot_id IN (SELECT id FROM temp.carve_plots)')
+    if sensors:
+        file_filters.append('sensor IN (%s)' % ','.join(['?'] * len(sensors)))
+        file_values.extend(sensors)
+    epoch_ranges = get_date_epoch_ranges(dates) if dates else None
+    if epoch_ranges:
+        file_filters.append(get_epoch_ranges_sql('start_time_epoch', epoch_ranges))
+    carve_cursor.execute('CREATE TEMP TABLE carve_files AS SELECT id FROM src.files %s' %
+                         ('WHERE ' + ' AND '.join(file_filters) if file_filters else ''), file_values)
+
+    if epoch_ranges:
+        carve_cursor.execute('''CREATE TEMP TABLE carve_weather AS
+                                SELECT id FROM src.weather WHERE %s
+                                UNION SELECT w.id FROM src.weather_file_map m
+                                    JOIN src.weather w1 ON w1.id = m.min_weather_id
+                                    JOIN src.weather w2 ON w2.id = m.max_weather_id
+                                    JOIN src.weather w ON w.timestamp_epoch BETWEEN min(w1.timestamp_epoch, w2.timestamp_epoch)
+                                        AND max(w1.timestamp_epoch, w2.timestamp_epoch)
+                                    WHERE m.file_id IN (SELECT id FROM temp.carve_files)''' %
+                             get_epoch_ranges_sql('timestamp_epoch', epoch_ranges))
+
+    # The filter of each table, in the order they're copied; tables that refer to other tables are copied after them
+    table_filters = {
+        'season_info': 'id IN (SELECT id FROM temp.carve_plots)' if plot_filters else None,
+        'cultivars': 'id IN (SELECT cultivar_id FROM main.season_info)',
+        'files': 'id IN (SELECT id FROM temp.carve_files)',
+        'folders': 'id IN (SELECT folder_id FROM main.files)',
+        'weather': 'id IN (SELECT id FROM temp.carve_weather)' if epoch_ranges else None,
+        'weather_file_map': 'file_id IN (SELECT id FROM temp.carve_files)',
+        'file_weather_stats': 'file_id IN (SELECT id FROM temp.carve_files)',
+        'file_metadata': 'file_id IN (SELECT id FROM temp.carve_files)',
+        FILE_SEARCH_TABLE: 'rowid IN (SELECT id FROM main.files)',
+    }
+    for one_table, _ in WEATHER_ROLLUPS:
+        table_filters[one_table] = get_epoch_ranges_sql('timestamp_epoch', epoch_ranges) if epoch_ranges else None
+    if 'cultivar_genes' in source_tables:
+        # The last column of the index is the cultivar column in both the compact and the regular schemas
+        carve_cursor.execute("SELECT name FROM pragma_index_info('cultivar_genes_index', 'src') ORDER BY seqno DESC LIMIT 1")
+        cultivar_column = carve_cursor.fetchone()
+        if cultivar_column:
+            table_filters['cultivar_genes'] = '%s IN (SELECT name FROM main.cultivars)' % cultivar_column[0]
+    if 'cultivar_gene_values' in source_tables:
+        table_filters['cultivar_gene_values'] = 'cultivar IN (SELECT name FROM main.cultivars)'
+
+    # Copy the tables, then create the indexes and views
+    copy_order = [name for name in table_filters if name in source_tables] + \
+                 [name for name in source_tables if name not in table_filters]
+    table_sql = {name: sql for obj_type, name, _, sql in source_schema if obj_type == 'table'}
+    # Virtual tables, such as the file_search table, create their own shadow tables and are copied with their rowids
+    virtual_tables = [name for name, sql in table_sql.items() if sql.upper().startswith('CREATE VIRTUAL TABLE')]
+    skip_tables = [BUILD_JOURNAL_TABLE, BUILD_PROGRESS_TABLE]
+    for one_table in virtual_tables:
+        skip_tables.extend([name for name in source_tables if name.startswith(one_table + '_')])
+    copy_order = [name for name in copy_order if name not in skip_tables]
+    for one_table in copy_order:
+        carve_cursor.execute(table_sql[one_table])
+        carve_cursor.execute("SELECT name FROM pragma_table_info(?, 'src')", [one_table])
+        column_names = ', '.join(['rowid'] * (one_table in virtual_tables) + [row[0] for row in carve_cursor.fetchall()])
+        row_filter = table_filters.get(one_table)
+        carve_cursor.execute('INSERT INTO main.%s (%s) SELECT %s FROM src.%s %s' %
+                             (one_table, column_names, column_names, one_table,
+                              'WHERE ' + row_filter if row_filter else ''))
+        logging.info("Copied %s %s records", str(carve_cursor.rowcount), one_table)
+        db_conn.commit()
+
+    for obj_type, name, tbl_name, sql in source_schema:
+        if obj_type == 'index' and tbl_name in copy_order:
+            carve_cursor.execute(sql)
+    for obj_type, name, _, sql in source_schema:
+        if obj_type == 'view':
+            carve_cursor.execute(sql)
+    db_conn.commit()
+
+    carve_cursor.execute('DETACH DATABASE src')
+    carve_cursor.close()
+
+
+def carve() -> None:
+    """Copies part of an existing database to a new database
+    Exceptions:
+        RuntimeError is raised if the source database isn't a generated database
+    """
+    parser = argparse.ArgumentParser(prog='generate.py ' + CARVE_COMMAND,
+                                     description="Copy the matching part of a generated SQLite database to a new database")
+    parser.add_argument('source_file', help="the generated database to copy from")
+    parser.add_argument('output_file', help="the output SQLite file")
+    parser.add_argument('--dates', help='comma separated list of dates and ranges of dates to copy')
+    parser.add_argument('--sensors', help='comma separated list of sensors to copy')
+    parser.add_argument('--plot_ids', help='comma separated list of plot IDs to copy')
+    parser.add_argument('--cultivars', help='comma separated list of the names of the cultivars to copy')
+    parser.add_argument('--debug', action="store_true", help="turns on debugging messages")
+    args = parser.parse_args(sys.argv[2:])
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    logging.debug("Command line args: %s", str(args))
+
+    if not os.path.exists(args.source_file):
+        raise RuntimeError("Unable to find database to copy from: '%s'" % args.source_file)
+    dates = prepare_dates(args.dates) if args.dates else None
+    sensors = prepare_sensors(args.sensors) if args.sensors else None
+    plot_ids = tuple(int(one_id) for one_id in args.plot_ids.split(',')) if args.plot_ids else None
+    cultivar_names = tuple(one_name.strip() for one_name in args.cultivars.split(',')) if args.cultivars else None
+
+    sql_db, working_filename = open_working_database(BUILD_LOCATION_TARGET, args.output_file)
+    try:
+        carve_database(args.source_file, sql_db, dates, sensors, plot_ids, cultivar_names)
+
+        final_count = count_final_records(sql_db)
+        if final_count:
+            logging.info("Records available: %s", str(final_count))
+        else:
+            logging.warning("No records are available")
+
+        publish_database(sql_db, working_filename, args.output_file)
         sql_db = None
     finally:
         if sql_db:
             sql_db.close()
         del sql_db
-        if os.path.exists(working_filename):
+        if working_filename and os.path.exists(working_filename):
             os.unlink(working_filename)
 
 
+def get_export_format(export_format: Optional[str]) -> str:
+    """Returns the format to export in, checking that its module is installed
+    Arguments:
+        export_format: the requested format, or None for the default format
+    Return:
+        Returns the format to use; the default is Parquet when pyarrow is installed, and NumPy arrays otherwise
+    Exceptions:
+        Raises RuntimeError if the module needed for the format isn't installed
+    """
+    formats_modules = ((EXPORT_FORMAT_PARQUET, 'pyarrow.parquet'), (EXPORT_FORMAT_ARROW, 'pyarrow'),
+                       (EXPORT_FORMAT_NUMPY, 'numpy'))
+    for one_format, module_name in formats_modules:
+        if export_format not in (None, one_format):
+            continue
+        if importlib.util.find_spec(module_name.split('.')[0]) is not None:
+            return one_format
+        if export_format is not None:
+            raise RuntimeError("Exporting as %s needs the %s module to be installed" % (one_format, module_name))
+
+    raise RuntimeError("Exporting needs either the pyarrow or numpy module to be installed")
+
+
+def get_table_columns(db_conn: sqlite3.Connection, table_name: str) -> list:
+    """Returns the names and declared types of the columns of a table or view, including its generated columns
+    Arguments:
+        db_conn: the database to query
+        table_name: the name of the table or view
+    Return:
+        Returns a list of tuples of each column's name and declared type, in the table's column order
+    Notes:
+        Generated columns, such as the metadata columns of the file_metadata table, are only listed by the
+        table_xinfo pragma. The hidden columns of virtual tables are left out, as they are by "SELECT *"
+    """
+    column_cursor = db_conn.cursor()
+    column_cursor.execute('SELECT name, type FROM pragma_table_xinfo(?) WHERE hidden IN (0, 2, 3) ORDER BY cid',
+                          [table_name])
+    table_columns = column_cursor.fetchall()
+    column_cursor.close()
+
+    return table_columns
+
+
+def get_export_columns(table_columns: list, sample_rows: list) -> list:
+    """Returns the names and types of the columns of a table or view to export
+    Arguments:
+        table_columns: the names and declared types of the table's columns (see get_table_columns())
+        sample_rows: rows of the table's columns to find the types of columns without a declared type from
+    Return:
+        Returns a list of tuples of each column's name and type: one of 'integer', 'float', or 'text'
+    Notes:
+        Declared types are interpreted in the same way SQLite determines column affinity. View columns that are
+        calculated, such as pivot gene columns, don't have a declared type and are typed by their sample values. A
+        column whose sample values are all null is exported as text, which can hold any of the later values
+    """
+    export_columns = []
+    for idx, (column_name, declared_type) in enumerate(table_columns):
+        declared_type = (declared_type or '').upper()
+        if 'INT' in declared_type:
+            column_type = 'integer'
+        elif 'CHAR' in declared_type or 'CLOB' in declared_type or 'TEXT' in declared_type:
+            column_type = 'text'
+        elif 'REAL' in declared_type or 'FLOA' in declared_type or 'DOUB' in declared_type:
+            column_type = 'float'
+        else:
+            sample_types = set(type(one_row[idx]) for one_row in sample_rows if one_row[idx] is not None)
+            if not sample_types:
+                column_type = 'text'
+            elif sample_types <= {int}:
+                column_type = 'integer'
+            elif sample_types <= {int, float}:
+                column_type = 'float'
+            else:
+                column_type = 'text'
+        export_columns.append((column_name, column_type))
+
+    return export_columns
+
+
+def clean_export_values(values: tuple, column_type: str) -> tuple:
+    """Returns the values of a column with the values that don't match the column's type replaced with None
+    Arguments:
+        values: the values of the column
+        column_type: the type of the column (see get_export_columns())
+    Return:
+        Returns a tuple containing the list of values, and the number of values that were replaced
+    Notes:
+        Integers are kept in float columns, and numbers are converted to text in text columns
+    """
+    if column_type == 'text':
+        return [one_value if one_value is None or isinstance(one_value, str) else str(one_value)
+                for one_value in values], 0
+    if column_type == 'float':
+        allowed_types = (int, float)
+    else:
+        allowed_types = (int,)
+    cleaned = [one_value if isinstance(one_value, allowed_types) else None for one_value in values]
+    return cleaned, sum(1 for one_value in values if one_value is not None) - \
+        sum(1 for one_value in cleaned if one_value is not None)
+
+
+def make_arrow_array(values: tuple, column_type: str) -> tuple:
+    """Converts the values of a column to an Arrow array
+    Arguments:
+        values: the values of the column
+        column_type: the type of the column (see get_export_columns())
+    Return:
+        Returns a tuple containing the array, and the number of values that didn't match the type and are null
+    """
+    # pylint: disable=import-outside-toplevel
+    import pyarrow
+    arrow_type = {'integer': pyarrow.int64(), 'float': pyarrow.float64(), 'text': pyarrow.string()}[column_type]
+    try:
+        return pyarrow.array(values, type=arrow_type), 0
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, TypeError):
+        cleaned, mismatched = clean_export_values(values, column_type)
+        return pyarrow.array(cleaned, type=arrow_type), mismatched
+
+
+def make_numpy_arrays(column_name: str, values: tuple, column_type: str) -> tuple:
+    """Converts the values of a column to NumPy arrays
+    Arguments:
+        column_name: the name of the column
+        values: the values of the column
+        column_type: the type of the column (see get_export_columns())
+    Return:
+        Returns a tuple containing a dictionary of array names and arrays, and the number of values that didn't match
+        the type and are missing
+    Notes:
+        Integer columns are int64 arrays, float columns are float64 arrays with NaN for missing values, and text
+        columns are fixed width unicode arrays. When an integer or text column has missing values, an array named
+        after the column with a "__null" suffix is added that is True for each missing value
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy
+    cleaned, mismatched = clean_export_values(values, column_type)
+    if column_type == 'float':
+        return {column_name: numpy.array([numpy.nan if one_value is None else one_value for one_value in cleaned],
+                                         dtype=numpy.float64)}, mismatched
+
+    arrays = {}
+    if None in cleaned:
+        arrays[column_name + '__null'] = numpy.array([one_value is None for one_value in cleaned], dtype=numpy.bool_)
+        empty_value = '' if column_type == 'text' else 0
+        cleaned = [empty_value if one_value is None else one_value for one_value in cleaned]
+    if column_type == 'text':
+        arrays[column_name] = numpy.array(cleaned, dtype=numpy.str_)
+    else:
+        arrays[column_name] = numpy.array(cleaned, dtype=numpy.int64)
+    return arrays, mismatched
+
+
+def export_table(db_conn: sqlite3.Connection, table_name: str, output_folder: str, export_format: str,
+                 chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """Exports a table or view to a columnar file, reading and writing it in chunks of rows
+    Arguments:
+        db_conn: the database to export from
+        table_name: the name of the table or view to export
+        output_folder: the folder to write the exported file to
+        export_format: the format to export in (see get_export_format())
+        chunk_rows: the number of rows to read and write at a time
+    Return:
+        Returns the number of rows exported
+    Notes:
+        Parquet and Arrow tables are written to a file named after the table with a ".parquet" or ".arrow" extension;
+        each chunk is a row group or record batch. NumPy arrays are written to a folder named after the table, with a
+        compressed ".npz" file for each chunk and a "columns.json" file with the column types. The file or folder
+        is written under a temporary name and then renamed, replacing any existing export
+    """
+    # The columns are named so that the rows match the columns found, including generated ones
+    table_columns = get_table_columns(db_conn, table_name)
+    export_cursor = db_conn.cursor()
+    export_cursor.execute('SELECT %s FROM %s' % (', '.join('"%s"' % column_name.replace('"', '""')
+                                                          for column_name, _ in table_columns), table_name))
+    rows = export_cursor.fetchmany(chunk_rows)
+    export_columns = get_export_columns(table_columns, rows)
+    logging.debug("Exporting %s columns: %s", table_name, str(export_columns))
+
+    extension = {EXPORT_FORMAT_PARQUET: '.parquet', EXPORT_FORMAT_ARROW: '.arrow', EXPORT_FORMAT_NUMPY: ''}[export_format]
+    output_path = os.path.join(output_folder, table_name + extension)
+    working_path = tempfile.mkdtemp(dir=output_folder, prefix=table_name + '.', suffix='.tmp')
+    if export_format != EXPORT_FORMAT_NUMPY:
+        os.rmdir(working_path)
+
+    row_count = 0
+    mismatched_counts = {}
+    writer = None
+    try:
+        if export_format == EXPORT_FORMAT_NUMPY:
+            # pylint: disable=import-outside-toplevel
+            import numpy
+            with open(os.path.join(working_path, 'columns.json'), 'w') as out_file:
+                json.dump([{'name': column_name, 'type': column_type} for column_name, column_type in export_columns],
+                          out_file, indent=2)
+        else:
+            # pylint: disable=import-outside-toplevel
+            import pyarrow
+            import pyarrow.parquet
+            schema = pyarrow.schema([(column_name, {'integer': pyarrow.int64(), 'float': pyarrow.float64(),
+                                                    'text': pyarrow.string()}[column_type])
+                                     for column_name, column_type in export_columns])
+            if export_format == EXPORT_FORMAT_PARQUET:
+                writer = pyarrow.parquet.ParquetWriter(working_path, schema)
+            else:
+                writer = pyarrow.ipc.new_file(working_path, schema)
+
+        chunk_index = 0
+        while rows:
+            chunk_columns = list(zip(*rows))
+            if export_format == EXPORT_FORMAT_NUMPY:
+                arrays = {}
+                for (column_name, column_type), values in zip(export_columns, chunk_columns):
+                    column_arrays, mismatched = make_numpy_arrays(column_name, values, column_type)
+                    arrays.update(column_arrays)
+                    mismatched_counts[column_name] = mismatched_counts.get(column_name, 0) + mismatched
+                numpy.savez_compressed(os.path.join(working_path, 'chunk_%05d.npz' % chunk_index), **arrays)
+            else:
+                arrays = []
+                for (column_name, column_type), values in zip(export_columns, chunk_columns):
+                    column_array, mismatched = make_arrow_array(values, column_type)
+                    arrays.append(column_array)
+                    mismatched_counts[column_name] = mismatched_counts.get(column_name, 0) + mismatched
+                writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+
+            row_count += len(rows)
+            chunk_index += 1
+            logging.debug("Exported %s %s rows", str(row_count), table_name)
+            rows = export_cursor.fetchmany(chunk_rows)
+
+        if writer is not None:
+            writer.close()
+            writer = None
+        if os.path.isdir(output_path):
+            shutil.rmtree(output_path)
+        os.replace(working_path, output_path)
+    finally:
+        export_cursor.close()
+        if writer is not None:
+            writer.close()
+        if os.path.isdir(working_path):
+            shutil.rmtree(working_path)
+        elif os.path.exists(working_path):
+            os.unlink(working_path)
+
+    for column_name, mismatched in mismatched_counts.items():
+        if mismatched:
+            logging.warning("Exported %s values of %s column %s as missing since they aren't of the column's type",
+                            str(mismatched), table_name, column_name)
+    logging.info("Exported %s %s rows to '%s'", str(row_count), table_name, output_path)
+
+    return row_count
+
+
+def export_database(source_file: str, output_folder: str, tables: tuple, export_format: Optional[str] = None,
+                    chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """Exports tables and views of a generated database to columnar files
+    Arguments:
+        source_file: the path of the database to export
+        output_folder: the folder to write the exported files to, which is created if needed
+        tables: the names of the tables and views to export
+        export_format: the format to export in (see get_export_format())
+        chunk_rows: the number of rows to read and write at a time
+    Exceptions:
+        Raises RuntimeError if the format's module isn't installed, or a table isn't in the database
+    """
+    export_format = get_export_format(export_format)
+    os.makedirs(output_folder, exist_ok=True)
+
+    db_conn = sqlite3.connect(source_file)
+    try:
+        table_cursor = db_conn.cursor()
+        table_cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+        known_tables = set(row[0] for row in table_cursor.fetchall())
+        table_cursor.close()
+        missing_tables = [one_table for one_table in tables if one_table not in known_tables]
+        if missing_tables:
+            raise RuntimeError("Unable to find tables to export in '%s': %s" % (source_file, ','.join(missing_tables)))
+
+        for one_table in tables:
+            export_table(db_conn, one_table, output_folder, export_format, chunk_rows)
+    finally:
+        db_conn.close()
+
+
+def export() -> None:
+    """Exports tables and views of an existing database to columnar files
+    Exceptions:
+        RuntimeError is raised if the database or its tables can't be found, or the format's module isn't installed
+    """
+    parser = argparse.ArgumentParser(prog='generate.py ' + EXPORT_COMMAND,
+                                     description="Export the tables of a generated SQLite database to columnar files")
+    parser.add_argument('source_file', help="the generated database to export")
+    parser.add_argument('output_folder', help="the folder to write the exported files to")
+    parser.add_argument('--tables', default=','.join(EXPORT_TABLES),
+                        help="comma separated list of the tables and views to export (defaults to %s)" %
+                        ','.join(EXPORT_TABLES))
+    parser.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="the format to export in (defaults to %s when pyarrow is installed, and %s otherwise)" %
+                        (EXPORT_FORMAT_PARQUET, EXPORT_FORMAT_NUMPY))
+    parser.add_argument('--chunk_rows', type=int, default=EXPORT_CHUNK_ROWS,
+                        help="the number of rows to read and write at a time (default %s)" % str(EXPORT_CHUNK_ROWS))
+    parser.add_argument('--debug', action="store_true", help="turns on debugging messages")
+    args = parser.parse_args(sys.argv[2:])
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    logging.debug("Command line args: %s", str(args))
+
+    if not os.path.exists(args.source_file):
+        raise RuntimeError("Unable to find database to export: '%s'" % args.source_file)
+    if args.chunk_rows <= 0:
+        raise RuntimeError("The number of rows to export at a time must be positive: %s" % str(args.chunk_rows))
+
+    tables = tuple(one_table.strip() for one_table in args.tables.split(',') if one_table.strip())
+    export_database(args.source_file, args.output_folder, tables, args.format, args.chunk_rows)
+
+
+def main() -> None:
+    """Runs the command specified on the command line, or a single build if a command isn't specified"""
+    if len(sys.argv) > 1 and sys.argv[1] == BATCH_COMMAND:
+        batch()
+    elif len(sys.argv) > 1 and sys.argv[1] == CARVE_COMMAND:
+        carve()
+    elif len(sys.argv) > 1 and sys.argv[1] == EXPORT_COMMAND:
+        export()
+    else:
+        generate()
+
+
 if __name__ == "__main__":
-    generate()
+    main()
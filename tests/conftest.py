@@ -0,0 +1,62 @@
+"""Makes the scripts in the repository's folder importable by the tests, with a minimal stand-in for GDAL's osgeo
+package when it's not installed
+"""
+import os
+import re
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubGeometry:
+    """Geometry of the points in a WKT string"""
+    def __init__(self, points: list):
+        self.points = points
+
+    def GetEnvelope(self) -> tuple:  # pylint: disable=invalid-name
+        """Returns the minimum X, maximum X, minimum Y, and maximum Y of the points"""
+        x_values = [one_point[0] for one_point in self.points]
+        y_values = [one_point[1] for one_point in self.points]
+        return min(x_values), max(x_values), min(y_values), max(y_values)
+
+
+def stub_create_geometry_from_wkt(wkt: str):
+    """Returns the geometry of the points in the WKT, or None if there aren't any"""
+    points = [(float(one_x), float(one_y)) for one_x, one_y in re.findall(r'(-?[0-9.]+) (-?[0-9.]+)', wkt)]
+    return StubGeometry(points) if points else None
+
+
+class StubSpatialReference:
+    """Spatial reference that only remembers its EPSG code"""
+    def __init__(self):
+        self.epsg = None
+
+    def ImportFromEPSG(self, epsg: int) -> int:  # pylint: disable=invalid-name
+        """Remembers the EPSG code"""
+        self.epsg = epsg
+        return 0
+
+
+class StubCoordinateTransformation:
+    """Transformation that leaves the coordinates as they are"""
+    def __init__(self, source_ref, target_ref):
+        self.source_ref = source_ref
+        self.target_ref = target_ref
+
+    @staticmethod
+    def TransformPoint(x: float, y: float, z: float = 0.0) -> tuple:  # pylint: disable=invalid-name
+        """Returns the point unchanged"""
+        return x, y, z
+
+
+try:
+    import osgeo  # pylint: disable=unused-import
+except ImportError:
+    STUB_OSGEO = types.ModuleType('osgeo')
+    STUB_OSGEO.ogr = types.ModuleType('osgeo.ogr')
+    STUB_OSGEO.ogr.CreateGeometryFromWkt = stub_create_geometry_from_wkt
+    STUB_OSGEO.osr = types.ModuleType('osgeo.osr')
+    STUB_OSGEO.osr.SpatialReference = StubSpatialReference
+    STUB_OSGEO.osr.CoordinateTransformation = StubCoordinateTransformation
+    sys.modules.update({'osgeo': STUB_OSGEO, 'osgeo.ogr': STUB_OSGEO.ogr, 'osgeo.osr': STUB_OSGEO.osr})
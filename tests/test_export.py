@@ -0,0 +1,28 @@
+"""Tests of finding the columns of tables to export
+"""
+import sqlite3
+
+import generate
+
+
+def test_table_columns_include_generated():
+    """Generated columns are found in the table's column order, with their declared types"""
+    db_conn = sqlite3.connect(':memory:')
+    db_conn.execute('CREATE TABLE file_metadata (file_id INTEGER, metadata TEXT, '
+                    'speed NUMERIC GENERATED ALWAYS AS (json_extract(metadata, \'$.speed\')) VIRTUAL, '
+                    '"a ""b" REAL GENERATED ALWAYS AS (json_extract(metadata, \'$.b\')) STORED)')
+    db_conn.execute('INSERT INTO file_metadata (file_id, metadata) VALUES (1, \'{"speed": 2, "b": 1.5}\')')
+
+    table_columns = generate.get_table_columns(db_conn, 'file_metadata')
+    assert table_columns == [('file_id', 'INTEGER'), ('metadata', 'TEXT'), ('speed', 'NUMERIC'), ('a "b', 'REAL')]
+    assert generate.get_export_columns(table_columns, [(1, '{}', 2, 1.5)]) == \
+        [('file_id', 'integer'), ('metadata', 'text'), ('speed', 'integer'), ('a "b', 'float')]
+
+
+def test_export_columns_typed_by_samples():
+    """Columns without a declared type are typed by their sample values, and as text when they're all null"""
+    table_columns = [('a', ''), ('b', ''), ('c', ''), ('d', '')]
+    sample_rows = [(1, 1, 'x', None), (2, 2.5, 3, None)]
+
+    assert generate.get_export_columns(table_columns, sample_rows) == \
+        [('a', 'integer'), ('b', 'float'), ('c', 'text'), ('d', 'text')]
@@ -0,0 +1,158 @@
+"""Tests of converting and importing the gene files
+"""
+import io
+import sqlite3
+
+import pytest
+
+import generate
+
+
+@pytest.mark.parametrize('csv_value, expected', [
+    ('No WGS', -1),
+    ('NA', -2),
+    ('0', 0),
+    ('12', 12),
+    ('-3', -3),
+    ('+4', 4),
+    ('', ''),
+    (None, None),
+    ('1.5', '1.5'),
+    ('-', '-'),
+    (' 1', ' 1'),
+    ('na', 'na'),
+    ('PI329319', 'PI329319'),
+])
+def test_convert_cultivar_gene_value(csv_value, expected):
+    """Sentinels and integers are converted and everything else is kept as it is"""
+    assert generate.convert_cultivar_gene_value(csv_value) == expected
+
+
+def test_gene_converters_by_column():
+    """Integer columns have all their values converted, other columns only have their sentinels converted"""
+    sample_rows = [('PI1', '0', 'NA', 'x'),
+                   ('PI2', '', 'No WGS', '7'),
+                   ('NA', '1', '2', 'NA')]
+    converters = generate.get_cultivar_gene_converters(sample_rows)
+    columns = list(zip(*sample_rows))
+
+    assert converters[0](columns[0]) == ['PI1', 'PI2', -2]
+    assert converters[1](columns[1]) == [0, '', 1]
+    assert converters[2](columns[2]) == [-2, -1, 2]
+    assert converters[3](columns[3]) == ['x', '7', -2]
+
+
+def test_read_gene_file_batches_ragged_rows():
+    """Short rows are padded, long rows are truncated, and blank lines are skipped"""
+    column_order, batches = generate.read_gene_file_batches(io.StringIO('a,b,c\n1,2\n\n4,5,6,7\n7,8,9\n'))
+
+    assert column_order == ('a', 'b', 'c')
+    assert [one_row for one_batch in batches for one_row in one_batch] == \
+        [('1', '2', None), ('4', '5', '6'), ('7', '8', '9')]
+
+
+def test_read_gene_file_batches_sizes():
+    """Batches hold about the requested number of values, with at least one row in each"""
+    contents = 'a,b,c\n' + ''.join('%s,%s,%s\n' % (idx, idx, idx) for idx in range(10))
+
+    _, batches = generate.read_gene_file_batches(io.StringIO(contents), batch_values=6)
+    assert [len(one_batch) for one_batch in batches] == [2, 2, 2, 2, 2]
+
+    _, batches = generate.read_gene_file_batches(io.StringIO(contents), batch_values=1)
+    assert [len(one_batch) for one_batch in batches] == [1] * 10
+
+
+def test_read_gene_file_batches_empty():
+    """An empty file has no columns or rows"""
+    column_order, batches = generate.read_gene_file_batches(io.StringIO(''))
+
+    assert column_order == ()
+    assert not list(batches)
+
+
+def write_cultivar_gene_file(tmp_path) -> str:
+    """Writes a small cultivar gene file with sentinels and ragged rows, returning its path"""
+    file_path = tmp_path / 'cultivar_genes.csv'
+    file_path.write_text('Cultivar,S1 1,S1.2,S2_3\n'
+                         'PI1,0,1,NA\n'
+                         'PI2,No WGS,0\n'
+                         '\n'
+                         'PI3,1,1,0,1\n')
+    return str(file_path)
+
+
+@pytest.mark.parametrize('compact_schema', [False, True])
+def test_save_cultivar_genes_wide(tmp_path, compact_schema):
+    """The wide layout has a column for each gene, in file order"""
+    db_conn = sqlite3.connect(':memory:')
+    cultivar_column, column_names = generate.save_cultivar_genes(write_cultivar_gene_file(tmp_path), 0, 0, db_conn,
+                                                                 compact_schema, generate.GENE_LAYOUT_WIDE)
+
+    assert cultivar_column == 'cultivar'
+    assert column_names == ('cultivar', 's1_1', 's1_2', 's2_3')
+    assert db_conn.execute('SELECT id, cultivar, s1_1, s1_2, s2_3 FROM cultivar_genes ORDER BY id').fetchall() == \
+        [(1, 'PI1', 0, 1, -2), (2, 'PI2', -1, 0, None), (3, 'PI3', 1, 1, 0)]
+
+
+def test_save_cultivar_genes_long(tmp_path):
+    """The long layout has a row for each cultivar and gene"""
+    db_conn = sqlite3.connect(':memory:')
+    generate.save_cultivar_genes(write_cultivar_gene_file(tmp_path), 0, 0, db_conn,
+                                 gene_layout=generate.GENE_LAYOUT_LONG)
+
+    assert db_conn.execute('SELECT id, name FROM cultivar_gene_names ORDER BY id').fetchall() == \
+        [(1, 's1_1'), (2, 's1_2'), (3, 's2_3')]
+    assert db_conn.execute('SELECT cultivar, gene_id, value FROM cultivar_gene_values '
+                           'WHERE cultivar = ? ORDER BY gene_id', ['PI2']).fetchall() == \
+        [('PI2', 1, -1), ('PI2', 2, 0), ('PI2', 3, None)]
+    assert db_conn.execute('SELECT count(1) FROM cultivar_gene_values').fetchone()[0] == 9
+
+
+def test_save_cultivar_genes_skips_rows(tmp_path):
+    """Rows before the header are skipped"""
+    file_path = tmp_path / 'cultivar_genes.csv'
+    file_path.write_text('exported from the genotype database\nCultivar,g1\nPI1,1\n')
+    db_conn = sqlite3.connect(':memory:')
+    generate.save_cultivar_genes(str(file_path), 0, 1, db_conn)
+
+    assert db_conn.execute('SELECT cultivar, g1 FROM cultivar_genes').fetchall() == [('PI1', 1)]
+
+
+def test_save_cultivar_genes_errors(tmp_path):
+    """Empty files and key columns beyond the header are rejected"""
+    empty_path = tmp_path / 'empty.csv'
+    empty_path.write_text('Cultivar,g1\n')
+    with pytest.raises(RuntimeError):
+        generate.save_cultivar_genes(str(empty_path), 0, 0, sqlite3.connect(':memory:'))
+
+    with pytest.raises(RuntimeError):
+        generate.save_cultivar_genes(write_cultivar_gene_file(tmp_path), 4, 0, sqlite3.connect(':memory:'))
+
+
+def test_save_gene_markers(tmp_path):
+    """Gene markers are saved as text, with the key column's values returned by row ID"""
+    file_path = tmp_path / 'markers.csv'
+    file_path.write_text('Marker Name,Chromosome,Position\nS1_1,1,10\nS1_2,1\n')
+    db_conn = sqlite3.connect(':memory:')
+    id_key_map = generate.save_gene_markers(str(file_path), 0, 0, db_conn)
+
+    assert id_key_map == {1: 'S1_1', 2: 'S1_2'}
+    assert db_conn.execute('SELECT id, marker_name, chromosome, position FROM gene_markers ORDER BY id').fetchall() == \
+        [(1, 'S1_1', '1', '10'), (2, 'S1_2', '1', None)]
+
+
+def test_pivot_gene_columns(tmp_path):
+    """Pivot columns look up each cultivar's gene values, and are named after genes whose names need quoting"""
+    file_path = tmp_path / 'cultivar_genes.csv'
+    file_path.write_text('Cultivar,S1 1,S1"2\nPI1,0,1\nPI2,NA,0\n')
+    db_conn = sqlite3.connect(':memory:')
+    generate.save_cultivar_genes(str(file_path), 0, 0, db_conn, gene_layout=generate.GENE_LAYOUT_LONG)
+
+    pivot_columns = generate.get_pivot_gene_columns(db_conn, ('S1"2', 'S1 1'), 'c.cultivar')
+    pivot_cursor = db_conn.execute("SELECT c.cultivar, %s FROM (SELECT 'PI1' AS cultivar UNION ALL "
+                                   "SELECT 'PI2') c ORDER BY c.cultivar" % ', '.join(pivot_columns))
+    assert [one_column[0] for one_column in pivot_cursor.description] == ['cultivar', 's1"2', 's1_1']
+    assert pivot_cursor.fetchall() == [('PI1', 1, 0), ('PI2', 0, -2)]
+
+    with pytest.raises(RuntimeError):
+        generate.get_pivot_gene_columns(db_conn, ('S1 1', 'S9'), 'c.cultivar')
@@ -0,0 +1,29 @@
+"""Tests of building with an inventory of the site's folders and files
+"""
+import argparse
+import os
+
+import pytest
+
+import generate
+
+
+@pytest.mark.parametrize('options', [[], ['--progressive'], ['--resume']])
+def test_bad_inventory_leaves_no_database(tmp_path, options):
+    """A bad inventory stops the build before the database, or its working file, is created"""
+    inventory_path = tmp_path / 'inventory.tsv'
+    inventory_path.write_text('')
+    build_path = tmp_path / 'build'
+    build_path.mkdir()
+    if '--progressive' not in options:
+        options = options + ['--build_location', str(build_path)]
+    parser = argparse.ArgumentParser()
+    generate.add_arguments(parser)
+    args = parser.parse_args(['RGB', '2018-05-08', str(tmp_path / 'out.db'), '--inventory_file', str(inventory_path)] +
+                             options)
+
+    with pytest.raises(RuntimeError):
+        generate.make_database(args)
+    assert sorted(os.listdir(str(tmp_path))) == ['build', 'inventory.tsv']
+    assert not os.listdir(str(build_path))
+    assert generate.get_inventory() is None
@@ -0,0 +1,39 @@
+"""Tests of the --metadata_columns command line option
+"""
+import pytest
+
+import generate
+
+
+@pytest.mark.parametrize('metadata_columns_arg, expected', [
+    (None, ()),
+    ('', ()),
+    (' , ', ()),
+    ('pan=$.gantry.pan', (('pan', 'NUMERIC', '$.gantry.pan'),)),
+    (' tilt : real = $.c ', (('tilt', 'REAL', '$.c'),)),
+    ('a:integer=$.a,b:Text=$."x y",_c:NUMERIC=$[0]',
+     (('a', 'INTEGER', '$.a'), ('b', 'TEXT', '$."x y"'), ('_c', 'NUMERIC', '$[0]'))),
+    ('pan=$.a,', (('pan', 'NUMERIC', '$.a'),)),
+])
+def test_prepare_metadata_columns(metadata_columns_arg, expected):
+    """Column names, types, and paths are parsed, with NUMERIC as the default type"""
+    assert generate.prepare_metadata_columns(metadata_columns_arg) == expected
+
+
+@pytest.mark.parametrize('metadata_columns_arg', [
+    '1pan=$.a',
+    'pan-angle=$.a',
+    'pan angle=$.a',
+    '=$.a',
+    'file_id=$.a',
+    'METADATA=$.a',
+    'pan:blob=$.a',
+    'pan=a.b',
+    'pan',
+    'pan=$.a,PAN=$.b',
+    'pan=$.a,pan:text=$.b',
+])
+def test_prepare_metadata_columns_invalid(metadata_columns_arg):
+    """Invalid names and types, reserved and repeated names, and paths that don't start with '$' are rejected"""
+    with pytest.raises(RuntimeError):
+        generate.prepare_metadata_columns(metadata_columns_arg)
@@ -0,0 +1,100 @@
+"""Tests of building a database one date at a time
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+import pytest
+
+import generate
+
+# The plot IDs with their names and bounds
+PLOTS = {11: ('MAC Field Scanner Season 7 Range 1 Column 1', -111.9749, 33.0701),
+         12: ('MAC Field Scanner Season 7 Range 1 Column 2', -111.9748, 33.0701)}
+
+# The plot and capture time of each file, to which a file near midnight is added. Each plot only has one file on a
+# date, since the files of a folder share the first one's metadata
+FILE_TIMES = ((11, '2018-05-08', '13-00-00'), (11, '2018-05-09', '13-00-00'))
+
+
+def make_site(tmp_path, file_times: tuple) -> str:
+    """Writes a site of two plots with files and weather on two dates, returning the experiment file's path"""
+    site_path = tmp_path / 'site'
+    for date, hours in (('2018-05-08', (12, 13, 23)), ('2018-05-09', (0, 12, 13))):
+        weather_path = site_path / generate.LOCAL_ENVIRONMENT_LOGGER_PATH / date
+        weather_path.mkdir(parents=True)
+        for hour in hours:
+            # A file of readings every 5 minutes for each hour
+            readings = [{'timestamp': '%s-%02d:%02d:00' % (date.replace('-', '.'), hour, minute),
+                         'weather_station': {one_key: {'value': float(hour * 60 + minute)}
+                                             for one_key in generate.WEATHER_READING_KEYS}}
+                        for minute in range(0, 60, 5)]
+            (weather_path / ('%s_%02d-00-00_environmentlogger.json' % (date, hour))).write_text(
+                json.dumps({'environment_sensor_readings': readings}))
+
+    for plot_id, date, time in file_times:
+        stamp = '%s__%s-100' % (date, time)
+        plot_path = site_path / 'Level_1_Plots/rgb_geotiff' / date / PLOTS[plot_id][0]
+        plot_path.mkdir(parents=True, exist_ok=True)
+        (plot_path / ('rgb_geotiff_L1_ua-mac_%s_left.tif' % stamp)).write_text('x')
+        metadata_path = site_path / 'raw_data/stereoTop' / date / stamp
+        metadata_path.mkdir(parents=True)
+        (metadata_path / ('abc_%s_metadata.json' % stamp)).write_text(json.dumps({'lemnatec_measurement_metadata': {
+            'gantry_system_variable_metadata': {'position x [m]': '5', 'position y [m]': '3', 'position z [m]': '0.5',
+                                                'time': '%s/%s/%s %s' % (date[5:7], date[8:], date[:4],
+                                                                         time.replace('-', ':'))},
+            'sensor_variable_metadata': {}, 'gantry_system_fixed_metadata': {}, 'sensor_fixed_metadata': {}}}))
+
+    experiment_path = tmp_path / 'experiments.json'
+    experiment_path.write_text(json.dumps({'data': [{'experiment': {
+        'id': 7, 'name': 'MAC Season 7', 'start_date': '2018-05-01', 'end_date': '2018-05-31',
+        'sites': [{'site': {'id': plot_id, 'sitename': plot_name, 'city': 'Maricopa',
+                            'geometry': 'POLYGON((%s %s, %s %s, %s %s, %s %s, %s %s))' % (
+                                min_lon, min_lat, min_lon + 0.0001, min_lat, min_lon + 0.0001, min_lat + 0.0001,
+                                min_lon, min_lat + 0.0001, min_lon, min_lat)}}
+                  for plot_id, (plot_name, min_lon, min_lat) in PLOTS.items()]}}]}))
+    return str(experiment_path)
+
+
+@pytest.fixture(name='build')
+def fixture_build(tmp_path, monkeypatch, midnight_file):
+    """Returns a function that builds a database of the test site with extra command line options"""
+    experiment_file = make_site(tmp_path, FILE_TIMES + ((12,) + midnight_file,))
+    monkeypatch.setattr(generate, 'LOCAL_START_PATH', str(tmp_path / 'site'))
+    monkeypatch.setattr(generate, 'get_cultivars_brapi', lambda study_id, brapi_url: [
+        {'observationUnitDbId': str(plot_id), 'germPlasmDbId': '100', 'germplasmName': 'PI100'} for plot_id in PLOTS])
+
+    def _build(db_name: str, *options) -> sqlite3.Connection:
+        parser = argparse.ArgumentParser()
+        generate.add_arguments(parser)
+        db_path = os.path.join(str(tmp_path), db_name)
+        generate.make_database(parser.parse_args(['RGB', '2018-05-08:2018-05-09', db_path,
+                                                  '-e', experiment_file] + list(options)))
+        return sqlite3.connect(db_path)
+
+    return _build
+
+
+def get_file_weather(db_conn: sqlite3.Connection) -> list:
+    """Returns the file names with the timestamps of the first and last weather readings they're mapped to"""
+    return sorted(db_conn.execute('SELECT f.filename, w1.timestamp, w2.timestamp FROM weather_file_map m '
+                                  'JOIN files f ON f.id = m.file_id '
+                                  'JOIN weather w1 ON w1.id = m.min_weather_id '
+                                  'JOIN weather w2 ON w2.id = m.max_weather_id').fetchall())
+
+
+@pytest.mark.parametrize('midnight_file', [('2018-05-08', '23-59-30'), ('2018-05-09', '00-00-10')])
+def test_progressive_prune_weather(build, midnight_file):
+    """Pruning the weather of a progressive build keeps the same weather, and maps the files to it the same way, as
+    other builds when a file's capture window reaches into the other date"""
+    expected = get_file_weather(build('plain.db'))
+    assert ('rgb_geotiff_L1_ua-mac_%s__%s-100_left.tif' % midnight_file, '2018.05.09-00:00:00',
+            '2018.05.09-00:00:00') in expected
+
+    pruned_conn = build('pruned.db', '--prune_weather')
+    progressive_conn = build('progressive.db', '--progressive', '--prune_weather')
+    assert get_file_weather(pruned_conn) == expected
+    assert get_file_weather(progressive_conn) == expected
+    assert sorted(progressive_conn.execute('SELECT timestamp FROM weather').fetchall()) == \
+        sorted(pruned_conn.execute('SELECT timestamp FROM weather').fetchall())
@@ -0,0 +1,51 @@
+"""Tests of parsing the timestamps of files and weather readings
+"""
+from datetime import datetime
+
+import pytest
+
+import generate
+
+
+@pytest.mark.parametrize('timestamp_string, expected', [
+    ('05/08/2018 13:02:03', datetime(2018, 5, 8, 13, 2, 3)),
+    ('2018.05.08-13:02:03', datetime(2018, 5, 8, 13, 2, 3)),
+    ('01/01/1970 00:00:00', datetime(1970, 1, 1)),
+    ('12/31/2019 23:59:59', datetime(2019, 12, 31, 23, 59, 59)),
+    ('2020.02.29-00:00:00', datetime(2020, 2, 29)),
+    ('1969.12.31-23:59:59', datetime(1969, 12, 31, 23, 59, 59)),
+    # Not fixed width, so parsed by strptime()
+    ('5/8/2018 13:02:03', datetime(2018, 5, 8, 13, 2, 3)),
+    ('2018.5.8-1:2:3', datetime(2018, 5, 8, 1, 2, 3)),
+])
+def test_parse_timestamp_epoch(timestamp_string, expected):
+    """Supported timestamps are converted to epochs matching strptime()"""
+    epoch = generate.parse_timestamp_epoch(timestamp_string)
+
+    assert epoch == generate.make_timestamp_epoch(expected)
+    assert epoch == generate.make_timestamp_epoch(generate.strptime_timestamp_instance(timestamp_string))
+    assert generate.make_timestamp_instance(timestamp_string) == expected
+
+
+@pytest.mark.parametrize('timestamp_string', [
+    '2018.05.08-24:00:00',
+    '2018.05.08-13:60:00',
+    '2018.05.08-13:00:60',
+    '2018.02.30-01:00:00',
+    '13/08/2018 01:00:00',
+    '2018-05-08 13:02:03',
+    '2018.05.08 13:02:03',
+    '2018.05.08-1a:02:03',
+    '',
+    'x',
+])
+def test_parse_timestamp_epoch_invalid(timestamp_string):
+    """Timestamps that aren't in a supported format, or aren't valid times, are rejected"""
+    with pytest.raises(ValueError):
+        generate.parse_timestamp_epoch(timestamp_string)
+
+
+def test_timestamp_from_epoch():
+    """Epochs convert back to the timestamps they were made from"""
+    for one_timestamp in (datetime(1970, 1, 1), datetime(2018, 5, 8, 13, 2, 3), datetime(1969, 12, 31, 23, 59, 59)):
+        assert generate.timestamp_from_epoch(generate.make_timestamp_epoch(one_timestamp)) == one_timestamp